@@ -1,30 +1,42 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import os
 import logging
 from dotenv import load_dotenv
+import asyncio
+import hashlib
 import json
-from google.generativeai.client import configure
-from google.generativeai.generative_models import GenerativeModel
-from bs4 import BeautifulSoup
-from typing import Dict, Any, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from flask import Response
+from batch import BatchRun, make_jobs, parse_jobs
+from compression import choose_encoding, compress, configured_encodings
+from plan_cache import PlanCache, create_cache_store, make_plan_cache_key
+from reschedule_cache import RescheduleCache
+from plan_store import create_plan_store, is_plan_id
+from singleflight import AsyncSingleFlight, SingleFlight
+from local_tips import ReloadingTipsIndex
+import metrics
+from sanitizer import get_sanitizer
+from itinerary import DayPlan, Itinerary, find_target_days, parse_itinerary, render_itinerary, splice_days
+from llm_backends import create_backend, estimate_tokens
+from model_client import CircuitBreaker, ModelClient, ModelError, RetryPolicy, TokenBucket
+from profiler import SamplingProfiler
+from plan_codec import PromptTooLarge, can_encode, chunk_by_budget, day_theme, encode_day, encode_itinerary, inflate
+from parallel_plan import (Skeleton, SkeletonDay, extract_day, generate_days, generate_days_async,
+                           parse_skeleton, placeholder_day)
+from streaming import IncrementalSanitizer, format_sse, section_events, split_sections
 
 # Load environment variables
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 MOCK_MODE = os.getenv("MOCK_MODE", "False") == "True"
+# Model backend: gemini, mock (replays mock_data.html) or simulated (offline load testing)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "mock" if MOCK_MODE else "gemini")
 
-# Check API key
-if not API_KEY and not MOCK_MODE:
-    raise ValueError("GOOGLE_API_KEY not found in environment and not in MOCK_MODE.")
-
-# Configure Gemini
-gemini_model = None
-if not MOCK_MODE:
-    configure(api_key=API_KEY)
-    # Initialize the model once globally for efficiency
-    gemini_model = GenerativeModel("gemini-2.5-flash")
+# Initialize the backend once globally for efficiency; raises if Gemini has no API key
+llm_backend = create_backend(LLM_BACKEND, API_KEY)
 
 
 # Initialize Flask app
@@ -34,6 +46,101 @@ CORS(app)
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Configure the itinerary cache (backend: memory, sqlite or none)
+PLAN_CACHE_BACKEND = os.getenv("PLAN_CACHE_BACKEND", "memory")
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "3600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1024"))
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "plan_cache.sqlite3")
+
+_plan_cache_store = create_cache_store(PLAN_CACHE_BACKEND, PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_PATH)
+plan_cache = PlanCache(_plan_cache_store, PLAN_CACHE_TTL) if _plan_cache_store is not None else None
+
+# Model call policy: per-attempt and overall deadlines (seconds), retries with
+# jittered backoff, an optional client-side rate limit and a circuit breaker
+MODEL_ATTEMPT_TIMEOUT = float(os.getenv("MODEL_ATTEMPT_TIMEOUT", "60"))
+MODEL_DEADLINE = float(os.getenv("MODEL_DEADLINE", "120"))
+MODEL_MAX_ATTEMPTS = int(os.getenv("MODEL_MAX_ATTEMPTS", "3"))
+MODEL_RETRY_BASE_DELAY = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.5"))
+MODEL_RETRY_MAX_DELAY = float(os.getenv("MODEL_RETRY_MAX_DELAY", "8"))
+MODEL_RATE_LIMIT_RPM = float(os.getenv("MODEL_RATE_LIMIT_RPM", "0"))
+MODEL_RATE_LIMIT_BURST = float(os.getenv("MODEL_RATE_LIMIT_BURST", "5"))
+MODEL_BREAKER_THRESHOLD = int(os.getenv("MODEL_BREAKER_THRESHOLD", "5"))
+MODEL_BREAKER_RESET = float(os.getenv("MODEL_BREAKER_RESET", "30"))
+
+# Plan generation mode: single (one prompt), parallel (skeleton + concurrent days)
+# or auto (parallel for trips of at least PLAN_PARALLEL_MIN_DAYS days)
+PLAN_GENERATION_MODE = os.getenv("PLAN_GENERATION_MODE", "single")
+if PLAN_GENERATION_MODE not in ("single", "parallel", "auto"):
+    raise ValueError(f"Unknown plan generation mode: {PLAN_GENERATION_MODE}")
+PLAN_PARALLEL_MIN_DAYS = int(os.getenv("PLAN_PARALLEL_MIN_DAYS", "5"))
+PLAN_FANOUT_WIDTH = int(os.getenv("PLAN_FANOUT_WIDTH", "8"))
+PLAN_DAY_TIMEOUT = float(os.getenv("PLAN_DAY_TIMEOUT", "60"))
+if PLAN_DAY_TIMEOUT <= 0:
+    raise ValueError("PLAN_DAY_TIMEOUT must be positive")
+# Threads for day expansion, shared by every request in the process
+PLAN_DAY_THREADS = int(os.getenv("PLAN_DAY_THREADS", "32"))
+
+# Sanitizer backend: allowlist (single-pass, default) or bs4 (BeautifulSoup fallback)
+SANITIZER_BACKEND = os.getenv("SANITIZER_BACKEND", "allowlist")
+_sanitize = get_sanitizer(SANITIZER_BACKEND)
+
+# Reschedule prompts carry the plan as compact text (compact) or as HTML (html).
+# Above RESCHEDULE_MAX_PROMPT_TOKENS (0 = no limit) compact prompts are split
+# into per-day chunks, and requests that still do not fit are rejected
+RESCHEDULE_PROMPT_FORMAT = os.getenv("RESCHEDULE_PROMPT_FORMAT", "compact")
+if RESCHEDULE_PROMPT_FORMAT not in ("compact", "html"):
+    raise ValueError(f"Unknown reschedule prompt format: {RESCHEDULE_PROMPT_FORMAT}")
+RESCHEDULE_MAX_PROMPT_TOKENS = int(os.getenv("RESCHEDULE_MAX_PROMPT_TOKENS", "0"))
+
+# Reschedule results are reused for near-duplicate suggestions on the same plan
+# (backend: memory, sqlite or none). Each plan keeps up to
+# RESCHEDULE_CACHE_VARIANTS suggestions; plans are evicted least recently used
+RESCHEDULE_CACHE_BACKEND = os.getenv("RESCHEDULE_CACHE_BACKEND", "memory")
+RESCHEDULE_CACHE_TTL = float(os.getenv("RESCHEDULE_CACHE_TTL", "3600"))
+RESCHEDULE_CACHE_MAX_ENTRIES = int(os.getenv("RESCHEDULE_CACHE_MAX_ENTRIES", "1024"))
+RESCHEDULE_CACHE_VARIANTS = int(os.getenv("RESCHEDULE_CACHE_VARIANTS", "8"))
+RESCHEDULE_CACHE_SIMILARITY = float(os.getenv("RESCHEDULE_CACHE_SIMILARITY", "0.6"))
+RESCHEDULE_CACHE_PATH = os.getenv("RESCHEDULE_CACHE_PATH", "reschedule_cache.sqlite3")
+
+_reschedule_cache_store = create_cache_store(RESCHEDULE_CACHE_BACKEND, RESCHEDULE_CACHE_MAX_ENTRIES,
+                                             RESCHEDULE_CACHE_PATH)
+reschedule_cache = (RescheduleCache(PlanCache(_reschedule_cache_store, RESCHEDULE_CACHE_TTL),
+                                    RESCHEDULE_CACHE_SIMILARITY, RESCHEDULE_CACHE_VARIANTS)
+                    if _reschedule_cache_store is not None else None)
+
+# Generated plans are stored compressed under a content hash (backend: memory,
+# sqlite or none), so clients can fetch them from GET /plan/<id> and reschedule by ID
+PLAN_STORE_BACKEND = os.getenv("PLAN_STORE_BACKEND", "memory")
+PLAN_STORE_MAX_ENTRIES = int(os.getenv("PLAN_STORE_MAX_ENTRIES", "10000"))
+PLAN_STORE_PATH = os.getenv("PLAN_STORE_PATH", "plans.sqlite3")
+plan_store = create_plan_store(PLAN_STORE_BACKEND, PLAN_STORE_MAX_ENTRIES, PLAN_STORE_PATH)
+
+# JSON responses of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with the
+# first of these encodings the client accepts (br needs the optional brotli package)
+RESPONSE_COMPRESSION = configured_encodings(os.getenv("RESPONSE_COMPRESSION", "br,gzip"))
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+
+# Batch generation: jobs per /plan/batch request and how many run at once
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "1000"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Local tips are indexed once and reloaded when the file changes
+LOCAL_TIPS_PATH = os.getenv("LOCAL_TIPS_PATH", "local_tips.json")
+LOCAL_TIPS_MAX_MATCHES = int(os.getenv("LOCAL_TIPS_MAX_MATCHES", "1"))
+local_tips = ReloadingTipsIndex(LOCAL_TIPS_PATH, float(os.getenv("LOCAL_TIPS_RELOAD_INTERVAL", "2")))
+
+# Threads start on first use, so forked workers each get their own
+day_pool = ThreadPoolExecutor(max_workers=max(1, PLAN_DAY_THREADS), thread_name_prefix="plan-day")
+
+# Identical requests that arrive while one is already generating share its result
+generation_flight = SingleFlight()
+async_generation_flight = AsyncSingleFlight()
+
+# The sampling profiler can only be driven through /debug/profiler when enabled
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "False") == "True"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+profiler = SamplingProfiler(PROFILER_INTERVAL)
+
 # ---------------- ENHANCED PROMPT GENERATORS ---------------- #
 
 def generate_trip_prompt(source: str, destination: str, days: int) -> str:
@@ -124,72 +231,251 @@ def generate_reschedule_prompt(plan: str, mood: str) -> str:
     """
 
 
+def generate_day_reschedule_prompt(itinerary: Itinerary, target_days: List[int], mood: str) -> str:
+    """Generates a prompt that rewrites only the days a suggestion targets."""
+    outline = "\n".join(f"    - {day.title}" for day in itinerary.days)
+    day_labels = ", ".join(f"Day {number}" for number in target_days)
+    days_html = "\n".join(itinerary.day(number).render() for number in target_days)
+    return f"""
+    You are an expert travel assistant, skilled at modifying existing itineraries to better suit a traveler's needs. Your primary goal is to be helpful and realistic.
+
+    **Full Trip Outline (for context only, do not rewrite):**
+{outline}
+
+    **Days to Update ({day_labels}):**
+    {days_html}
+
+    **Traveler's Request:**
+    "{mood}"
+
+    **Core Objective:** Rewrite only {day_labels} so they match the traveler's request, keeping each day's location and its place in the overall trip.
+
+    **Smart Substitution:**
+    -   If "tired" or "relaxing": Substitute tiring activities with calmer ones and add leisure time.
+    -   If "adventurous": Replace passive sightseeing with active experiences.
+    -   If "budget concerns": Use free or cheaper alternatives.
+    -   If "too rushed": Remove the least essential activity and extend the time for the rest.
+    Recalculate timings, travel times and costs for the changed activities.
+
+    **Response Format:**
+    1.  Start with a single `<p>` tag acknowledging the request and summarizing the changes.
+    2.  Then return ONLY the updated sections for {day_labels}, each starting with its original `<h2>📅 Day X: ...</h2>` heading and using the same `<h3>`, `<p>` and `<h4>` structure as above. Keep the same day numbers. Do not return any other days.
+    """
+
+
+def generate_compact_reschedule_prompt(itinerary: Itinerary, target_days: List[int], mood: str) -> str:
+    """Generates a short reschedule prompt that carries the plan in the compact `plan_codec` format."""
+    outline = ""
+    if set(target_days) != set(itinerary.day_numbers()):
+        outline = "Trip outline (context only):\n" + "\n".join(f"D{day.number}: {day_theme(day)}" for day in itinerary.days) + "\n\n"
+    day_labels = ", ".join(f"D{number}" for number in target_days)
+    return f"""
+    You are an expert travel assistant. Rewrite the days below to match the traveler's request.
+
+{outline}Days to rewrite ({day_labels}):
+{encode_itinerary(itinerary, target_days)}
+
+    Traveler's request: "{mood}"
+
+    Keep each day's number, location and geographic logic. Replace activities rather than deleting them: calmer ones and leisure time if tired, active experiences if adventurous, free or cheaper options for budget concerns, and drop the least essential activity if rushed. Recalculate durations, travel times and costs.
+
+    Reply in the same plain-text format with no HTML, returning only the days listed above:
+    ACK: one sentence summarizing the changes
+    D<n>: day theme
+    M, L, A, E or N (Morning, Lunch, Afternoon, Evening, Dinner): title | description with duration, travel time and cost
+    B: any other heading | description
+    $: estimated daily budget
+    """
+
+
+def generate_skeleton_prompt(source: str, destination: str, days: int) -> str:
+    """Generates a short prompt for the day-by-day outline of a long trip."""
+    return f"""
+    You are a world-class travel expert. Outline a {days}-day trip from {source} to {destination}.
+
+    Consider the travel from {source} on Day 1 and the departure on the last day, group each day by location and theme to minimize travel, and balance tiring days with relaxed ones.
+
+    Respond in plain text only (no HTML, no extra commentary) using exactly this format:
+    INTRO: [A 2-sentence overview of the trip]
+    Day 1 | [A Catchy Theme for the Day] | [Base Area or Location]
+    ...
+    Day {days} | [A Catchy Theme for the Day] | [Base Area or Location]
+    """
+
+
+def generate_day_prompt(source: str, destination: str, days: int, day: SkeletonDay, outline: str) -> str:
+    """Generates a prompt for the detailed schedule of a single day."""
+    return f"""
+    You are a world-class travel expert writing one day of a {days}-day trip from {source} to {destination}.
+
+    **Trip Outline (for context only):**
+    {outline}
+
+    **Your Task:** Write the detailed schedule for Day {day.number} only, themed "{day.theme}" and based around {day.location}. Include 2-3 main activities plus meals, with estimated time, travel between locations and approximate costs for each.
+
+    **Strict HTML Structure (Adhere to this exactly):**
+    -   `<h2>📅 Day {day.number}: {day.theme}</h2>`
+    -   Time blocks: `<h3>🌅 Morning: [Activity Name]</h3>`, `<h3>🍽️ Lunch: [Restaurant Suggestion or Area]</h3>`, `<h3>🌞 Afternoon: [Activity Name]</h3>`, `<h3>🌙 Evening: [Activity Name]</h3>`, `<h3>🍴 Dinner: [Restaurant Suggestion or Area]</h3>`
+    -   Immediately after each `<h3>`, a `<p>` with a 1-2 sentence description including duration, travel time and estimated cost.
+    -   End with `<h4><strong>Estimated Daily Budget:</strong> [Approximate Cost]</h4>`
+
+    Output only this day's section: no `<h1>`, no introduction, no other days, no lists.
+    """
+
+
+# Changes whenever the trip prompt template changes, so cached plans from an
+# older prompt are never served.
+PROMPT_VERSION = hashlib.sha256(generate_trip_prompt("", "", 0).encode("utf-8")).hexdigest()[:12]
+
+
 # ---------------- HELPER FUNCTIONS ---------------- #
 
+GENERATION_ERROR_MESSAGE = "Sorry, there was an error generating your itinerary. Please try again."
+
+
+def _call_backend(prompt: str, timeout: float) -> str:
+    return llm_backend.generate(prompt, timeout)
+
+
+async def _call_backend_async(prompt: str, timeout: float) -> str:
+    return await llm_backend.generate_async(prompt, timeout)
+
+
+def _stream_backend(prompt: str, timeout: float) -> Iterator[str]:
+    return llm_backend.stream(prompt, timeout)
+
+
+model_client = ModelClient(
+    call=_call_backend,
+    async_call=_call_backend_async,
+    stream_call=_stream_backend,
+    retry=RetryPolicy(MODEL_MAX_ATTEMPTS, MODEL_RETRY_BASE_DELAY, MODEL_RETRY_MAX_DELAY),
+    rate_limiter=TokenBucket(MODEL_RATE_LIMIT_RPM / 60, MODEL_RATE_LIMIT_BURST) if MODEL_RATE_LIMIT_RPM > 0 else None,
+    breaker=CircuitBreaker(MODEL_BREAKER_THRESHOLD, MODEL_BREAKER_RESET),
+    attempt_timeout=MODEL_ATTEMPT_TIMEOUT,
+    deadline=MODEL_DEADLINE,
+)
+
+
+# ---------------- METRICS ---------------- #
+
+registry = metrics.MetricsRegistry()
+REQUESTS = registry.counter("planner_requests_total", "HTTP requests by route and status.", ["endpoint", "status"])
+REQUEST_SECONDS = registry.histogram("planner_request_seconds", "Time to produce a response, by route.", ["endpoint"])
+STAGE_SECONDS = registry.histogram("planner_stage_seconds", "Time spent in each pipeline stage.", ["stage"])
+MODEL_TOKENS = registry.counter("planner_model_tokens_total", "Estimated model tokens sent and received.", ["direction"])
+MODEL_ERRORS = registry.counter("planner_model_errors_total", "Failed model calls by error class.", ["kind"])
+PROMPT_TOKENS = registry.counter("planner_reschedule_prompt_tokens_total",
+                                 "Estimated reschedule prompt tokens sent, and what the HTML prompt would have used.",
+                                 ["prompt"])
+TIPS_LOOKUPS = registry.counter("planner_local_tips_lookups_total", "Local tip lookups by result.", ["result"])
+registry.callback("planner_model_calls_total", "Model calls started, excluding retries.", "counter",
+                  lambda: [({}, model_client.calls)])
+registry.callback("planner_model_retries_total", "Model call retries.", "counter",
+                  lambda: [({}, model_client.retries)])
+registry.callback("planner_circuit_breaker_open", "1 while the model circuit breaker is open or half-open.", "gauge",
+                  lambda: [({}, int(model_client.breaker.state != CircuitBreaker.CLOSED))])
+registry.callback("planner_plan_cache_lookups_total", "Plan cache lookups by result.", "counter",
+                  lambda: [({"result": "hit"}, plan_cache.hits), ({"result": "miss"}, plan_cache.misses)]
+                  if plan_cache else [])
+registry.callback("planner_plan_cache_evictions_total", "Plans evicted from the cache.", "counter",
+                  lambda: [({}, plan_cache.store.evictions)] if plan_cache else [])
+registry.callback("planner_reschedule_cache_lookups_total", "Reschedule cache lookups by result.", "counter",
+                  lambda: [({"result": "hit"}, reschedule_cache.hits),
+                           ({"result": "near_hit"}, reschedule_cache.near_hits),
+                           ({"result": "miss"}, reschedule_cache.misses)] if reschedule_cache else [])
+registry.callback("planner_singleflight_coalesced_total", "Requests that joined an in-flight generation.", "counter",
+                  lambda: [({"pool": "threads"}, generation_flight.coalesced),
+                           ({"pool": "async"}, async_generation_flight.coalesced)])
+registry.callback("planner_startup_seconds", "Time this worker spent importing and warming up, by phase.", "gauge",
+                  lambda: [({"phase": phase}, seconds) for phase, seconds in sorted(startup_timings.items())])
+
+
+def observe_request(endpoint: str, status_code: int, seconds: float) -> None:
+    """Records one served request; shared by the Flask and ASGI front ends."""
+    REQUESTS.inc(endpoint=endpoint, status=str(status_code))
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint)
+
+
+def _record_model_error(error: ModelError) -> None:
+    MODEL_ERRORS.inc(kind=error.kind)
+    logging.error(f"Error with {llm_backend.name} backend: {error}")
+
+
 def generate_with_gemini(prompt: str) -> str:
-    """Generates content using the Gemini API or returns mock data."""
-    if MOCK_MODE:
-        try:
-            with open('mock_data.html', 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            logging.error("mock_data.html not found. Please create it for MOCK_MODE.")
-            return "Error: Mock data file not found."
-    
+    """
+    Generates content using the configured model backend.
+
+    Raises `ModelError` when the model cannot produce an answer in time.
+    """
+    MODEL_TOKENS.inc(estimate_tokens(prompt), direction="in")
     try:
-        # Use the globally initialized model
-        if not gemini_model:
-            # This should not be reached if MOCK_MODE is False, but it satisfies the linter
-            # and acts as a safeguard.
-            raise RuntimeError("Gemini model not initialized. Check MOCK_MODE and API key.")
-        response = gemini_model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        logging.error(f"Error with Gemini API: {e}", exc_info=True)
-        return "Sorry, there was an error generating your itinerary. Please try again."
+        with STAGE_SECONDS.time(stage="generation"):
+            text = model_client.generate(prompt)
+    except ModelError as e:
+        _record_model_error(e)
+        raise
+    MODEL_TOKENS.inc(estimate_tokens(text), direction="out")
+    return text
+
+
+async def generate_with_gemini_async(prompt: str) -> str:
+    """Async variant of `generate_with_gemini` that does not hold a thread while waiting."""
+    MODEL_TOKENS.inc(estimate_tokens(prompt), direction="in")
+    try:
+        with STAGE_SECONDS.time(stage="generation"):
+            text = await model_client.generate_async(prompt)
+    except ModelError as e:
+        _record_model_error(e)
+        raise
+    MODEL_TOKENS.inc(estimate_tokens(text), direction="out")
+    return text
+
+
+def stream_with_gemini(prompt: str) -> Iterator[str]:
+    """Yields generated content chunk by chunk as the model produces it."""
+    MODEL_TOKENS.inc(estimate_tokens(prompt), direction="in")
+    try:
+        for chunk in model_client.stream(prompt):
+            MODEL_TOKENS.inc(estimate_tokens(chunk), direction="out")
+            yield chunk
+    except ModelError as e:
+        _record_model_error(e)
+        raise
 
 
 def sanitize_html(raw_html: str) -> str:
     """Clean and validate HTML content to prevent XSS."""
-    soup = BeautifulSoup(raw_html, 'html.parser')
-    
-    # Remove any potentially harmful tags
-    for tag in soup(['script', 'style', 'meta', 'link']):
-        tag.decompose()
-    
-    # Ensure proper structure
-    clean_html = str(soup)
-    return clean_html.strip()
+    with STAGE_SECONDS.time(stage="sanitize"):
+        return _sanitize(raw_html)
 
 
 def enhance_with_local_insights(plan: str, destination: str) -> str:
     """
-    Add local insights from a JSON file to the plan based on the destination.
+    Add local insights from the tips index to the plan based on the destination.
 
-    This function loads tips from `local_tips.json` and uses simple substring
-    matching to find a relevant tip. It's designed to be easily extendable
-    by just updating the JSON file.
+    The index is built once from `local_tips.json` and rebuilt only when the
+    file changes. The most specific place mentioned in the destination wins
+    (a city over its state); set LOCAL_TIPS_MAX_MATCHES to show several.
     """
-    try:
-        with open('local_tips.json', 'r', encoding='utf-8') as f:
-            local_tips = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logging.warning(f"Could not load or parse local_tips.json: {e}")
-        return plan  # Return original plan if tips can't be loaded
-
-    destination_lower = destination.lower()
-    for key, tip in local_tips.items():
-        if key in destination_lower:
-            plan += f'\n<div class="local-tips">\n<h3>💡 Quick Travel Tips for {key.title()}</h3>\n<p><em>{tip}</em></p>\n</div>'
-            break
+    with STAGE_SECONDS.time(stage="tips"):
+        index = local_tips.get()
+        if index is None:
+            TIPS_LOOKUPS.inc(result="unavailable")
+            return plan  # Return original plan if tips can't be loaded
+
+        matches = index.match_all(destination, limit=LOCAL_TIPS_MAX_MATCHES)
+        TIPS_LOOKUPS.inc(result="hit" if matches else "miss")
+        for match in matches:
+            plan += f'\n<div class="local-tips">\n<h3>💡 Quick Travel Tips for {match.name.title()}</h3>\n<p><em>{match.tip}</em></p>\n</div>'
 
     return plan
 
 
 # ------------------ SERVICE LOGIC ------------------ #
 
-def _process_plan_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
-    """Validates plan request data and generates an itinerary."""
+def _validate_plan_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Validates plan request data and returns the cleaned fields."""
     source = data.get("source", "").strip()
     destination = data.get("destination", "").strip()
     days_raw = data.get("days")
@@ -208,34 +494,496 @@ def _process_plan_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     except (ValueError, TypeError):
         return {"error": "Days must be a valid number."}, 400
 
-    # Generate, enhance, and sanitize the plan
-    prompt = generate_trip_prompt(source, destination, days)
-    raw_plan = generate_with_gemini(prompt)
+    return {"source": source, "destination": destination, "days": days}, 200
+
+
+def _validate_reschedule_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Validates reschedule request data and returns the cleaned fields."""
+    prev_plan = (data.get("plan") or "").strip()
+    mood = (data.get("suggestion") or "").strip()
+    plan_id = data.get("planId")
+
+    if not (prev_plan or plan_id) or not mood:
+        return {"error": "Both plan and suggestion are required!"}, 400
+    if not prev_plan:
+        # Clients that got a planId from /plan need not upload the plan again
+        prev_plan = plan_store.get(plan_id) if plan_store is not None and is_plan_id(plan_id) else None
+        if prev_plan is None:
+            return {"error": "Unknown planId. Send the plan itself instead.", "errorType": "plan_not_found"}, 404
+
+    mode = data.get("mode", "auto")
+    if mode not in RESCHEDULE_MODES:
+        return {"error": f"Mode must be one of: {', '.join(RESCHEDULE_MODES)}."}, 400
+
+    return {"plan": prev_plan, "suggestion": mood, "mode": mode}, 200
+
+
+# auto: rewrite only the days a suggestion names, or the whole plan otherwise; full: always the whole plan
+RESCHEDULE_MODES = ("auto", "full")
+
+
+def _compact_reschedule_prompts(itinerary: Itinerary, target_days: List[int], mood: str) -> List[str]:
+    """One compact prompt, or one per chunk of days when it would exceed the token budget."""
+    prompt = generate_compact_reschedule_prompt(itinerary, target_days, mood)
+    if RESCHEDULE_MAX_PROMPT_TOKENS <= 0 or estimate_tokens(prompt) <= RESCHEDULE_MAX_PROMPT_TOKENS:
+        return [prompt]
+    # Chunk prompts all carry the outline, so measure the fixed part with no days
+    fixed = estimate_tokens(generate_compact_reschedule_prompt(itinerary, [], mood))
+    chunks = chunk_by_budget(target_days, lambda number: estimate_tokens(encode_day(itinerary.day(number))) + 2,
+                             RESCHEDULE_MAX_PROMPT_TOKENS, fixed)
+    return [generate_compact_reschedule_prompt(itinerary, chunk, mood) for chunk in chunks]
+
+
+def _day_reschedule_prompts(itinerary: Itinerary, target_days: List[int], mood: str, prompt: str) -> List[str]:
+    """The HTML prompt for the named days, or one per chunk of them when it would exceed the token budget."""
+    if RESCHEDULE_MAX_PROMPT_TOKENS <= 0 or estimate_tokens(prompt) <= RESCHEDULE_MAX_PROMPT_TOKENS:
+        return [prompt]
+    fixed = estimate_tokens(generate_day_reschedule_prompt(itinerary, [], mood))
+    # Each day's label also appears in the prompt's headings and instructions
+    chunks = chunk_by_budget(target_days,
+                             lambda number: estimate_tokens(itinerary.day(number).render() + f" Day {number}," * 3),
+                             RESCHEDULE_MAX_PROMPT_TOKENS, fixed)
+    return [generate_day_reschedule_prompt(itinerary, chunk, mood) for chunk in chunks]
+
+
+def _prepare_reschedule(fields: Dict[str, Any]) -> Tuple[List[str], Optional[Itinerary], Dict[str, int]]:
+    """
+    Builds the reschedule prompts, targeting individual days when possible.
+
+    Returns the prompts, the parsed plan when the output should be spliced
+    into it, and the prompt token usage compared with the HTML prompt.
+    Raises `PromptTooLarge` when the request does not fit the token budget.
+    """
+    prev_plan, mood = fields["plan"], fields["suggestion"]
+    itinerary = parse_itinerary(sanitize_html(prev_plan))
+    target_days = find_target_days(mood, itinerary.day_numbers()) if fields["mode"] != "full" else []
+    if target_days:
+        html_prompt = generate_day_reschedule_prompt(itinerary, target_days, mood)
+    else:
+        html_prompt = generate_reschedule_prompt(prev_plan, mood)
+
+    try:
+        if RESCHEDULE_PROMPT_FORMAT == "compact" and can_encode(itinerary):
+            prompts = _compact_reschedule_prompts(itinerary, target_days or itinerary.day_numbers(), mood)
+        elif target_days:
+            prompts = _day_reschedule_prompts(itinerary, target_days, mood, html_prompt)
+        else:
+            html_tokens = estimate_tokens(html_prompt)
+            if 0 < RESCHEDULE_MAX_PROMPT_TOKENS < html_tokens:
+                raise PromptTooLarge(html_tokens, RESCHEDULE_MAX_PROMPT_TOKENS)
+            prompts = [html_prompt]
+            itinerary = None
+    except PromptTooLarge as e:
+        raise PromptTooLarge(e.tokens, e.limit, target_days) from e
+
+    sent, html_equivalent = sum(estimate_tokens(prompt) for prompt in prompts), estimate_tokens(html_prompt)
+    PROMPT_TOKENS.inc(sent, prompt="sent")
+    PROMPT_TOKENS.inc(html_equivalent, prompt="html_equivalent")
+    return prompts, itinerary, {"sent": sent, "htmlEquivalent": html_equivalent,
+                                "saved": html_equivalent - sent, "calls": len(prompts)}
+
+
+def _finish_reschedule(raw_plans: List[str], itinerary: Optional[Itinerary]) -> Tuple[str, List[int]]:
+    """
+    Sanitizes the model output, splicing rewritten days into the original plan.
+    Raises `ModelError` when no day in the output can be parsed.
+    """
+    if itinerary is None:
+        return sanitize_html(inflate(raw_plans[0])), []
+
+    # The model opens with an acknowledgement, then the rewritten days
+    acknowledgement, changed_days = [], []
+    for raw_plan in raw_plans:
+        updates = parse_itinerary(sanitize_html(inflate(raw_plan)))
+        changed_days += splice_days(itinerary, updates.days)
+        acknowledgement = acknowledgement or updates.header
+    if not changed_days:
+        # Returning the old plan as a success would also get it cached for this suggestion
+        raise ModelError("internal", "reschedule output contained none of the plan's days")
+    if acknowledgement:
+        # Replaces the previous reschedule's acknowledgement instead of stacking on it
+        itinerary.replace_preamble(acknowledgement)
+    return render_itinerary(itinerary), sorted(changed_days)
+
+
+def _generate_all(prompts: List[str]) -> List[str]:
+    if len(prompts) == 1:
+        return [generate_with_gemini(prompts[0])]
+    with ThreadPoolExecutor(max_workers=min(PLAN_FANOUT_WIDTH, len(prompts))) as pool:
+        return list(pool.map(generate_with_gemini, prompts))
+
+
+async def _generate_all_async(prompts: List[str]) -> List[str]:
+    return list(await asyncio.gather(*(generate_with_gemini_async(prompt) for prompt in prompts)))
+
+
+def _prompt_too_large_response(error: PromptTooLarge) -> Tuple[Dict[str, Any], int]:
+    if error.target_days:
+        # Naming days cannot help: they were named, and were already sent one group at a time
+        days = ", ".join(f"Day {number}" for number in error.target_days)
+        message = f"The selected days ({days}) are too long to reschedule, even one at a time. Please shorten them."
+    else:
+        message = "This itinerary is too long to reschedule at once. Please name the days you want to change."
+    response_data = {"error": message, "errorType": "prompt_too_large", "promptTokens": error.tokens,
+                     "limit": error.limit}
+    if error.target_days:
+        response_data["targetDays"] = error.target_days
+    return response_data, 413
+
+
+def _reschedule_response(formatted_plan: str, itinerary: Optional[Itinerary], changed_days: List[int],
+                         token_usage: Dict[str, int]) -> Dict[str, Any]:
+    response_data: Dict[str, Any] = {"updatedPlan": formatted_plan, "message": RESCHEDULE_MESSAGE,
+                                     "promptTokens": token_usage}
+    if itinerary is not None:
+        response_data["changedDays"] = changed_days
+    return _with_plan_id(response_data, formatted_plan)
+
+
+def _with_plan_id(response_data: Dict[str, Any], plan: str) -> Dict[str, Any]:
+    """Stores the plan and adds its planId to the response (when the plan store is enabled)."""
+    if plan_store is not None:
+        response_data["planId"] = plan_store.put(plan)
+    return response_data
+
+
+def _reschedule_cache_scope(fields: Dict[str, Any]) -> str:
+    # The same suggestion can produce a different result per mode and prompt format
+    return f"{fields['mode']}:{RESCHEDULE_PROMPT_FORMAT}"
+
+
+def _cached_reschedule(fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """A previous response to this or a near-identical suggestion on the same plan."""
+    if reschedule_cache is None:
+        return None
+    cached = reschedule_cache.get(fields["plan"], fields["suggestion"], _reschedule_cache_scope(fields))
+    if cached is None:
+        return None
+    response_data, similarity = cached
+    html_equivalent = response_data["promptTokens"]["htmlEquivalent"]
+    response_data["promptTokens"] = {"sent": 0, "htmlEquivalent": html_equivalent, "saved": html_equivalent, "calls": 0}
+    response_data["cached"] = True
+    response_data["similarity"] = round(similarity, 3)
+    # The stored plan may have been evicted since the response was cached
+    return _with_plan_id(response_data, response_data["updatedPlan"])
+
+
+def _remember_reschedule(fields: Dict[str, Any], response_data: Dict[str, Any]) -> Dict[str, Any]:
+    if reschedule_cache is not None:
+        reschedule_cache.set(fields["plan"], fields["suggestion"], response_data, _reschedule_cache_scope(fields))
+    return response_data
+
+
+def _plan_message(source: str, destination: str, days: int) -> str:
+    return f"Your efficient {days}-day itinerary from {source} to {destination} is ready! 🎉"
+
+
+RESCHEDULE_MESSAGE = "Your itinerary has been updated with better timing! ✨"
+
+
+def _prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _plan_cache_key(source: str, destination: str, days: int, generation_mode: str) -> str:
+    """
+    Cached plans carry local tips and differ by generation mode, so a tips
+    reload or a mode switch must not serve plans made the old way.
+    """
+    local_tips.get()  # Picks up a changed tips file before its version goes into the key
+    tips_version = f"{local_tips.version}:{LOCAL_TIPS_MAX_MATCHES}"
+    return make_plan_cache_key(source, destination, days, PROMPT_VERSION, generation_mode, tips_version)
+
+
+def _generation_mode(days: int) -> str:
+    return "parallel" if _use_parallel_generation(days) else "single"
+
+
+def _use_parallel_generation(days: int) -> bool:
+    if PLAN_GENERATION_MODE == "auto":
+        return days >= PLAN_PARALLEL_MIN_DAYS
+    return PLAN_GENERATION_MODE == "parallel"
+
+
+def _assemble_parallel_plan(destination: str, days: int, skeleton: Skeleton,
+                            day_plans: List[Optional[DayPlan]]) -> Tuple[str, bool]:
+    """Joins per-day results in order, filling gaps with placeholders."""
+    sections = [f"<h1>🗺️ Your {days}-Day {destination} Adventure</h1>"]
+    if skeleton.intro:
+        sections.append(f"<p>{skeleton.intro}</p>")
+    sections += [(plan or placeholder_day(day)).render() for day, plan in zip(skeleton.days, day_plans)]
+    return "\n".join(sections), all(plan is not None for plan in day_plans)
+
+
+def _generate_plan_parallel(source: str, destination: str, days: int) -> Tuple[str, bool]:
+    """Generates a skeleton, then every day concurrently. Returns the plan and whether all days succeeded."""
+    skeleton_text = generate_with_gemini(generate_skeleton_prompt(source, destination, days))
+    skeleton = parse_skeleton(skeleton_text, days, destination)
+
+    def generate_day(day: SkeletonDay) -> Optional[DayPlan]:
+        raw_day = generate_with_gemini(generate_day_prompt(source, destination, days, day, skeleton.outline()))
+        return extract_day(sanitize_html(raw_day), day)
+
+    day_plans = generate_days(skeleton.days, generate_day, PLAN_FANOUT_WIDTH, PLAN_DAY_TIMEOUT, day_pool)
+    return _assemble_parallel_plan(destination, days, skeleton, day_plans)
+
+
+async def _generate_plan_parallel_async(source: str, destination: str, days: int) -> Tuple[str, bool]:
+    """Async variant of `_generate_plan_parallel`; parsing and sanitizing run off the event loop."""
+    skeleton_text = await generate_with_gemini_async(generate_skeleton_prompt(source, destination, days))
+    skeleton = await asyncio.to_thread(parse_skeleton, skeleton_text, days, destination)
+
+    async def generate_day(day: SkeletonDay) -> Optional[DayPlan]:
+        raw_day = await generate_with_gemini_async(generate_day_prompt(source, destination, days, day, skeleton.outline()))
+        return await asyncio.to_thread(lambda: extract_day(sanitize_html(raw_day), day))
+
+    day_plans = await generate_days_async(skeleton.days, generate_day, PLAN_FANOUT_WIDTH, PLAN_DAY_TIMEOUT)
+    return _assemble_parallel_plan(destination, days, skeleton, day_plans)
+
+
+def _finish_plan(raw_plan: str, destination: str, cache_key: str, complete: bool = True) -> str:
+    """Enhances and sanitizes a freshly generated plan, then caches it."""
     enhanced_plan = enhance_with_local_insights(raw_plan, destination)
     formatted_plan = sanitize_html(enhanced_plan)
 
+    # Never cache a plan with missing days
+    if plan_cache and complete:
+        plan_cache.set(cache_key, formatted_plan)
+    return formatted_plan
+
+
+def _process_plan_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Validates plan request data and generates an itinerary."""
+    fields, status_code = _validate_plan_request(data)
+    if status_code != 200:
+        return fields, status_code
+    source, destination, days = fields["source"], fields["destination"], fields["days"]
+
+    # Serve popular routes from the cache before paying for a model call
+    cache_key = _plan_cache_key(source, destination, days, _generation_mode(days))
+    formatted_plan = plan_cache.get(cache_key) if plan_cache else None
+
+    if formatted_plan is None:
+        def generate() -> str:
+            if _use_parallel_generation(days):
+                raw_plan, complete = _generate_plan_parallel(source, destination, days)
+                return _finish_plan(raw_plan, destination, cache_key, complete)
+            with STAGE_SECONDS.time(stage="prompt_build"):
+                prompt = generate_trip_prompt(source, destination, days)
+            raw_plan = generate_with_gemini(prompt)
+            return _finish_plan(raw_plan, destination, cache_key)
+
+        try:
+            formatted_plan = generation_flight.do(f"plan:{cache_key}", generate)
+        except ModelError as e:
+            return e.to_response(), e.status_code
+
     response_data = {
         "plan": formatted_plan,
-        "message": f"Your efficient {days}-day itinerary from {source} to {destination} is ready! 🎉"
+        "message": _plan_message(source, destination, days)
     }
-    return response_data, 200
+    return _with_plan_id(response_data, formatted_plan), 200
+
+
+async def _process_plan_request_async(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Async variant of `_process_plan_request` that awaits the model call. Cache
+    and store access, prompt building and sanitizing run in worker threads so
+    they never stall the event loop.
+    """
+    fields, status_code = _validate_plan_request(data)
+    if status_code != 200:
+        return fields, status_code
+    source, destination, days = fields["source"], fields["destination"], fields["days"]
+
+    cache_key = _plan_cache_key(source, destination, days, _generation_mode(days))
+    formatted_plan = await asyncio.to_thread(plan_cache.get, cache_key) if plan_cache else None
+
+    if formatted_plan is None:
+        async def generate() -> str:
+            if _use_parallel_generation(days):
+                raw_plan, complete = await _generate_plan_parallel_async(source, destination, days)
+                return await asyncio.to_thread(_finish_plan, raw_plan, destination, cache_key, complete)
+            with STAGE_SECONDS.time(stage="prompt_build"):
+                prompt = await asyncio.to_thread(generate_trip_prompt, source, destination, days)
+            raw_plan = await generate_with_gemini_async(prompt)
+            return await asyncio.to_thread(_finish_plan, raw_plan, destination, cache_key)
+
+        try:
+            formatted_plan = await async_generation_flight.do(f"plan:{cache_key}", generate)
+        except ModelError as e:
+            return e.to_response(), e.status_code
+
+    response_data = {"plan": formatted_plan, "message": _plan_message(source, destination, days)}
+    return await asyncio.to_thread(_with_plan_id, response_data, formatted_plan), 200
+
 
-def _process_reschedule_request(data: Dict[str, Any]) -> Tuple[Dict[str, str], int]:
+def _process_reschedule_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """Validates reschedule request data and updates an itinerary."""
-    prev_plan = data.get("plan", "").strip()
-    mood = data.get("suggestion", "").strip()
+    fields, status_code = _validate_reschedule_request(data)
+    if status_code != 200:
+        return fields, status_code
+    cached = _cached_reschedule(fields)
+    if cached is not None:
+        return cached, 200
 
-    if not prev_plan or not mood:
-        return {"error": "Both plan and suggestion are required!"}, 400
+    try:
+        with STAGE_SECONDS.time(stage="prompt_build"):
+            prompts, itinerary, token_usage = _prepare_reschedule(fields)
+    except PromptTooLarge as e:
+        return _prompt_too_large_response(e)
+    try:
+        # Only the model call is shared: plans with the same outline can get the same
+        # prompts, so every caller splices the output into its own plan
+        raw_plans = generation_flight.do(f"reschedule:{_prompt_key(''.join(prompts))}", lambda: _generate_all(prompts))
+        formatted_plan, changed_days = _finish_reschedule(raw_plans, itinerary)
+    except ModelError as e:
+        return e.to_response(), e.status_code
+
+    return _remember_reschedule(fields, _reschedule_response(formatted_plan, itinerary, changed_days, token_usage)), 200
 
-    prompt = generate_reschedule_prompt(prev_plan, mood)
-    updated_raw_plan = generate_with_gemini(prompt)
-    formatted_plan = sanitize_html(updated_raw_plan)
 
-    return {"updatedPlan": formatted_plan, "message": "Your itinerary has been updated with better timing! ✨"}, 200
+async def _process_reschedule_request_async(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Async variant of `_process_reschedule_request`; everything but the model call runs in worker threads."""
+    fields, status_code = await asyncio.to_thread(_validate_reschedule_request, data)
+    if status_code != 200:
+        return fields, status_code
+    cached = await asyncio.to_thread(_cached_reschedule, fields)
+    if cached is not None:
+        return cached, 200
+
+    try:
+        with STAGE_SECONDS.time(stage="prompt_build"):
+            prompts, itinerary, token_usage = await asyncio.to_thread(_prepare_reschedule, fields)
+    except PromptTooLarge as e:
+        return _prompt_too_large_response(e)
+
+    try:
+        # As in the sync variant, each caller splices the shared output into its own plan
+        raw_plans = await async_generation_flight.do(
+            f"reschedule:{_prompt_key(''.join(prompts))}", lambda: _generate_all_async(prompts))
+        formatted_plan, changed_days = await asyncio.to_thread(_finish_reschedule, raw_plans, itinerary)
+    except ModelError as e:
+        return e.to_response(), e.status_code
+
+    return await asyncio.to_thread(
+        lambda: _remember_reschedule(fields, _reschedule_response(formatted_plan, itinerary, changed_days, token_usage))
+    ), 200
+
+
+def _stream_error(error: Exception) -> Dict[str, Any]:
+    if isinstance(error, ModelError):
+        return error.to_response()
+    return {"error": GENERATION_ERROR_MESSAGE}
+
+
+def _stream_plan_events(source: str, destination: str, days: int) -> Iterator[str]:
+    """Streams a plan as SSE events, one event per completed day section."""
+    # Streaming always generates the plan in one call
+    cache_key = _plan_cache_key(source, destination, days, "single")
+    cached_plan = plan_cache.get(cache_key) if plan_cache else None
+    if cached_plan is not None:
+        yield from section_events(split_sections(cached_plan))
+        yield format_sse("done", _with_plan_id({"message": _plan_message(source, destination, days)}, cached_plan))
+        return
+
+    sections = []
+    try:
+        sanitizer = IncrementalSanitizer(sanitize_html)
+        for chunk in stream_with_gemini(generate_trip_prompt(source, destination, days)):
+            ready = sanitizer.feed(chunk)
+            yield from section_events(ready, len(sections))
+            sections.extend(ready)
+        ready = sanitizer.close()
+        yield from section_events(ready, len(sections))
+        sections.extend(ready)
+    except Exception as e:
+        logging.error(f"Error streaming plan: {e}", exc_info=True)
+        yield format_sse("error", _stream_error(e))
+        return
+
+    tips = sanitize_html(enhance_with_local_insights("", destination))
+    if tips:
+        yield format_sse("tips", {"index": len(sections), "html": tips})
+        sections.append(tips)
+
+    plan = "\n".join(sections)
+    if plan_cache and sections:
+        plan_cache.set(cache_key, plan)
+    done = {"message": _plan_message(source, destination, days)}
+    yield format_sse("done", _with_plan_id(done, plan) if sections else done)
+
+
+def _stream_reschedule_events(prev_plan: str, mood: str) -> Iterator[str]:
+    """Streams a rescheduled plan as SSE events, one event per completed day section."""
+    index = 0
+    try:
+        sanitizer = IncrementalSanitizer(sanitize_html)
+        for chunk in stream_with_gemini(generate_reschedule_prompt(prev_plan, mood)):
+            ready = sanitizer.feed(chunk)
+            yield from section_events(ready, index)
+            index += len(ready)
+        yield from section_events(sanitizer.close(), index)
+    except Exception as e:
+        logging.error(f"Error streaming reschedule: {e}", exc_info=True)
+        yield format_sse("error", _stream_error(e))
+        return
+    yield format_sse("done", {"message": RESCHEDULE_MESSAGE})
+
+
+def _sse_response(events: Iterator[str]) -> Response:
+    # X-Accel-Buffering stops nginx from holding events back until the end
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # ---------------- ROUTES ---------------- #
 
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response: Response) -> Response:
+    # Streaming responses are timed up to their first byte
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        observe_request(endpoint, response.status_code, time.perf_counter() - started)
+    return response
+
+
+@app.after_request
+def _compress_response(response: Response) -> Response:
+    """Compresses JSON bodies for clients that accept gzip or brotli."""
+    if (not RESPONSE_COMPRESSION or response.mimetype != "application/json" or response.is_streamed
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"), RESPONSE_COMPRESSION)
+    if encoding is None:
+        return response
+    with STAGE_SECONDS.time(stage="compress"):
+        response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # A strong ETag names exact bytes; the compressed body only matches weakly
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _json_response(response_data: Dict[str, Any], status_code: int) -> Tuple[Response, int]:
+    """JSON response that also sets Retry-After when the pipeline asks clients to back off."""
+    response = jsonify(response_data)
+    if "retryAfter" in response_data:
+        response.headers["Retry-After"] = str(response_data["retryAfter"])
+    return response, status_code
+
+
 @app.route("/plan", methods=["POST"])
 def plan_trip() -> Tuple[Response, int]:
     """Generates a new trip itinerary based on user input."""
@@ -245,7 +993,7 @@ def plan_trip() -> Tuple[Response, int]:
             return jsonify({"error": "Request body must be JSON."}), 400
 
         response_data, status_code = _process_plan_request(data)
-        return jsonify(response_data), status_code
+        return _json_response(response_data, status_code)
     except Exception as e:
         logging.error(f"Error in /plan: {e}", exc_info=True)
         return jsonify({"error": "An error occurred while generating the plan. Please try again."}), 500
@@ -260,20 +1008,198 @@ def reschedule_plan() -> Tuple[Response, int]:
             return jsonify({"error": "Request body must be JSON."}), 400
 
         response_data, status_code = _process_reschedule_request(data)
-        return jsonify(response_data), status_code
+        return _json_response(response_data, status_code)
     except Exception as e:
         logging.error(f"Error in /reschedule: {e}", exc_info=True)
         return jsonify({"error": "An error occurred while rescheduling the plan. Please try again."}), 500
 
 
+@app.route("/plan/<plan_id>", methods=["GET"])
+def get_plan(plan_id: str) -> Tuple[Response, int]:
+    """
+    Returns a stored plan by the planId /plan and /reschedule responses carry.
+
+    The ID is a hash of the plan, so it is also the ETag: a client sending it
+    back in If-None-Match gets 304 without the plan being read at all.
+    """
+    if not is_plan_id(plan_id):
+        return jsonify({"error": "Plan not found.", "errorType": "plan_not_found"}), 404
+    if request.if_none_match.contains_weak(plan_id):
+        response = Response(status=304)
+    else:
+        plan = plan_store.get(plan_id) if plan_store is not None else None
+        if plan is None:
+            return jsonify({"error": "Plan not found.", "errorType": "plan_not_found"}), 404
+        response = jsonify({"planId": plan_id, "plan": plan})
+    response.set_etag(plan_id)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response, response.status_code
+
+
+@app.route("/plan/stream", methods=["POST"])
+def plan_trip_stream() -> Tuple[Response, int]:
+    """Streams a new trip itinerary day by day as Server-Sent Events."""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Request body must be JSON."}), 400
+
+    fields, status_code = _validate_plan_request(data)
+    if status_code != 200:
+        return jsonify(fields), status_code
+    return _sse_response(_stream_plan_events(fields["source"], fields["destination"], fields["days"])), 200
+
+
+@app.route("/reschedule/stream", methods=["POST"])
+def reschedule_plan_stream() -> Tuple[Response, int]:
+    """Streams a rescheduled itinerary day by day as Server-Sent Events."""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Request body must be JSON."}), 400
+
+    fields, status_code = _validate_reschedule_request(data)
+    if status_code != 200:
+        return jsonify(fields), status_code
+    return _sse_response(_stream_reschedule_events(fields["plan"], fields["suggestion"])), 200
+
+
+@app.route("/plan/batch", methods=["POST"])
+def plan_batch() -> Tuple[Response, int]:
+    """
+    Generates many itineraries in one request.
+
+    Accepts `{"jobs": [...]}`, a JSON list, or JSONL of {source, destination,
+    days}. Streams one JSON line per job as it finishes, then a final
+    `{"summary": ...}` line.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        entries = data.get("jobs") if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            return jsonify({"error": 'Send {"jobs": [...]}, a JSON list or JSONL.'}), 400
+        jobs, invalid = make_jobs(enumerate(entries, start=1))
+    else:
+        jobs, invalid = parse_jobs(request.get_data(as_text=True))
+    if not jobs and not invalid:
+        return jsonify({"error": "No jobs found in the request."}), 400
+    if len(jobs) + len(invalid) > BATCH_MAX_JOBS:
+        return jsonify({"error": f"A batch can contain at most {BATCH_MAX_JOBS} jobs."}), 413
+
+    run = BatchRun(jobs, _process_plan_request, BATCH_WORKERS, invalid=len(invalid))
+
+    def lines() -> Iterator[str]:
+        for record in invalid:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        for record in run:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        yield json.dumps({"summary": run.summary.to_dict()}) + "\n"
+
+    return Response(lines(), mimetype="application/x-ndjson"), 200
+
+
 @app.route("/health", methods=["GET"])
 def health_check() -> Response:
     """Health check endpoint"""
     return jsonify({"status": "healthy", "message": "Travel planner is ready to create efficient itineraries!"})
 
 
+def collect_stats() -> Dict[str, Any]:
+    """Gathers counters from the request pipeline."""
+    return {
+        "backend": llm_backend.name,
+        "model_client": model_client.stats(),
+        "plan_cache": plan_cache.stats() if plan_cache else None,
+        "reschedule_cache": reschedule_cache.stats() if reschedule_cache else None,
+        "plan_store": plan_store.stats() if plan_store is not None else None,
+        "singleflight": {"threads": generation_flight.stats(), "async": async_generation_flight.stats()},
+        "startup": dict(startup_timings),
+    }
+
+
+@app.route("/stats", methods=["GET"])
+def stats() -> Response:
+    """Exposes cache counters for scraping."""
+    return jsonify(collect_stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint() -> Response:
+    """Exposes pipeline metrics in the Prometheus text format."""
+    return Response(registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/debug/profiler", methods=["GET", "POST"])
+def profiler_endpoint() -> Tuple[Response, int]:
+    """
+    Controls the sampling profiler when PROFILER_ENABLED is set.
+
+    POST {"action": "start" | "stop" | "reset", "interval": seconds} returns
+    the profiler status; GET returns the samples as collapsed stacks.
+    """
+    if not PROFILER_ENABLED:
+        return jsonify({"error": "Not found."}), 404
+    if request.method == "GET":
+        return Response(profiler.collapsed(), mimetype="text/plain"), 200
+
+    data = request.get_json(silent=True) or {}
+    action = data.get("action")
+    if action == "start":
+        interval = data.get("interval")
+        if interval is not None and (not isinstance(interval, (int, float)) or not 0.001 <= interval <= 1):
+            return jsonify({"error": "Interval must be between 0.001 and 1 second."}), 400
+        profiler.start(interval)
+    elif action == "stop":
+        profiler.stop()
+    elif action == "reset":
+        profiler.reset()
+    else:
+        return jsonify({"error": "Action must be start, stop or reset."}), 400
+    return jsonify(profiler.status()), 200
+
+
+# ---------------- WORKER LIFECYCLE ---------------- #
+
+# Seconds this process spent starting up, by phase (filled in by serve.py and warm_up)
+startup_timings: Dict[str, float] = {}
+
+WARM_UP_PLAN = (
+    "<h1>🗺️ Warm-up</h1><p>Intro</p><h2>📅 Day 1: Start</h2>"
+    "<h3>🌅 Morning: Walk</h3><p>A <strong>short</strong> walk.</p><p><strong>Estimated Daily Budget:</strong> 0</p>"
+)
+
+
+def init_worker() -> None:
+    """
+    Rebuilds the model backend in a worker forked from a process that already imported this module.
+
+    SDK clients hold connections and threads that do not survive fork(), so a
+    worker never uses the parent's. SQLite cache stores reconnect on their own.
+    """
+    global llm_backend
+    started = time.perf_counter()
+    llm_backend = create_backend(LLM_BACKEND, API_KEY)
+    startup_timings["init_worker"] = round(time.perf_counter() - started, 4)
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Does the work a first request would otherwise pay for: loads the tips
+    index, runs the sanitizer and parser once and sets up the model client.
+    No model call is made. Returns `startup_timings`.
+    """
+    steps = [
+        ("tips", lambda: local_tips.get()),
+        ("sanitizer", lambda: parse_itinerary(_sanitize(inflate(encode_itinerary(parse_itinerary(WARM_UP_PLAN)))))),
+        ("model_client", lambda: llm_backend.warm_up()),
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        startup_timings[f"warm_up_{name}"] = round(time.perf_counter() - started, 4)
+    return startup_timings
+
+
 # ---------------- MAIN ---------------- #
 
 if __name__ == "__main__":
-    # Note: debug=True is not recommended for production.
+    # Note: debug=True is not recommended for production; use serve.py instead.
     app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""
+ASGI entry point for the travel planner.
+
+Serves `/plan`, `/reschedule` and stored plans (`GET /plan/<planId>`) on an
+event loop so a single process can keep hundreds of model calls in flight
+instead of one per worker thread. Run with:
+
+    uvicorn asgi_app:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import app as planner
+import metrics
+from compression import choose_encoding, compress
+from plan_store import is_plan_id
+
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "256"))
+ASYNC_MAX_QUEUE = int(os.getenv("ASYNC_MAX_QUEUE", "0"))
+ASYNC_RETRY_AFTER = int(os.getenv("ASYNC_RETRY_AFTER", "1"))
+MAX_BODY_BYTES = 1024 * 1024
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Tuple[Dict[str, Any], int]]]
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight requests and sheds load once the cap and queue are full.
+
+    Up to `limit` requests run at once and up to `queue_size` more may wait for
+    a slot; anything beyond that is rejected immediately so clients can back off
+    instead of piling onto an overloaded process.
+    """
+
+    def __init__(self, limit: int, queue_size: int = 0):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if self._slots.locked() and self.waiting >= self.queue_size:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class PlannerASGIApp:
+    """Minimal ASGI application exposing the planner's JSON endpoints."""
+
+    def __init__(self, limiter: ConcurrencyLimiter, retry_after: int = ASYNC_RETRY_AFTER):
+        self.limiter = limiter
+        self.retry_after = retry_after
+        self.routes: Dict[Tuple[str, str], Tuple[Handler, str]] = {
+            ("POST", "/plan"): (
+                planner._process_plan_request_async,
+                "An error occurred while generating the plan. Please try again.",
+            ),
+            ("POST", "/reschedule"): (
+                planner._process_reschedule_request_async,
+                "An error occurred while rescheduling the plan. Please try again.",
+            ),
+        }
+
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        if method == "OPTIONS":
+            await self._respond(send, 204, None)
+        elif (method, path) == ("GET", "/health"):
+            await self._respond(send, 200, {
+                "status": "healthy",
+                "message": "Travel planner is ready to create efficient itineraries!",
+            })
+        elif (method, path) == ("GET", "/stats"):
+            await self._respond(send, 200, {**planner.collect_stats(), "concurrency": self.limiter.stats()})
+        elif (method, path) == ("GET", "/metrics"):
+            await self._send(send, 200, planner.registry.render().encode("utf-8"), metrics.CONTENT_TYPE)
+        elif method == "GET" and path.startswith("/plan/"):
+            await self._get_plan(scope, send, path[len("/plan/"):])
+        elif (method, path) in self.routes:
+            started = time.perf_counter()
+            status_code = await self._handle_model_route(scope, receive, send, *self.routes[(method, path)])
+            planner.observe_request(path, status_code, time.perf_counter() - started)
+        elif any(route_path == path for _, route_path in self.routes):
+            await self._respond(send, 405, {"error": "Method not allowed."})
+        else:
+            await self._respond(send, 404, {"error": "Not found."})
+
+    async def _handle_model_route(self, scope, receive, send, handler: Handler, failure_message: str) -> int:
+        """Runs a planner handler and returns the status code sent."""
+        body = await self._read_body(receive)
+        if body is None:
+            await self._respond(send, 413, {"error": "Request body is too large."})
+            return 413
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+        if not data or not isinstance(data, dict):
+            await self._respond(send, 400, {"error": "Request body must be JSON."})
+            return 400
+
+        if not await self.limiter.acquire():
+            await self._respond(send, 429, {"error": "The planner is busy. Please try again shortly."},
+                                [(b"retry-after", str(self.retry_after).encode())])
+            return 429
+        try:
+            response_data, status_code = await handler(data)
+        except asyncio.CancelledError:
+            if _being_cancelled():
+                # The server is shutting down or the client went away; nobody is left to answer
+                raise
+            # Something this request awaited was cancelled, but the client is still waiting
+            logging.error(f"Cancelled work in {scope['path']}")
+            response_data, status_code = {"error": failure_message}, 500
+        except Exception as e:
+            logging.error(f"Error in {scope['path']}: {e}", exc_info=True)
+            response_data, status_code = {"error": failure_message}, 500
+        finally:
+            self.limiter.release()
+        retry_headers = [(b"retry-after", str(response_data["retryAfter"]).encode())] if "retryAfter" in response_data else []
+        accept_encoding = dict(scope.get("headers", [])).get(b"accept-encoding", b"").decode("latin-1")
+        await self._respond(send, status_code, response_data, retry_headers, accept_encoding)
+        return status_code
+
+    async def _get_plan(self, scope, send, plan_id: str) -> None:
+        """Counterpart of the Flask app's GET /plan/<planId>: the ID doubles as a strong ETag."""
+        not_found = {"error": "Plan not found.", "errorType": "plan_not_found"}
+        if not is_plan_id(plan_id):
+            await self._respond(send, 404, not_found)
+            return
+        request_headers = dict(scope.get("headers", []))
+        cache_headers = [(b"etag", f'"{plan_id}"'.encode()),
+                         (b"cache-control", b"public, max-age=31536000, immutable")]
+        if _etag_matches(request_headers.get(b"if-none-match", b"").decode("latin-1"), plan_id):
+            await self._send(send, 304, b"", "application/json", cache_headers)
+            return
+        plan = await asyncio.to_thread(planner.plan_store.get, plan_id) if planner.plan_store is not None else None
+        if plan is None:
+            await self._respond(send, 404, not_found)
+            return
+        accept_encoding = request_headers.get(b"accept-encoding", b"").decode("latin-1")
+        await self._respond(send, 200, {"planId": plan_id, "plan": plan}, cache_headers, accept_encoding)
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _respond(send, status_code: int, payload: Optional[Dict[str, Any]],
+                       extra_headers: Optional[List[Tuple[bytes, bytes]]] = None,
+                       accept_encoding: Optional[str] = None) -> None:
+        """
+        Sends JSON, compressed as the app's RESPONSE_COMPRESSION allows when
+        `accept_encoding` is given. Compression runs in a worker thread.
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        headers = list(extra_headers or [])
+        if (accept_encoding is not None and planner.RESPONSE_COMPRESSION
+                and len(body) >= planner.RESPONSE_COMPRESSION_MIN_BYTES):
+            headers.append((b"vary", b"accept-encoding"))
+            encoding = choose_encoding(accept_encoding, planner.RESPONSE_COMPRESSION)
+            if encoding is not None:
+                body = await asyncio.to_thread(compress, body, encoding)
+                headers.append((b"content-encoding", encoding.encode()))
+        await PlannerASGIApp._send(send, status_code, body, "application/json", headers)
+
+    @staticmethod
+    async def _send(send, status_code: int, body: bytes, content_type: str,
+                    extra_headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        # Same permissive CORS policy the Flask app gets from flask_cors
+        headers = [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*"),
+            (b"access-control-allow-headers", b"content-type"),
+            (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+        ] + (extra_headers or [])
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _lifespan(receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Pay the first request's one-off costs before the server accepts connections
+                try:
+                    await asyncio.to_thread(planner.warm_up)
+                except Exception as e:
+                    logging.error(f"Warm-up failed: {e}", exc_info=True)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                logging.info(f"Warmed up: {planner.startup_timings}")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires: W/"x" matches "x", and * matches anything."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/").strip('"') == etag:
+            return True
+    return False
+
+
+def _being_cancelled() -> bool:
+    """Whether the current task itself was cancelled, as opposed to something it awaited."""
+    task = asyncio.current_task()
+    # Task.cancelling() is new in 3.11; before that, assume the task was cancelled
+    cancelling = getattr(task, "cancelling", None)
+    return task is None or cancelling is None or cancelling() > 0
+
+
+application = PlannerASGIApp(ConcurrencyLimiter(ASYNC_MAX_IN_FLIGHT, ASYNC_MAX_QUEUE))
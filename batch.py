@@ -0,0 +1,302 @@
+"""
+Bulk itinerary generation.
+
+Jobs are `{"source", "destination", "days"}` objects, read from a JSON list
+or JSONL. Duplicates (same normalized places and days) run once. Jobs run on
+a bounded worker pool, and each result is appended to a JSONL file as soon
+as it finishes. That file doubles as the checkpoint: rerunning with the same
+output skips every job that already succeeded.
+
+    python batch.py jobs.jsonl --output plans.jsonl [--workers 8] [--summary summary.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Set, Tuple
+
+from plan_cache import normalize_place
+
+ProcessFn = Callable[[Dict[str, Any]], Tuple[Dict[str, Any], int]]
+
+
+@dataclass
+class BatchJob:
+    id: str
+    data: Dict[str, Any]
+    line: int
+
+
+def job_id(data: Dict[str, Any]) -> str:
+    """Stable id shared by every spelling of the same (source, destination, days)."""
+    key = [normalize_place(str(data.get("source", ""))), normalize_place(str(data.get("destination", ""))),
+           str(data.get("days", "")).strip()]
+    return hashlib.sha256(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def make_jobs(entries: Iterable[Tuple[int, Any]]) -> Tuple[List[BatchJob], List[Dict[str, Any]]]:
+    """
+    Turns numbered entries into jobs.
+
+    Returns the jobs and a result record for every entry that is not a JSON
+    object, so bad input is reported rather than silently dropped.
+    """
+    jobs, invalid = [], []
+    for number, entry in entries:
+        if isinstance(entry, dict):
+            jobs.append(BatchJob(job_id(entry), entry, number))
+        else:
+            reason = f"Invalid JSON: {entry}" if isinstance(entry, ValueError) else "Each job must be a JSON object."
+            invalid.append({"line": number, "status": "error", "statusCode": 400, "error": reason})
+    return jobs, invalid
+
+
+def parse_jobs(text: str) -> Tuple[List[BatchJob], List[Dict[str, Any]]]:
+    """Parses a JSON list or JSONL document into jobs (see `make_jobs`)."""
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        try:
+            document = json.loads(stripped)
+        except ValueError as e:
+            return [], [{"line": 0, "status": "error", "statusCode": 400, "error": f"Invalid JSON: {e}"}]
+        return make_jobs(enumerate(document, start=1))
+
+    entries: List[Tuple[int, Any]] = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            entries.append((number, json.loads(line)))
+        except ValueError as e:
+            entries.append((number, e))
+    return make_jobs(entries)
+
+
+def completed_job_ids(lines: Iterable[str]) -> Set[str]:
+    """Ids of jobs that already succeeded in a previous run's output."""
+    done = set()
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # A line cut short by a crash
+        if isinstance(record, dict) and record.get("status") == "ok":
+            done.add(record.get("id"))
+    return done
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    unique: int = 0
+    duplicates: int = 0
+    resumed: int = 0
+    invalid: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    failures: Dict[str, int] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(share: float) -> Optional[float]:
+            return round(ordered[min(len(ordered) - 1, int(share * len(ordered)))], 3) if ordered else None
+
+        processed = self.succeeded + self.failed
+        return {
+            "total": self.total,
+            "unique": self.unique,
+            "duplicates": self.duplicates,
+            "resumed": self.resumed,
+            "invalid": self.invalid,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "failures": dict(self.failures),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "jobs_per_second": round(processed / self.elapsed_seconds, 3) if self.elapsed_seconds else 0.0,
+            "job_seconds": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
+
+
+def _run_job(process: ProcessFn, job: BatchJob) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        response, status_code = process(job.data)
+    except Exception as e:
+        response, status_code = {"error": f"{type(e).__name__}: {e}"}, 500
+    record: Dict[str, Any] = {
+        "id": job.id,
+        "line": job.line,
+        "source": job.data.get("source"),
+        "destination": job.data.get("destination"),
+        "days": job.data.get("days"),
+        "status": "ok" if status_code == 200 else "error",
+        "statusCode": status_code,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    if status_code == 200:
+        record["plan"] = response.get("plan")
+        if "planId" in response:
+            record["planId"] = response["planId"]
+    else:
+        record["error"] = response.get("error")
+        record["errorType"] = response.get("errorType", "invalid_request" if status_code == 400 else "internal")
+    return record
+
+
+class BatchRun:
+    """
+    Runs unique jobs with at most `workers` in flight.
+
+    Iterating yields each result as it completes; `summary` is up to date
+    once iteration ends (or is interrupted).
+    """
+
+    def __init__(self, jobs: List[BatchJob], process: ProcessFn, workers: int = 4,
+                 skip_ids: Optional[Set[str]] = None, invalid: int = 0):
+        self.process = process
+        self.workers = max(1, workers)
+        self.summary = BatchSummary(total=len(jobs) + invalid, invalid=invalid)
+        self.queue: List[BatchJob] = []
+        seen: Set[str] = set()
+        for job in jobs:
+            if job.id in seen:
+                self.summary.duplicates += 1
+                continue
+            seen.add(job.id)
+            if skip_ids and job.id in skip_ids:
+                self.summary.resumed += 1
+            else:
+                self.queue.append(job)
+        self.summary.unique = len(seen)
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        summary = self.summary
+        summary.latencies.append(record["seconds"])
+        if record["status"] == "ok":
+            summary.succeeded += 1
+        else:
+            summary.failed += 1
+            summary.failures[record["errorType"]] = summary.failures.get(record["errorType"], 0) + 1
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+        pending: Set[Future] = set()
+        position = 0
+        try:
+            while position < len(self.queue) or pending:
+                # Submit lazily so a huge batch never queues more than one wave ahead
+                while position < len(self.queue) and len(pending) < self.workers * 2:
+                    pending.add(pool.submit(_run_job, self.process, self.queue[position]))
+                    position += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    self._record(record)
+                    yield record
+        finally:
+            # On interruption, let running jobs finish but start no new ones
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.summary.elapsed_seconds = time.perf_counter() - started
+
+
+class JsonlWriter:
+    """Appends one JSON object per line and flushes it, so finished jobs survive a crash."""
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def drop_partial_line(path: str, block_size: int = 65536) -> int:
+    """
+    Cuts off a last line that a crash left unfinished, so appended records
+    start on a line of their own. Returns the number of bytes removed.
+    """
+    try:
+        f = open(path, 'rb+')
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        f.truncate(end)
+        return size - end
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-generate itineraries from a JSON list or JSONL of jobs.")
+    parser.add_argument("jobs", help="JSON list or JSONL file of {source, destination, days} jobs ('-' for stdin)")
+    parser.add_argument("--output", required=True, help="JSONL results file; existing successes are skipped")
+    parser.add_argument("--workers", type=int, default=4, help="jobs generated at the same time")
+    parser.add_argument("--summary", help="also write the run summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.jobs == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.jobs, 'r', encoding='utf-8') as f:
+            text = f.read()
+    jobs, invalid = parse_jobs(text)
+
+    if drop_partial_line(args.output):
+        print("Dropped an unfinished last line from the output; that job will run again.", file=sys.stderr)
+    try:
+        with open(args.output, 'r', encoding='utf-8') as f:
+            done = completed_job_ids(f)
+    except FileNotFoundError:
+        done = set()
+
+    # Imported here so parsing and --help stay fast
+    from app import _process_plan_request
+
+    with open(args.output, 'a', encoding='utf-8') as f:
+        writer = JsonlWriter(f)
+        for record in invalid:
+            writer.write(record)
+
+        def on_result(record: Dict[str, Any]) -> None:
+            writer.write(record)
+            print(f"[{record['status']}] {record['source']} -> {record['destination']} ({record['days']} days) "
+                  f"{record['seconds']:.1f}s", file=sys.stderr)
+
+        run = BatchRun(jobs, _process_plan_request, args.workers, done, invalid=len(invalid))
+        try:
+            for record in run:
+                on_result(record)
+        except KeyboardInterrupt:
+            print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+            return 130
+
+    summary = run.summary
+    report = summary.to_dict()
+    print(json.dumps(report, indent=2))
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0 if summary.failed == 0 and summary.invalid == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
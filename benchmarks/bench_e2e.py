@@ -0,0 +1,267 @@
+"""
+End-to-end load test for /plan and /reschedule against the simulated model.
+
+    python -m benchmarks.bench_e2e [--transport test-client server] [--days 1 7 14 30]
+                                   [--concurrency 1 8 32] [--requests 40] [--json results.json]
+                                   [--baseline previous.json --tolerance 0.2]
+
+Requests go through the Flask test client (app overhead only) and through a
+threaded WSGI server on a local port (adds HTTP parsing and sockets). The
+model is `SimulatedBackend`, so results are repeatable and need no API key.
+
+Each cell reports requests/sec, latency percentiles and the average time per
+request spent building prompts, generating, adding tips and sanitizing.
+Generation time is summed across concurrent per-day calls in parallel mode.
+With `--baseline`, cells whose throughput drops or p99 grows by more than
+`--tolerance` are listed and the exit status is 1.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("LLM_BACKEND", "simulated")
+
+import app as planner
+from llm_backends import SimulatedBackend, simulate_response
+
+STAGES = {
+    "prompt_build": ["generate_trip_prompt", "generate_reschedule_prompt", "generate_day_reschedule_prompt",
+                     "generate_compact_reschedule_prompt", "generate_skeleton_prompt", "generate_day_prompt"],
+    "generation": ["generate_with_gemini"],
+    "tips": ["enhance_with_local_insights"],
+    "sanitize": ["sanitize_html"],
+}
+SUGGESTIONS = ["I'm tired on day 2, please make it slower", "Make the whole trip more relaxing",
+               "The last day feels rushed", "We want more adventure", "Keep it cheaper on day 1"]
+
+
+class StageTimer:
+    """Accumulates wall time per pipeline stage across threads."""
+
+    def __init__(self):
+        self._totals: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._totals[stage] += elapsed
+        return timed
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+    def per_request_ms(self, requests: int) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(self._totals[stage] / requests * 1000, 3) for stage in STAGES}
+
+
+def instrument(timer: StageTimer) -> None:
+    """Replaces the pipeline functions in `app` with timed wrappers."""
+    for stage, names in STAGES.items():
+        for name in names:
+            setattr(planner, name, timer.wrap(stage, getattr(planner, name)))
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(share * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def build_bodies(endpoint: str, days: int, count: int, seed: int) -> List[Dict[str, Any]]:
+    """Distinct request bodies, so neither the cache nor coalescing hides model calls."""
+    if endpoint == "plan":
+        return [{"source": f"Origin {index}", "destination": "Goa", "days": days} for index in range(count)]
+    bodies = []
+    for index in range(count):
+        rng = random.Random(f"{seed}:{days}:{index}")
+        plan = simulate_response(planner.generate_trip_prompt(f"Origin {index}", "Goa", days), rng)
+        bodies.append({"plan": plan, "suggestion": SUGGESTIONS[index % len(SUGGESTIONS)]})
+    return bodies
+
+
+def test_client_sender() -> Callable[[str, Dict[str, Any]], int]:
+    client = planner.app.test_client()
+
+    def send(path: str, body: Dict[str, Any]) -> int:
+        return client.post(path, json=body).status_code
+    return send
+
+
+def server_sender(port: int) -> Callable[[str, Dict[str, Any]], int]:
+    def send(path: str, body: Dict[str, Any]) -> int:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        try:
+            connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+    return send
+
+
+def run_cell(send: Callable[[str, Dict[str, Any]], int], endpoint: str,
+             bodies: List[Dict[str, Any]], concurrency: int) -> Tuple[List[float], int, float]:
+    """Sends every body with `concurrency` workers; returns latencies, errors and elapsed seconds."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(body: Dict[str, Any]) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            status = send(f"/{endpoint}", body)
+        except OSError:
+            status = 0
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, bodies))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 2),
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered), 3),
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p90": round(percentile(ordered, 0.90), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "max": round(ordered[-1], 3),
+        },
+    }
+
+
+def find_regressions(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Compares cells with a previous run's JSON output."""
+    def key(cell: Dict[str, Any]) -> Tuple:
+        return cell["transport"], cell["endpoint"], cell["days"], cell["concurrency"]
+
+    previous = {key(cell): cell for cell in baseline.get("results", [])}
+    regressions = []
+    for cell in results:
+        before = previous.get(key(cell))
+        if before is None:
+            continue
+        label = "{} /{} days={} c={}".format(*key(cell))
+        if cell["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: rps {before['rps']} -> {cell['rps']}")
+        if cell["latency_ms"]["p99"] > before["latency_ms"]["p99"] * (1 + tolerance):
+            regressions.append(f"{label}: p99 {before['latency_ms']['p99']} -> {cell['latency_ms']['p99']} ms")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transport", nargs="+", choices=["test-client", "server"], default=["test-client", "server"])
+    parser.add_argument("--endpoints", nargs="+", choices=["plan", "reschedule"], default=["plan", "reschedule"])
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 14, 30])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=40, help="requests per cell")
+    parser.add_argument("--sim-latency-ms", type=float, default=20, help="simulated time to first token")
+    parser.add_argument("--sim-tokens-per-sec", type=float, default=20000, help="simulated output speed")
+    parser.add_argument("--sim-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    planner.llm_backend = SimulatedBackend(first_token_latency=args.sim_latency_ms / 1000,
+                                           tokens_per_second=args.sim_tokens_per_sec,
+                                           error_rate=args.sim_error_rate, seed=args.seed)
+    planner.plan_cache = None
+    planner.reschedule_cache = None
+    timer = StageTimer()
+    instrument(timer)
+
+    server = None
+    senders = {}
+    if "test-client" in args.transport:
+        senders["test-client"] = test_client_sender()
+    if "server" in args.transport:
+        from werkzeug.serving import make_server
+
+        server = make_server("127.0.0.1", 0, planner.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        senders["server"] = server_sender(server.server_port)
+
+    results = []
+    print(f"{'transport':>11} {'endpoint':>10} {'days':>4} {'conc':>4} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'err':>4} {'prompt':>7} {'model':>8} {'tips':>7} {'sanit.':>7}")
+    try:
+        for transport, send in senders.items():
+            for endpoint in args.endpoints:
+                for days in args.days:
+                    bodies = build_bodies(endpoint, days, args.requests, args.seed)
+                    for concurrency in args.concurrency:
+                        timer.reset()
+                        cell = {"transport": transport, "endpoint": endpoint, "days": days,
+                                "concurrency": concurrency}
+                        cell.update(summarize(*run_cell(send, endpoint, bodies, concurrency)))
+                        cell["stages_ms"] = timer.per_request_ms(len(bodies))
+                        results.append(cell)
+                        stages, latency = cell["stages_ms"], cell["latency_ms"]
+                        print(f"{transport:>11} {endpoint:>10} {days:>4} {concurrency:>4} {cell['rps']:>8.1f} "
+                              f"{latency['p50']:>9.2f} {latency['p99']:>9.2f} {cell['errors']:>4} "
+                              f"{stages['prompt_build']:>7.3f} {stages['generation']:>8.2f} "
+                              f"{stages['tips']:>7.3f} {stages['sanitize']:>7.3f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "generation_mode": planner.PLAN_GENERATION_MODE,
+            "sanitizer": planner.SANITIZER_BACKEND,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
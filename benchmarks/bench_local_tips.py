@@ -0,0 +1,80 @@
+"""
+Benchmarks tip lookup against a synthetic 50k-entry tips file.
+
+    python -m benchmarks.bench_local_tips [--entries 50000] [--lookups 2000]
+
+Compares the Aho-Corasick index with the previous approach of scanning every
+key with `key in destination` on each request.
+"""
+import argparse
+import random
+import string
+import time
+
+from local_tips import TipsIndex
+
+
+def synthetic_tips(count: int, rng: random.Random) -> dict:
+    """Builds `count` unique place names, a tenth of them nested under a region."""
+    tips, regions = {}, []
+    while len(tips) < count:
+        name = " ".join(
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+            for _ in range(rng.randint(1, 2))
+        )
+        if name in tips:
+            continue
+        if regions and rng.random() < 0.9:
+            tips[name] = {"tip": f"Tip for {name}.", "parent": rng.choice(regions)}
+        else:
+            tips[name] = f"Tip for {name}."
+            regions.append(name)
+    return tips
+
+
+def linear_scan(tips: dict, destination: str):
+    destination_lower = destination.lower()
+    for key in tips:
+        if key in destination_lower:
+            return key
+    return None
+
+
+def timed(fn, destinations) -> float:
+    start = time.perf_counter()
+    for destination in destinations:
+        fn(destination)
+    return (time.perf_counter() - start) / len(destinations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tips = synthetic_tips(args.entries, rng)
+    names = list(tips)
+    destinations = [
+        f"{rng.choice(names).title()}, {rng.choice(names).title()}" if rng.random() < 0.8 else "Somewhere Unknown"
+        for _ in range(args.lookups)
+    ]
+
+    start = time.perf_counter()
+    index = TipsIndex(tips)
+    build_seconds = time.perf_counter() - start
+
+    indexed = timed(index.match, destinations)
+    scanned = timed(lambda d: linear_scan(tips, d), destinations)
+
+    print(f"entries:            {len(index)}")
+    print(f"index build:        {build_seconds * 1000:.1f} ms")
+    print(f"indexed lookup:     {indexed * 1e6:.1f} us/lookup")
+    print(f"linear scan lookup: {scanned * 1e6:.1f} us/lookup")
+    print(f"speedup:            {scanned / indexed:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmarks the allowlist sanitizer against the BeautifulSoup fallback.
+
+    python -m benchmarks.bench_sanitizer [--days 1 7 30] [--repeat 50]
+
+Documents are built by repeating the day sections of `mock_data.html`, so
+they have the same shape as real model output.
+"""
+import argparse
+import re
+import time
+
+from sanitizer import sanitize_allowlist, sanitize_bs4
+
+DAY_SECTION = re.compile(r"<h2>.*?(?=<h2>|\Z)", re.DOTALL)
+
+
+def build_document(template: str, days: int) -> str:
+    """Builds a `days`-long itinerary from the day sections of the template."""
+    intro = template[:template.index("<h2>")]
+    sections = DAY_SECTION.findall(template)
+    body = []
+    for day in range(1, days + 1):
+        section = sections[(day - 1) % len(sections)]
+        body.append(re.sub(r"Day \d+", f"Day {day}", section, count=1))
+    return intro + "".join(body)
+
+
+def per_call_ms(fn, document: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(document)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--template", default="mock_data.html")
+    args = parser.parse_args()
+
+    with open(args.template, 'r', encoding='utf-8') as f:
+        template = f.read()
+
+    print(f"{'days':>5} {'bytes':>8} {'allowlist ms':>13} {'bs4 ms':>8} {'speedup':>8}")
+    for days in args.days:
+        document = build_document(template, days)
+        fast = per_call_ms(sanitize_allowlist, document, args.repeat)
+        slow = per_call_ms(sanitize_bs4, document, args.repeat)
+        print(f"{days:>5} {len(document.encode('utf-8')):>8} {fast:>13.3f} {slow:>8.3f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
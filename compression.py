@@ -0,0 +1,82 @@
+"""
+Content-Encoding negotiation and compression for JSON responses.
+
+gzip is always available. brotli is offered when the optional `brotli`
+package is installed, and preferred when the client accepts both, since it
+compresses text somewhat better at a similar cost.
+"""
+import gzip
+from typing import Dict, Optional, Sequence, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+GZIP_LEVEL = 6
+# Qualities above ~6 cost far more CPU than they save on per-request bodies
+BROTLI_QUALITY = 5
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported encodings, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Maps each coding in an Accept-Encoding header to its q-value."""
+    weights: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding] = quality
+    return weights
+
+
+def choose_encoding(header: Optional[str], offered: Sequence[str]) -> Optional[str]:
+    """
+    Picks the offered encoding the client weights highest, preferring earlier
+    ones on ties. `*` covers codings not listed; q=0 refuses one. Returns None
+    to send the body uncompressed.
+    """
+    weights = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in offered:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical bodies
+        return gzip.compress(body, GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def configured_encodings(setting: str) -> Tuple[str, ...]:
+    """
+    Parses a comma-separated preference list such as "br,gzip" (or "none").
+
+    Encodings that need a missing optional package are dropped.
+    """
+    if setting.strip().lower() in ("", "none", "off", "false"):
+        return ()
+    wanted = [name.strip().lower() for name in setting.split(",") if name.strip()]
+    unknown = [name for name in wanted if name not in ("br", "gzip")]
+    if unknown:
+        raise ValueError(f"Unknown response compression: {', '.join(unknown)}")
+    return tuple(name for name in wanted if name in available_encodings())
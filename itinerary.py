@@ -0,0 +1,238 @@
+"""
+Structured view of a sanitized itinerary.
+
+Plans follow the layout the prompts ask for:
+
+    <h1>title</h1> <p>intro</p>
+    <h2>📅 Day N: theme</h2>
+      <h3>🌅 Morning: activity</h3> <p>description, cost</p> ...
+      <h4><strong>Estimated Daily Budget:</strong> amount</h4>
+    <div class="local-tips">...</div>
+
+`parse_itinerary` turns that into days and time blocks without losing any
+markup, so `render_itinerary(parse_itinerary(html))` reproduces the plan and
+individual days can be replaced and spliced back in.
+"""
+import re
+from dataclasses import dataclass, field
+from html import unescape
+from typing import Dict, Iterable, List, Optional
+
+_TAG = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9]*)[^>]*?(/?)>")
+_VOID_TAGS = frozenset({"br", "hr", "img", "meta", "link", "input"})
+_DAY_NUMBER = re.compile(r"Day\s+(\d+)", re.IGNORECASE)
+_COST = re.compile(r"(?:₹|Rs\.?\s?|INR\s?|\$|€|£)\s?\d[\d,]*(?:\s?-\s?(?:₹|\$|€|£)?\d[\d,]*)?")
+
+
+@dataclass
+class Element:
+    """A top-level HTML element (or run of bare text when `tag` is empty)."""
+    tag: str
+    open_tag: str
+    inner: str
+
+    @property
+    def html(self) -> str:
+        if not self.tag:
+            return self.inner
+        return f"{self.open_tag}{self.inner}</{self.tag}>"
+
+
+@dataclass
+class TimeBlock:
+    title: Optional[str]
+    details: List[str] = field(default_factory=list)
+
+    @property
+    def kind(self) -> Optional[str]:
+        """The block label, e.g. "Morning" for "🌅 Morning: Beach walk"."""
+        if not self.title or ":" not in self.title:
+            return None
+        words = _text(self.title.split(":", 1)[0]).split()
+        return words[-1] if words else None
+
+    @property
+    def description(self) -> str:
+        return " ".join(_text(detail) for detail in self.details).strip()
+
+    @property
+    def cost(self) -> Optional[str]:
+        match = _COST.search(self.description)
+        return match.group(0) if match else None
+
+    def render(self) -> str:
+        lines = [f"<h3>{self.title}</h3>"] if self.title is not None else []
+        return "\n".join(lines + self.details)
+
+
+@dataclass
+class DayPlan:
+    number: Optional[int]
+    title: str
+    blocks: List[TimeBlock] = field(default_factory=list)
+    budget: Optional[str] = None
+    # Anything the model wrote after the daily budget, e.g. a trip total
+    notes: List[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        parts = [f"<h2>{self.title}</h2>"] + [block.render() for block in self.blocks]
+        if self.budget is not None:
+            parts.append(f"<h4>{self.budget}</h4>")
+        return "\n".join(parts + self.notes)
+
+
+@dataclass
+class Itinerary:
+    header: List[Element] = field(default_factory=list)
+    days: List[DayPlan] = field(default_factory=list)
+    footer: List[Element] = field(default_factory=list)
+
+    def day_numbers(self) -> List[int]:
+        return [day.number for day in self.days if day.number is not None]
+
+    def day(self, number: int) -> Optional[DayPlan]:
+        return next((day for day in self.days if day.number == number), None)
+
+    def replace_preamble(self, elements: List[Element]) -> None:
+        """
+        Replaces whatever precedes the `<h1>` title, such as an earlier
+        reschedule's acknowledgement, keeping the title and introduction.
+        Without a title the whole header is replaced.
+        """
+        title = next((index for index, element in enumerate(self.header) if element.tag == "h1"), len(self.header))
+        self.header = list(elements) + self.header[title:]
+
+
+def _text(fragment: str) -> str:
+    return unescape(re.sub(r"<[^>]+>", "", fragment))
+
+
+def split_elements(html: str) -> List[Element]:
+    """Splits well-formed HTML into its top-level elements."""
+    elements: List[Element] = []
+    depth, position = 0, 0
+    top_tag, open_tag, inner_start = "", "", 0
+
+    for match in _TAG.finditer(html):
+        closing, tag, self_closing = match.group(1), match.group(2).lower(), match.group(3)
+        if tag in _VOID_TAGS or self_closing:
+            continue
+        if not closing:
+            if depth == 0:
+                text = html[position:match.start()]
+                if text.strip():
+                    elements.append(Element("", "", text.strip()))
+                top_tag, open_tag, inner_start = tag, match.group(0), match.end()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                elements.append(Element(top_tag, open_tag, html[inner_start:match.start()]))
+                position = match.end()
+
+    tail = html[position:] if depth == 0 else html[inner_start - len(open_tag):]
+    if tail.strip():
+        elements.append(Element("", "", tail.strip()))
+    return elements
+
+
+def parse_itinerary(html: str) -> Itinerary:
+    """Parses a sanitized plan into header, days and footer."""
+    itinerary = Itinerary()
+    day: Optional[DayPlan] = None
+
+    for element in split_elements(html):
+        if element.tag == "h2":
+            match = _DAY_NUMBER.search(_text(element.inner))
+            day = DayPlan(int(match.group(1)) if match else None, element.inner)
+            itinerary.days.append(day)
+        elif element.tag == "div" or itinerary.footer:
+            # Tips and anything after them close out the plan
+            itinerary.footer.append(element)
+        elif day is None:
+            itinerary.header.append(element)
+        elif day.budget is not None:
+            day.notes.append(element.html)
+        elif element.tag == "h3":
+            day.blocks.append(TimeBlock(element.inner))
+        elif element.tag == "h4":
+            day.budget = element.inner
+        else:
+            if not day.blocks:
+                day.blocks.append(TimeBlock(None))
+            day.blocks[-1].details.append(element.html)
+
+    return itinerary
+
+
+def render_itinerary(itinerary: Itinerary) -> str:
+    """Renders an itinerary back to the documented HTML layout."""
+    parts = [element.html for element in itinerary.header]
+    parts += [day.render() for day in itinerary.days]
+    parts += [element.html for element in itinerary.footer]
+    return "\n".join(parts)
+
+
+def splice_days(itinerary: Itinerary, replacements: Iterable[DayPlan]) -> List[int]:
+    """Replaces days in place by day number and returns the numbers replaced."""
+    by_number: Dict[int, DayPlan] = {day.number: day for day in replacements if day.number is not None}
+    replaced = []
+    for position, day in enumerate(itinerary.days):
+        if day.number in by_number:
+            itinerary.days[position] = by_number[day.number]
+            replaced.append(day.number)
+    return replaced
+
+
+# ---------------- TARGET DAY DETECTION ---------------- #
+
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+}
+_NUMBER = r"(?:\d+|" + "|".join(_ORDINALS) + r")(?:st|nd|rd|th)?"
+_RANGE = rf"{_NUMBER}(?:\s*(?:-|–|to|through)\s*{_NUMBER})?"
+_DAY_LIST = re.compile(rf"\bdays?\s+({_RANGE}(?:\s*(?:,|and|&|or)\s*{_RANGE})*)", re.IGNORECASE)
+# "2nd day" or "second day", but not "a 2 day hike" or "3 day pass"
+_ORDINAL = r"(?:\d+(?:st|nd|rd|th)|" + "|".join(_ORDINALS) + r")"
+_ORDINAL_DAY = re.compile(rf"\b({_ORDINAL}|last|final)\s+day\b", re.IGNORECASE)
+# Plans are at most this long, so larger day numbers are never real targets
+MAX_DAY = 30
+
+
+def _to_number(token: str, last_day: Optional[int]) -> Optional[int]:
+    token = token.lower()
+    if token in ("last", "final"):
+        return last_day
+    token = re.sub(r"(st|nd|rd|th)$", "", token) if token[0].isdigit() else token
+    return int(token) if token.isdigit() else _ORDINALS.get(token)
+
+
+def find_target_days(suggestion: str, day_numbers: Optional[List[int]] = None) -> List[int]:
+    """
+    Finds the days a reschedule suggestion refers to.
+
+    Understands "Day 2", "days 2 and 4", "days 2-4", "the second day" and
+    "last day". Returns an empty list when the suggestion is about the whole
+    trip. When `day_numbers` is given, days outside the plan are dropped.
+    """
+    last_day = max(day_numbers) if day_numbers else None
+    # Clamp ranges before expanding them, so "days 1-3000000" stays cheap
+    lowest, highest = (min(day_numbers), last_day) if day_numbers else (1, MAX_DAY)
+    targets = set()
+
+    for match in _DAY_LIST.finditer(suggestion):
+        for part in re.split(r"\s*(?:,|and|&|or)\s*", match.group(1)):
+            bounds = [_to_number(token, last_day) for token in re.split(r"\s*(?:-|–|to|through)\s*", part)]
+            if None in bounds:
+                continue
+            targets.update(range(max(bounds[0], lowest), min(bounds[-1], highest) + 1))
+
+    for match in _ORDINAL_DAY.finditer(suggestion):
+        number = _to_number(match.group(1), last_day)
+        if number is not None:
+            targets.add(number)
+
+    if day_numbers is not None:
+        targets &= set(day_numbers)
+    return sorted(targets)
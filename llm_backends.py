@@ -0,0 +1,310 @@
+"""
+Interchangeable text-generation backends.
+
+- `GeminiBackend` calls Google Gemini.
+- `MockFileBackend` replays `mock_data.html` (what MOCK_MODE used to do).
+- `SimulatedBackend` writes deterministic itineraries of realistic size for
+  any prompt and models latency, token throughput and error rates, so the
+  whole pipeline can be load-tested offline.
+
+Every backend takes a per-call `timeout` in seconds.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from itinerary import parse_itinerary
+from plan_codec import encode_itinerary
+
+
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates a BPE tokenizer without loading one.
+
+    Words cost one token plus one per further six letters, digits one per
+    group of three, and every symbol, tag character and emoji one each, so
+    markup-heavy text is not undercounted the way a characters/4 rule would.
+    """
+    return sum(1 + len(piece) // 6 if piece[0].isalpha() else 1 for piece in _TOKEN_PIECES.findall(text))
+
+
+class LLMBackend:
+    """Interface implemented by every backend."""
+
+    name = "base"
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, timeout: float) -> str:
+        return await asyncio.to_thread(self.generate, prompt, timeout)
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        yield self.generate(prompt, timeout)
+
+    def warm_up(self) -> None:
+        """Does the one-time setup a first call would otherwise pay for, without calling the model."""
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model: Any):
+        self.model = model
+
+    @classmethod
+    def from_api_key(cls, api_key: str, model_name: str = "gemini-2.5-flash") -> "GeminiBackend":
+        # Imported here so the other backends never pay for the SDK import
+        from google.generativeai.client import configure
+        from google.generativeai.generative_models import GenerativeModel
+
+        configure(api_key=api_key)
+        return cls(GenerativeModel(model_name))
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.model.generate_content(prompt, request_options={"timeout": timeout})
+        return response.text
+
+    async def generate_async(self, prompt: str, timeout: float) -> str:
+        response = await self.model.generate_content_async(prompt, request_options={"timeout": timeout})
+        return response.text
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            if chunk.text:
+                yield chunk.text
+
+    def warm_up(self) -> None:
+        # The SDK builds its API client on the first call; build it now instead
+        if hasattr(self.model, "_client") and self.model._client is None:
+            from google.generativeai.client import get_default_generative_client
+
+            self.model._client = get_default_generative_client()
+
+
+class MockFileBackend(LLMBackend):
+    """Returns the same HTML file for every prompt, re-reading it only when it changes."""
+
+    name = "mock"
+
+    def __init__(self, path: str = "mock_data.html", chunk_size: int = 256):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._content = ""
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self._mtime:
+            with self._lock:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._content = f.read()
+                self._mtime = mtime
+        return self._content
+
+    def warm_up(self) -> None:
+        self.generate("", 0)
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        # Replay the document in small chunks to exercise the streaming path
+        content = self.generate(prompt, timeout)
+        for start in range(0, len(content), self.chunk_size):
+            yield content[start:start + self.chunk_size]
+
+
+# ---------------- SIMULATOR ---------------- #
+
+class SimulatedAPIError(Exception):
+    """Mimics a google.api_core error, which exposes the HTTP status as `code`."""
+
+    def __init__(self, code: int):
+        super().__init__(f"Simulated provider error (HTTP {code})")
+        self.code = code
+
+
+_SIGHTS = ["Old Town", "Fort", "Palace", "Lake", "Market", "Museum", "Temple", "Harbour", "Gardens", "Viewpoint",
+           "Beach", "Caves", "Waterfall", "Cathedral", "Heritage Walk", "Spice Farm", "Tea Estate", "Riverfront"]
+_THEMES = ["Arrival and First Impressions", "Heritage Trail", "Coastal Charm", "Markets and Flavours",
+           "Hills and Viewpoints", "Slow Day by the Water", "Art and Architecture", "Local Life", "Hidden Corners",
+           "Adventure Day", "Wellness and Relaxation", "Farewell Highlights"]
+_MEALS = ["a family-run thali place", "the busy street-food lane", "a rooftop cafe", "a seaside shack",
+          "a heritage hotel restaurant", "a popular local canteen"]
+_BLOCKS = [("🌅", "Morning"), ("🍽️", "Lunch"), ("🌞", "Afternoon"), ("🌙", "Evening"), ("🍴", "Dinner")]
+
+_TRIP = re.compile(r"(\d+)-day (?:travel plan|trip) from (.+?) to (.+?)\.")
+_DAY_REQUEST = re.compile(r"schedule for Day (\d+) only, themed \"(.+?)\"")
+_DAYS_TO_UPDATE = re.compile(r"\*\*Days to Update \((.+?)\):\*\*")
+_DAY_HEADING = re.compile(r"<h2>[^<]*?Day (\d+)")
+_COMPACT_DAYS = re.compile(r"Days to rewrite \((.+?)\):")
+
+
+def _plain_text(html: str) -> str:
+    return re.sub(r"<[^>]+>", "", html)
+
+
+def _simulated_day(rng: random.Random, destination: str, number: int, theme: Optional[str] = None) -> str:
+    theme = theme or rng.choice(_THEMES)
+    parts = [f"<h2>📅 Day {number}: {theme}</h2>"]
+    total = 0
+    for icon, label in _BLOCKS:
+        cost = rng.randrange(200, 2500, 50)
+        total += cost
+        if label in ("Lunch", "Dinner"):
+            title, place = f"{label} near the {rng.choice(_SIGHTS)}", rng.choice(_MEALS)
+            text = f"Try regional specialities at {place} (approx. ₹{cost})."
+        else:
+            title = f"{destination} {rng.choice(_SIGHTS)}"
+            text = (f"Spend {rng.randint(1, 3)} hours exploring, about {rng.randint(10, 45)} minutes from the "
+                    f"previous stop by auto-rickshaw (₹{cost} including entry).")
+        parts.append(f"<h3>{icon} {label}: {title}</h3>\n<p>{text}</p>")
+    parts.append(f"<h4><strong>Estimated Daily Budget:</strong> ₹{total:,} (excluding accommodation)</h4>")
+    return "\n".join(parts)
+
+
+def simulate_response(prompt: str, rng: random.Random) -> str:
+    """Writes a plausible response for any of the planner's prompts."""
+    trip = _TRIP.search(prompt)
+    days, destination = (int(trip.group(1)), trip.group(3).strip()) if trip else (3, "the city")
+
+    day_request = _DAY_REQUEST.search(prompt)
+    if day_request:
+        return _simulated_day(rng, destination, int(day_request.group(1)), day_request.group(2))
+
+    if "INTRO:" in prompt:
+        lines = [f"INTRO: {days} days of sights, food and slow evenings in {destination}."]
+        lines += [f"Day {n} | {rng.choice(_THEMES)} | {destination} {rng.choice(_SIGHTS)}" for n in range(1, days + 1)]
+        return "\n".join(lines)
+
+    acknowledgement = "<p>I've updated your itinerary to match your request. Here is the revised plan:</p>"
+    compact = _COMPACT_DAYS.search(prompt)
+    if compact:
+        days_html = "\n".join(_simulated_day(rng, destination, int(n)) for n in re.findall(r"\d+", compact.group(1)))
+        return "\n".join([f"ACK: {_plain_text(acknowledgement)}", encode_itinerary(parse_itinerary(days_html))])
+
+    to_update = _DAYS_TO_UPDATE.search(prompt)
+    if to_update:
+        numbers = [int(n) for n in re.findall(r"\d+", to_update.group(1))]
+        return "\n".join([acknowledgement] + [_simulated_day(rng, destination, n) for n in numbers])
+
+    if "**Current Itinerary:**" in prompt:
+        numbers = sorted({int(n) for n in _DAY_HEADING.findall(prompt)}) or [1, 2, 3]
+        return "\n".join([acknowledgement] + [_simulated_day(rng, destination, n) for n in numbers])
+
+    header = [f"<h1>🗺️ Your {days}-Day {destination} Adventure</h1>",
+              "<p>A balanced mix of landmarks, local food and downtime. Each day stays in one area to keep travel short.</p>"]
+    return "\n".join(header + [_simulated_day(rng, destination, n) for n in range(1, days + 1)])
+
+
+class SimulatedBackend(LLMBackend):
+    """
+    Deterministic local stand-in for the model.
+
+    The same prompt always produces the same text. Latency is
+    `first_token_latency` plus the response's tokens (about four characters
+    each) at `tokens_per_second`. A share `error_rate` of calls fails, split
+    between 429s (`rate_limit_share`) and 503s.
+    """
+
+    name = "simulated"
+
+    def __init__(self, first_token_latency: float = 0.4, tokens_per_second: float = 150.0,
+                 error_rate: float = 0.0, rate_limit_share: float = 0.5, seed: int = 0,
+                 chunk_chars: int = 64):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.seed = seed
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+        self.tokens_out = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan_call(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """Returns the response text and, if this call should fail, its HTTP status."""
+        text = simulate_response(prompt, random.Random(f"{self.seed}:{prompt}"))
+        with self._lock:
+            self.calls += 1
+            failure = None
+            if self._rng.random() < self.error_rate:
+                failure = 429 if self._rng.random() < self.rate_limit_share else 503
+            else:
+                self.tokens_out += estimate_tokens(text)
+        return text, failure
+
+    def _generation_time(self, text: str) -> float:
+        return self.first_token_latency + estimate_tokens(text) / self.tokens_per_second
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        text, failure = self._plan_call(prompt)
+        if failure:
+            time.sleep(min(self.first_token_latency, timeout))
+            raise SimulatedAPIError(failure)
+        duration = self._generation_time(text)
+        if duration > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated generation exceeded {timeout:.1f}s")
+        time.sleep(duration)
+        return text
+
+    async def generate_async(self, prompt: str, timeout: float) -> str:
+        text, failure = self._plan_call(prompt)
+        if failure:
+            await asyncio.sleep(min(self.first_token_latency, timeout))
+            raise SimulatedAPIError(failure)
+        duration = self._generation_time(text)
+        if duration > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"Simulated generation exceeded {timeout:.1f}s")
+        await asyncio.sleep(duration)
+        return text
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        text, failure = self._plan_call(prompt)
+        time.sleep(min(self.first_token_latency, timeout))
+        if failure:
+            raise SimulatedAPIError(failure)
+        deadline = time.monotonic() - self.first_token_latency + timeout
+        for start in range(0, len(text), self.chunk_chars):
+            chunk = text[start:start + self.chunk_chars]
+            time.sleep((len(chunk) / 4) / self.tokens_per_second)
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Simulated stream exceeded {timeout:.1f}s")
+            yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "tokens_out": self.tokens_out}
+
+
+def simulated_backend_from_env() -> SimulatedBackend:
+    """Builds a simulator from the SIM_* environment variables."""
+    return SimulatedBackend(
+        first_token_latency=float(os.getenv("SIM_LATENCY_MS", "400")) / 1000,
+        tokens_per_second=float(os.getenv("SIM_TOKENS_PER_SEC", "150")),
+        error_rate=float(os.getenv("SIM_ERROR_RATE", "0")),
+        rate_limit_share=float(os.getenv("SIM_RATE_LIMIT_SHARE", "0.5")),
+        seed=int(os.getenv("SIM_SEED", "0")),
+    )
+
+
+def create_backend(name: str, api_key: Optional[str] = None) -> LLMBackend:
+    """Creates a backend by name: gemini, mock or simulated."""
+    name = name.lower()
+    if name == "gemini":
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment and not in MOCK_MODE.")
+        return GeminiBackend.from_api_key(api_key)
+    if name == "mock":
+        return MockFileBackend()
+    if name == "simulated":
+        return simulated_backend_from_env()
+    raise ValueError(f"Unknown LLM backend: {name}")
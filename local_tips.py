@@ -0,0 +1,188 @@
+"""
+Indexed lookup of local travel tips.
+
+`local_tips.json` maps a place name to either a tip string or an object:
+
+    {
+      "rajasthan": "Start early to beat the heat.",
+      "jaipur": {"tip": "Book auto-rickshaws for the day.", "parent": "rajasthan",
+                 "aliases": ["pink city"]}
+    }
+
+All names and aliases are compiled into one Aho-Corasick automaton, so a
+lookup scans the destination once regardless of how many places are indexed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class TipMatch:
+    name: str
+    tip: str
+    start: int
+    end: int
+    depth: int
+
+
+class AhoCorasick:
+    """Multi-pattern matcher returning every whole-word occurrence in one pass."""
+
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._lengths = [len(pattern) for pattern in patterns]
+        for index, pattern in enumerate(patterns):
+            self._insert(pattern, index)
+        self._build_failure_links()
+
+    def _insert(self, pattern: str, index: int) -> None:
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(index)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """Returns (pattern index, start, end) for each match on word boundaries."""
+        matches = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for index in self._output[node]:
+                end = position + 1
+                start = end - self._lengths[index]
+                if _is_boundary(text, start - 1) and _is_boundary(text, end):
+                    matches.append((index, start, end))
+        return matches
+
+
+def _is_boundary(text: str, position: int) -> bool:
+    return position < 0 or position >= len(text) or not text[position].isalnum()
+
+
+class TipsIndex:
+    """Immutable index from place names and aliases to tips."""
+
+    def __init__(self, raw_tips: Dict[str, Any]):
+        self.tips: Dict[str, str] = {}
+        parents: Dict[str, Optional[str]] = {}
+        patterns: List[str] = []
+        self._pattern_names: List[str] = []
+
+        for name, entry in raw_tips.items():
+            name = name.casefold().strip()
+            if isinstance(entry, str):
+                entry = {"tip": entry}
+            self.tips[name] = entry["tip"]
+            parent = entry.get("parent")
+            parents[name] = parent.casefold().strip() if parent else None
+            for pattern in [name] + [alias.casefold().strip() for alias in entry.get("aliases", [])]:
+                patterns.append(pattern)
+                self._pattern_names.append(name)
+
+        self._depths = {name: self._depth(name, parents) for name in self.tips}
+        self._matcher = AhoCorasick(patterns)
+
+    @staticmethod
+    def _depth(name: str, parents: Dict[str, Optional[str]]) -> int:
+        depth, seen = 0, {name}
+        parent = parents.get(name)
+        while parent in parents and parent not in seen:
+            depth += 1
+            seen.add(parent)
+            parent = parents[parent]
+        return depth
+
+    def __len__(self) -> int:
+        return len(self.tips)
+
+    def match_all(self, destination: str, limit: Optional[int] = None) -> List[TipMatch]:
+        """
+        Returns tips for every place mentioned in the destination, most specific first.
+
+        A place nested under another ("jaipur" under "rajasthan") ranks first;
+        ties go to the place mentioned earliest, then to the longest name.
+        """
+        best: Dict[str, TipMatch] = {}
+        for index, start, end in self._matcher.find(destination.casefold()):
+            name = self._pattern_names[index]
+            match = TipMatch(name, self.tips[name], start, end, self._depths[name])
+            if name not in best or start < best[name].start:
+                best[name] = match
+        ranked = sorted(best.values(), key=lambda m: (-m.depth, m.start, -(m.end - m.start)))
+        return ranked[:limit] if limit is not None else ranked
+
+    def match(self, destination: str) -> Optional[TipMatch]:
+        matches = self.match_all(destination, limit=1)
+        return matches[0] if matches else None
+
+
+class ReloadingTipsIndex:
+    """Loads a tips file once and rebuilds the index when its mtime changes."""
+
+    def __init__(self, path: str, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._index: Optional[TipsIndex] = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[TipsIndex]:
+        """Returns the current index, reloading it first if the file changed."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._index
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                self._reload_if_changed()
+        return self._index
+
+    @property
+    def version(self) -> str:
+        """Identifies the loaded file by its mtime, which every process sees alike; empty before a load."""
+        mtime = self._mtime
+        return "" if mtime is None else repr(mtime)
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._index = TipsIndex(json.load(f))
+            self._mtime = mtime
+            logging.info(f"Loaded {len(self._index)} local tips from {self.path}")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # Keep serving the last good index if there is one
+            logging.warning(f"Could not load or parse {self.path}: {e}")
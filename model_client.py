@@ -0,0 +1,345 @@
+"""
+Resilient client around the text-generation model.
+
+Every call goes through the same policy:
+
+- a client-side token bucket keeps us inside the provider quota,
+- a circuit breaker fails fast while the provider keeps failing,
+- each attempt gets a deadline, and transient failures are retried with
+  jittered exponential backoff within an overall deadline,
+- failures surface as `ModelError` with a kind and an HTTP status the routes
+  can return as-is.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+# kind -> (HTTP status, retryable, user-facing message)
+ERROR_KINDS = {
+    "rate_limited": (429, True, "The itinerary service is busy right now. Please try again shortly."),
+    "timeout": (504, True, "Generating your itinerary took too long. Please try again."),
+    "unavailable": (503, True, "The itinerary service is temporarily unavailable. Please try again shortly."),
+    "circuit_open": (503, False, "The itinerary service is temporarily unavailable. Please try again shortly."),
+    "invalid_request": (502, False, "Sorry, there was an error generating your itinerary. Please try again."),
+    "internal": (502, False, "Sorry, there was an error generating your itinerary. Please try again."),
+}
+# Only these say something about the provider's health; a bad prompt must not open the circuit for everyone
+BREAKER_ERROR_KINDS = ("timeout", "rate_limited", "unavailable")
+
+
+class ModelError(Exception):
+    """A classified model failure that maps onto an HTTP response."""
+
+    def __init__(self, kind: str, detail: str = "", retry_after: Optional[float] = None):
+        self.kind = kind
+        self.status_code, self.retryable, self.message = ERROR_KINDS[kind]
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(f"{kind}: {detail}" if detail else kind)
+
+    def to_response(self) -> Dict[str, Any]:
+        response: Dict[str, Any] = {"error": self.message, "errorType": self.kind}
+        if self.retry_after is not None:
+            response["retryAfter"] = max(1, round(self.retry_after))
+        return response
+
+
+def classify_error(exc: BaseException) -> ModelError:
+    """Maps SDK, network and timeout exceptions onto a `ModelError` kind."""
+    if isinstance(exc, ModelError):
+        return exc
+    detail = f"{type(exc).__name__}: {exc}"
+    # google.api_core exceptions expose the HTTP status as `code`
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        if code == 429:
+            return ModelError("rate_limited", detail)
+        if code in (408, 504):
+            return ModelError("timeout", detail)
+        if code >= 500:
+            return ModelError("unavailable", detail)
+        if code >= 400:
+            return ModelError("invalid_request", detail)
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return ModelError("timeout", detail)
+    if isinstance(exc, ConnectionError):
+        return ModelError("unavailable", detail)
+    return ModelError("internal", detail)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given (1-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class TokenBucket:
+    """Client-side rate limiter refilling `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Takes a token and returns how long to wait before using it.
+
+        Returns None (and takes nothing) if the wait would exceed `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def wait_time(self) -> float:
+        with self._lock:
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures.
+
+    While open every call is rejected for `reset_timeout` seconds. After that
+    a single trial call is let through: success closes the breaker, failure
+    opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> Optional[float]:
+        """Returns None if the call may proceed, else seconds until it may."""
+        return self.acquire()[0]
+
+    def acquire(self) -> Tuple[Optional[float], bool]:
+        """
+        Like `before_call`, but also says whether the caller got the half-open
+        trial. The trial's owner must record its outcome or `release_trial`.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return None, False
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+                return None, True
+            # Open, or half-open with the trial call still in flight
+            return max(remaining, 1.0), False
+
+    def release_trial(self) -> None:
+        """Gives back a trial that ended without an outcome, so the next call can try instead."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic() - self.reset_timeout
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ModelClient:
+    """Wraps raw model calls with rate limiting, a circuit breaker, deadlines and retries."""
+
+    def __init__(self,
+                 call: Callable[[str, float], str],
+                 async_call: Optional[Callable[[str, float], Awaitable[str]]] = None,
+                 stream_call: Optional[Callable[[str, float], Iterator[str]]] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 attempt_timeout: float = 60.0,
+                 deadline: float = 120.0):
+        self._call = call
+        self._async_call = async_call
+        self._stream_call = stream_call
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.calls = 0
+        self.retries = 0
+        self.errors: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # ---------------- policy steps ---------------- #
+
+    def _admit(self, deadline: float) -> Tuple[float, bool]:
+        """
+        Checks the breaker and takes a rate-limit token. Returns the wait
+        before calling and whether this call is the breaker's half-open trial.
+        """
+        blocked_for, trial = self.breaker.acquire()
+        if blocked_for is not None:
+            raise self._count(ModelError("circuit_open", "provider marked unhealthy", retry_after=blocked_for))
+        if self.rate_limiter is None:
+            return 0.0, trial
+        wait = self.rate_limiter.reserve(max(0.0, deadline - time.monotonic()))
+        if wait is None:
+            if trial:
+                self.breaker.release_trial()
+            raise self._count(ModelError("rate_limited", "client-side quota exhausted",
+                                         retry_after=self.rate_limiter.wait_time()))
+        return wait, trial
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._count(ModelError("timeout", "deadline exceeded before the call started"))
+        return min(self.attempt_timeout, remaining)
+
+    def _record_failure(self, error: ModelError, trial: bool) -> None:
+        if error.kind in BREAKER_ERROR_KINDS:
+            self.breaker.record_failure()
+        elif trial:
+            self.breaker.release_trial()
+
+    def _on_failure(self, exc: BaseException, attempt: int, deadline: float, trial: bool) -> float:
+        """Records a failed attempt and returns the backoff delay, or raises if we should give up."""
+        error = classify_error(exc)
+        self._record_failure(error, trial)
+        delay = self.retry.delay(attempt)
+        if not error.retryable or attempt >= self.retry.attempts or time.monotonic() + delay >= deadline:
+            raise self._count(error) from exc
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def _count(self, error: ModelError) -> ModelError:
+        with self._lock:
+            self.errors[error.kind] += 1
+        return error
+
+    def _start(self) -> float:
+        with self._lock:
+            self.calls += 1
+        return time.monotonic() + self.deadline
+
+    # ---------------- entry points ---------------- #
+
+    def generate(self, prompt: str) -> str:
+        """Generates text, raising `ModelError` once retries are exhausted."""
+        deadline = self._start()
+        attempt = 0
+        while True:
+            attempt += 1
+            wait, trial = self._admit(deadline)
+            settled = False
+            try:
+                time.sleep(wait)
+                text = self._call(prompt, self._attempt_timeout(deadline))
+            except ModelError:
+                raise
+            except Exception as exc:
+                settled = True
+                delay = self._on_failure(exc, attempt, deadline, trial)
+            else:
+                settled = True
+                self.breaker.record_success()
+                return text
+            finally:
+                # An abandoned trial (deadline, interrupt) must not leave the breaker half-open
+                if trial and not settled:
+                    self.breaker.release_trial()
+            time.sleep(delay)
+
+    async def generate_async(self, prompt: str) -> str:
+        """Async variant of `generate`."""
+        if self._async_call is None:
+            raise RuntimeError("This model client has no async call configured.")
+        deadline = self._start()
+        attempt = 0
+        while True:
+            attempt += 1
+            wait, trial = self._admit(deadline)
+            settled = False
+            try:
+                await asyncio.sleep(wait)
+                timeout = self._attempt_timeout(deadline)
+                text = await asyncio.wait_for(self._async_call(prompt, timeout), timeout)
+            except ModelError:
+                raise
+            except Exception as exc:
+                settled = True
+                delay = self._on_failure(exc, attempt, deadline, trial)
+            else:
+                settled = True
+                self.breaker.record_success()
+                return text
+            finally:
+                # Covers cancellation, which is not an Exception
+                if trial and not settled:
+                    self.breaker.release_trial()
+            await asyncio.sleep(delay)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Streams text chunks. Not retried, since chunks may already be delivered."""
+        if self._stream_call is None:
+            raise RuntimeError("This model client has no streaming call configured.")
+        deadline = self._start()
+        wait, trial = self._admit(deadline)
+        settled = False
+        try:
+            time.sleep(wait)
+            yield from self._stream_call(prompt, self._attempt_timeout(deadline))
+        except ModelError:
+            raise
+        except Exception as exc:
+            settled = True
+            error = classify_error(exc)
+            self._record_failure(error, trial)
+            raise self._count(error) from exc
+        else:
+            settled = True
+            self.breaker.record_success()
+        finally:
+            # Also runs when the consumer closes the generator early
+            if trial and not settled:
+                self.breaker.release_trial()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+        }
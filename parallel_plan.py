@@ -0,0 +1,155 @@
+"""
+Parallel per-day itinerary generation.
+
+Long trips are generated in two steps: one short call returns a skeleton
+(a theme and base location per day), then every day is expanded by its own
+model call on a bounded pool. Days are assembled in order, so latency is
+roughly one skeleton call plus one day instead of growing with trip length.
+"""
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from dataclasses import dataclass, field
+from html import escape
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from itinerary import DayPlan, TimeBlock, parse_itinerary
+
+_SKELETON_LINE = re.compile(r"Day\s*(\d+)\s*[|:\-–]\s*([^|]+?)\s*(?:\|\s*(.+?))?\s*$", re.IGNORECASE)
+_INTRO_LINE = re.compile(r"^INTRO\s*:\s*(.+?)\s*$", re.IGNORECASE)
+
+UNAVAILABLE_DAY_MESSAGE = "We couldn't finish planning this day in time. Please regenerate the itinerary for full details."
+
+
+@dataclass
+class SkeletonDay:
+    number: int
+    theme: str
+    location: str
+
+
+@dataclass
+class Skeleton:
+    intro: str
+    days: List[SkeletonDay] = field(default_factory=list)
+
+    def outline(self) -> str:
+        return "\n".join(f"Day {day.number}: {day.theme} ({day.location})" for day in self.days)
+
+
+def parse_skeleton(text: str, days: int, destination: str) -> Skeleton:
+    """
+    Parses `Day N | Theme | Location` lines from a skeleton response.
+
+    Days the model skipped get a generic theme so the plan always has
+    exactly `days` days.
+    """
+    intro = ""
+    parsed: Dict[int, SkeletonDay] = {}
+    for line in text.splitlines():
+        line = line.strip().strip("*-• ")
+        intro_match = _INTRO_LINE.match(line)
+        if intro_match:
+            intro = intro_match.group(1)
+            continue
+        match = _SKELETON_LINE.match(line)
+        if match and 1 <= int(match.group(1)) <= days:
+            number = int(match.group(1))
+            parsed.setdefault(number, SkeletonDay(number, match.group(2), match.group(3) or destination))
+
+    return Skeleton(
+        intro=intro,
+        days=[parsed.get(number, SkeletonDay(number, f"Exploring {destination}", destination))
+              for number in range(1, days + 1)],
+    )
+
+
+def placeholder_day(day: SkeletonDay) -> DayPlan:
+    """A day section shown when expanding that day failed or timed out."""
+    return DayPlan(day.number, f"📅 Day {day.number}: {escape(day.theme)}",
+                   [TimeBlock(None, [f"<p>{UNAVAILABLE_DAY_MESSAGE}</p>"])])
+
+
+def extract_day(section_html: str, day: SkeletonDay) -> Optional[DayPlan]:
+    """Picks the requested day out of a per-day response (sanitized HTML)."""
+    days = parse_itinerary(section_html).days
+    if not days:
+        return None
+    match = next((candidate for candidate in days if candidate.number == day.number), days[0])
+    match.number = day.number
+    return match
+
+
+def generate_days(skeleton_days: List[SkeletonDay], generate_day: Callable[[SkeletonDay], Optional[DayPlan]],
+                  fanout: int, day_timeout: float, pool: Executor) -> List[Optional[DayPlan]]:
+    """
+    Expands days concurrently, at most `fanout` at a time, on a pool shared
+    by all requests.
+
+    Each day gets `day_timeout` seconds from the moment a worker picks it up,
+    or from submission while the pool is saturated; days that fail or run out
+    of time come back as None, in order. A thread cannot be interrupted, so a
+    timed-out day keeps its pool thread until the model call's own deadline
+    ends it; sharing one bounded pool keeps such threads from piling up.
+    """
+    if day_timeout <= 0:
+        raise ValueError("day_timeout must be positive")
+    results: Dict[int, Optional[DayPlan]] = {}
+    started: Dict[int, float] = {}
+    started_lock = threading.Lock()
+
+    def run(day: SkeletonDay) -> Optional[DayPlan]:
+        with started_lock:
+            started[day.number] = time.monotonic()
+        return generate_day(day)
+
+    queued = deque(skeleton_days)
+    pending: Dict[Future, Tuple[SkeletonDay, float]] = {}
+    poll_interval = min(0.05, day_timeout)
+    try:
+        while queued or pending:
+            while queued and len(pending) < max(1, fanout):
+                day = queued.popleft()
+                pending[pool.submit(run, day)] = (day, time.monotonic())
+            done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                day, _ = pending.pop(future)
+                try:
+                    results[day.number] = future.result()
+                except Exception:
+                    results[day.number] = None
+            now = time.monotonic()
+            for future, (day, submitted) in list(pending.items()):
+                with started_lock:
+                    began = started.get(day.number, submitted)
+                if now - began > day_timeout:
+                    # Frees the pool slot if the day never started; otherwise its result is ignored
+                    future.cancel()
+                    del pending[future]
+                    results[day.number] = None
+    finally:
+        for future in pending:
+            future.cancel()
+
+    return [results.get(day.number) for day in skeleton_days]
+
+
+async def generate_days_async(skeleton_days: List[SkeletonDay],
+                              generate_day: Callable[[SkeletonDay], Awaitable[Optional[DayPlan]]],
+                              fanout: int, day_timeout: float) -> List[Optional[DayPlan]]:
+    """Event-loop counterpart of `generate_days`."""
+    if day_timeout <= 0:
+        raise ValueError("day_timeout must be positive")
+    slots = asyncio.Semaphore(max(1, fanout))
+
+    async def run(day: SkeletonDay) -> Optional[DayPlan]:
+        async with slots:
+            try:
+                return await asyncio.wait_for(generate_day(day), day_timeout)
+            except Exception:
+                return None
+
+    return list(await asyncio.gather(*(run(day) for day in skeleton_days)))
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# ---------------- KEY NORMALIZATION ---------------- #
+
+_NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_place(name: str) -> str:
+    """Normalizes a place name so trivially different spellings share a key."""
+    name = _NON_WORD.sub(" ", name.casefold())
+    return _WHITESPACE.sub(" ", name).strip()
+
+
+def make_plan_cache_key(source: str, destination: str, days: int, prompt_version: str,
+                        generation_mode: str = "single", tips_version: str = "") -> str:
+    """
+    Builds a stable cache key from the normalized plan inputs, plus whatever
+    else shapes the cached plan: how it was generated and which tips it got.
+    """
+    payload = json.dumps(
+        [prompt_version, generation_mode, tips_version, normalize_place(source), normalize_place(destination),
+         int(days)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------- STORAGE BACKENDS ---------------- #
+
+class MemoryCacheStore:
+    """In-process LRU store bounded by number of entries."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheStore:
+    """Disk-backed LRU store, shared by every worker pointed at the same file."""
+
+    def __init__(self, path: str, max_entries: int = 1024, table: str = "plan_cache"):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._table = table
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._db = self._connect()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # A connection must not cross fork(); forked workers open their own
+        if self._pid != os.getpid():
+            self._pid, self._db = os.getpid(), self._connect()
+        return self._db
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    f"UPDATE {self._table} SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+            return row
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time()),
+            )
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self._table} WHERE key IN "
+                    f"(SELECT key FROM {self._table} ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()
+            return count
+
+
+def create_cache_store(backend: str, max_entries: int, path: str):
+    """Creates a cache store by name, or None when caching is disabled."""
+    backend = backend.lower()
+    if backend in ("", "none", "off", "false"):
+        return None
+    if backend == "memory":
+        return MemoryCacheStore(max_entries)
+    if backend == "sqlite":
+        return SQLiteCacheStore(path, max_entries)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+# ---------------- CACHE ---------------- #
+
+class PlanCache:
+    """TTL cache for generated itineraries on top of a pluggable store."""
+
+    def __init__(self, store, ttl_seconds: float = 3600):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.store.get(key)
+        if entry is not None and entry[1] < time.time():
+            self.store.delete(key)
+            entry = None
+            with self._lock:
+                self.expirations += 1
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        self.store.set(key, value, time.time() + self.ttl_seconds)
+
+    def clear(self) -> None:
+        self.store.clear()
+        with self._lock:
+            self.hits = self.misses = self.expirations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters suitable for scraping."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "entries": len(self.store),
+            "max_entries": self.store.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.store.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,193 @@
+"""
+Compact plain-text encoding of itineraries for prompts.
+
+HTML plans spend most of their tokens on tags, emoji and repeated labels.
+The compact form keeps only what the model needs to rewrite a plan:
+
+    T: Your 3-Day Goa Adventure
+    I: Sun, seafood and slow evenings.
+    D1: Arrival and Beaches
+    M: Calangute Beach | Two hours on the sand (free).
+    L: Britto's | Goan thali (₹600).
+    $: ₹3,500 (excluding accommodation)
+
+Block codes stand for the time blocks the trip prompt asks for (M morning,
+L lunch, A afternoon, E evening, N dinner). Any other block is written as
+`B: heading | description`, and a paragraph without a heading as `P: text`.
+`inflate` turns model output in this format back into the documented HTML
+layout, with the icons and budget label restored.
+"""
+import re
+from html import escape, unescape
+from typing import Callable, Iterable, List, Optional, Sequence, TypeVar
+
+from itinerary import DayPlan, Element, Itinerary, TimeBlock, render_itinerary
+
+T = TypeVar("T")
+
+BLOCK_KINDS = {
+    "M": ("🌅", "Morning"),
+    "L": ("🍽️", "Lunch"),
+    "A": ("🌞", "Afternoon"),
+    "E": ("🌙", "Evening"),
+    "N": ("🍴", "Dinner"),
+}
+_CODES = {label.lower(): code for code, (_, label) in BLOCK_KINDS.items()}
+DAY_ICON = "📅"
+BUDGET_LABEL = "Estimated Daily Budget:"
+
+_LINE = re.compile(r"^\s*(ACK|T|I|D(\d+)|[MLAENBP$+])\s*:\s?(.*)$")
+_COMPACT_DAY = re.compile(r"^\s*D\d+\s*:", re.MULTILINE)
+_LEADING_SYMBOLS = re.compile(r"^[^\w(\"'₹$€£]+")
+
+
+def _plain(fragment: str) -> str:
+    """Text content of an HTML fragment on one line."""
+    return " ".join(unescape(re.sub(r"<[^>]+>", " ", fragment)).split())
+
+
+def _strip_icon(text: str) -> str:
+    return _LEADING_SYMBOLS.sub("", text).strip()
+
+
+def can_encode(itinerary: Itinerary) -> bool:
+    """Only plans whose days are all numbered survive the round trip."""
+    return bool(itinerary.days) and all(day.number is not None for day in itinerary.days)
+
+
+def day_theme(day: DayPlan) -> str:
+    title = _plain(day.title)
+    return title.split(":", 1)[1].strip() if ":" in title else _strip_icon(title)
+
+
+def encode_day(day: DayPlan) -> str:
+    lines = [f"D{day.number}: {day_theme(day)}"]
+    for block in day.blocks:
+        description = _plain(block.description)
+        if block.title is None:
+            lines.append(f"P: {description}")
+            continue
+        heading = _strip_icon(_plain(block.title)).replace("|", "/")
+        code = _CODES.get((block.kind or "").lower())
+        if code and ":" in heading:
+            lines.append(f"{code}: {heading.split(':', 1)[1].strip()} | {description}")
+        else:
+            lines.append(f"B: {heading} | {description}")
+    if day.budget is not None:
+        budget = _plain(day.budget)
+        if budget.lower().startswith(BUDGET_LABEL.lower()):
+            budget = budget[len(BUDGET_LABEL):].strip()
+        lines.append(f"$: {budget}")
+    lines.extend(f"+: {_plain(note)}" for note in day.notes)
+    return "\n".join(lines)
+
+
+def encode_itinerary(itinerary: Itinerary, day_numbers: Optional[Iterable[int]] = None) -> str:
+    """
+    Encodes the title, intro and days of a plan (or only `day_numbers`).
+
+    The footer is left out: local tips are added by the server, not the model.
+    """
+    lines = []
+    if day_numbers is None:
+        for element in itinerary.header:
+            text = _plain(element.inner)
+            if text:
+                lines.append(f"T: {_strip_icon(text)}" if element.tag == "h1" else f"I: {text}")
+        days = itinerary.days
+    else:
+        wanted = set(day_numbers)
+        days = [day for day in itinerary.days if day.number in wanted]
+    lines.extend(encode_day(day) for day in days)
+    return "\n".join(lines)
+
+
+def is_compact(text: str) -> bool:
+    """Whether model output uses the compact format rather than HTML."""
+    return bool(_COMPACT_DAY.search(text)) and "<h2" not in text.lower()
+
+
+def _split_block(value: str) -> List[str]:
+    title, _, description = value.partition("|")
+    return [title.strip(), description.strip()]
+
+
+def decode_itinerary(text: str) -> Itinerary:
+    """Parses compact text into an itinerary, ignoring lines it does not recognize."""
+    itinerary = Itinerary()
+    day: Optional[DayPlan] = None
+
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            # A description the model wrapped onto the next line
+            last = day.blocks[-1].details if day and day.blocks else None
+            if line.strip() and not line.lstrip().startswith("```") and last and last[-1].endswith("</p>"):
+                last[-1] = f"{last[-1][:-4]} {escape(line.strip(), quote=False)}</p>"
+            continue
+
+        tag, number, value = match.group(1), match.group(2), escape(match.group(3).strip(), quote=False)
+        if number is not None:
+            day = DayPlan(int(number), f"{DAY_ICON} Day {int(number)}: {value}")
+            itinerary.days.append(day)
+        elif tag == "T":
+            itinerary.header.append(Element("h1", "<h1>", f"🗺️ {value}"))
+        elif tag in ("I", "ACK"):
+            itinerary.header.append(Element("p", "<p>", value))
+        elif day is None:
+            continue
+        elif tag in BLOCK_KINDS or tag == "B":
+            title, description = _split_block(value)
+            if tag != "B":
+                icon, label = BLOCK_KINDS[tag]
+                title = f"{icon} {label}: {title}"
+            day.blocks.append(TimeBlock(title, [f"<p>{description}</p>"] if description else []))
+        elif tag == "P":
+            day.blocks.append(TimeBlock(None, [f"<p>{value}</p>"]))
+        elif tag == "$":
+            day.budget = f"<strong>{BUDGET_LABEL}</strong> {value}"
+        elif tag == "+":
+            day.notes.append(f"<p>{value}</p>")
+
+    return itinerary
+
+
+def inflate(text: str) -> str:
+    """Renders compact model output as HTML; HTML output is returned unchanged."""
+    return render_itinerary(decode_itinerary(text)) if is_compact(text) else text
+
+
+# ---------------- TOKEN BUDGET ---------------- #
+
+class PromptTooLarge(ValueError):
+    """A prompt (or one indivisible part of it) exceeds the token budget."""
+
+    def __init__(self, tokens: int, limit: int, target_days: Sequence[int] = ()):
+        super().__init__(f"Prompt needs about {tokens} tokens; the limit is {limit}.")
+        self.tokens = tokens
+        self.limit = limit
+        # The days the request named, if any
+        self.target_days = list(target_days)
+
+
+def chunk_by_budget(items: Sequence[T], cost: Callable[[T], int], budget: int, fixed: int) -> List[List[T]]:
+    """
+    Greedily groups items, in order, so each group's cost plus `fixed` fits in `budget`.
+
+    Raises `PromptTooLarge` when a single item cannot fit on its own.
+    """
+    chunks: List[List[T]] = []
+    current: List[T] = []
+    used = fixed
+    for item in items:
+        item_cost = cost(item)
+        if fixed + item_cost > budget:
+            raise PromptTooLarge(fixed + item_cost, budget)
+        if current and used + item_cost > budget:
+            chunks.append(current)
+            current, used = [], fixed
+        current.append(item)
+        used += item_cost
+    if current:
+        chunks.append(current)
+    return chunks
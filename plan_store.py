@@ -0,0 +1,183 @@
+"""
+Content-addressed storage for generated plans.
+
+A plan's ID is a hash of its HTML, so the same plan always gets the same ID
+and the ID doubles as a strong ETag: whatever a client cached under an ID is
+still current. Plans are kept zlib-compressed, in memory or in SQLite, so
+clients can refer to a plan by ID instead of uploading it again.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+PLAN_ID_LENGTH = 32
+_PLAN_ID = re.compile(rf"^[0-9a-f]{{{PLAN_ID_LENGTH}}}$")
+COMPRESSION_LEVEL = 9
+
+
+def plan_id(plan: str) -> str:
+    return hashlib.sha256(plan.encode("utf-8")).hexdigest()[:PLAN_ID_LENGTH]
+
+
+def is_plan_id(value: Any) -> bool:
+    return isinstance(value, str) and bool(_PLAN_ID.match(value))
+
+
+def pack(plan: str) -> bytes:
+    return zlib.compress(plan.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def unpack(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class MemoryPlanStore:
+    """Compressed plans in a dict, least recently used evicted beyond `max_entries`."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._plans: "OrderedDict[str, bytes]" = OrderedDict()
+        self._raw_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def put(self, plan: str) -> str:
+        """Stores a plan (once) and returns its ID."""
+        key = plan_id(plan)
+        with self._lock:
+            if key in self._plans:
+                self._plans.move_to_end(key)
+                return key
+        blob = pack(plan)
+        with self._lock:
+            self._plans[key] = blob
+            self._raw_bytes[key] = len(plan.encode("utf-8"))
+            while len(self._plans) > self.max_entries:
+                evicted, _ = self._plans.popitem(last=False)
+                del self._raw_bytes[evicted]
+                self.evictions += 1
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            blob = self._plans.get(key)
+            if blob is None:
+                return None
+            self._plans.move_to_end(key)
+        return unpack(blob)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._plans
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            raw, stored = sum(self._raw_bytes.values()), sum(len(blob) for blob in self._plans.values())
+        return _stats(self, raw, stored)
+
+
+class SQLitePlanStore:
+    """Compressed plans in SQLite, shared by every worker pointed at the same file."""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._db = self._connect()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "id TEXT PRIMARY KEY, body BLOB NOT NULL, raw_bytes INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS plans_lru ON plans (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # A connection must not cross fork(); forked workers open their own
+        if self._pid != os.getpid():
+            self._pid, self._db = os.getpid(), self._connect()
+        return self._db
+
+    def put(self, plan: str) -> str:
+        key = plan_id(plan)
+        with self._lock:
+            updated = self._conn.execute("UPDATE plans SET last_access = ? WHERE id = ?", (time.time(), key))
+            if updated.rowcount:
+                return key
+        blob = pack(plan)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO plans (id, body, raw_bytes, last_access) VALUES (?, ?, ?, ?)",
+                (key, blob, len(plan.encode("utf-8")), time.time()),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM plans WHERE id IN (SELECT id FROM plans ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM plans WHERE id = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE plans SET last_access = ? WHERE id = ?", (time.time(), key))
+        return unpack(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM plans WHERE id = ?", (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            raw, stored = self._conn.execute(
+                "SELECT COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(LENGTH(body)), 0) FROM plans"
+            ).fetchone()
+        return _stats(self, raw, stored)
+
+
+def _stats(store, raw_bytes: int, stored_bytes: int) -> Dict[str, Any]:
+    return {
+        "backend": type(store).__name__,
+        "entries": len(store),
+        "max_entries": store.max_entries,
+        "evictions": store.evictions,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "compression_ratio": round(raw_bytes / stored_bytes, 2) if stored_bytes else 0.0,
+    }
+
+
+def create_plan_store(backend: str, max_entries: int, path: str):
+    """Creates a plan store by name, or None when storing plans is disabled."""
+    backend = backend.lower()
+    if backend in ("", "none", "off", "false"):
+        return None
+    if backend == "memory":
+        return MemoryPlanStore(max_entries)
+    if backend == "sqlite":
+        return SQLitePlanStore(path, max_entries)
+    raise ValueError(f"Unknown plan store backend: {backend}")
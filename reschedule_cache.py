@@ -0,0 +1,207 @@
+"""
+Near-duplicate cache for reschedule results.
+
+"I'm tired on day 2", "day 2 is too exhausting" and "make Day 2 relaxing"
+ask for the same change. Suggestions are reduced to a signature before
+lookup:
+
+- the intent, from a keyword lexicon over the categories the reschedule
+  prompt already distinguishes (relaxing, adventurous, budget, rushed);
+- the day numbers the suggestion names;
+- the content words, lowercased, stemmed and without stopwords, plus each
+  pair of neighbouring content words so word order counts. Mood words that
+  say the same thing ("tired", "exhausting", "relaxing") become one token.
+
+Results are grouped per plan (and scope, e.g. the reschedule mode). A lookup
+only considers entries with the same intent and days, and hits when the
+Jaccard similarity of the words reaches the threshold. Activities and cost
+direction are not merged, so "replace the spa with a hike" never reuses
+"replace the hike with a spa", and "too cheap" never reuses "too expensive".
+"""
+import hashlib
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from itinerary import find_target_days
+from plan_cache import PlanCache
+
+STOPWORDS = frozenset("""
+    a about after again all also am an and any are as at be been before being but by can could day days did do
+    does doing don during each feel feeling feels few for from get getting go going got had has have having he her
+    here him his how i if im in into is it its itself just keep let lets like little lot m make maybe me more most
+    much my need of off on one only or our out over please quite re really s seem seems she should so some still
+    than that the their them then there these they thing things this those through to too trip us ve very want
+    was way we were what when which while who will with would you your whole bit
+    first second third fourth fifth sixth seventh eighth ninth tenth
+""".split())
+
+INTENT_KEYWORDS = {
+    "relaxing": """tired tiring exhausted exhausting exhaust relax relaxing relaxed relaxation calm calmer slow slower
+                   slowly rest restful chill lazy easy easier peaceful sleep sleepy fatigue fatigued drained leisure
+                   leisurely unwind gentle spa""",
+    "adventurous": """adventure adventures adventurous exciting excitement thrill thrilling active adrenaline trek
+                      trekking hike hiking outdoor outdoors sport sports extreme rafting bored boring""",
+    "budget": """budget cheap cheaper cheapest expensive costly cost costs money afford affordable save saving price
+                 pricey prices spend spending free""",
+    "rushed": """rushed rush hectic packed busy hurry hurried crammed overloaded tight fewer overscheduled""",
+}
+
+# Mood words merged into one token per intent. Activities ("spa", "hike") and
+# the direction of a cost complaint ("cheap", "expensive") are left out on purpose
+SYNONYMS = {
+    "relaxing": """tired tiring exhausted exhausting exhaust relax relaxing relaxed relaxation calm calmer slow slower
+                   slowly rest restful chill lazy easy easier peaceful sleep sleepy fatigue fatigued drained leisure
+                   leisurely unwind gentle""",
+    "adventurous": """adventure adventures adventurous exciting excitement thrill thrilling active adrenaline bored
+                      boring""",
+    "budget": """budget cost costs money price prices spend spending""",
+    "rushed": """rushed rush hectic packed busy hurry hurried crammed overloaded tight overscheduled""",
+}
+
+_WORD = re.compile(r"[a-z]+|\d+")
+_SUFFIXES = ("ingly", "edly", "ing", "ed")
+_SIBILANT_PLURAL = re.compile(r"(?:ss|x|z|ch|sh)es$")
+
+
+def _stem(word: str) -> str:
+    """Strips common inflections; both sides of a comparison are stemmed alike."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    if len(word) > 4 and _SIBILANT_PLURAL.search(word):
+        return word[:-2]
+    if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+_INTENT_STEMS = {intent: frozenset(_stem(word) for word in words.split())
+                 for intent, words in INTENT_KEYWORDS.items()}
+_CANONICAL = {_stem(word): intent for intent, words in SYNONYMS.items() for word in words.split()}
+
+
+@dataclass(frozen=True)
+class SuggestionSignature:
+    intent: Optional[str]
+    days: Tuple[int, ...]
+    words: FrozenSet[str]
+
+    def similarity(self, other: "SuggestionSignature") -> float:
+        """Jaccard similarity of the words; 0 when intent or days differ."""
+        if self.intent != other.intent or self.days != other.days:
+            return 0.0
+        if not self.words and not other.words:
+            return 1.0
+        return len(self.words & other.words) / len(self.words | other.words)
+
+
+def classify_intent(stems: List[str]) -> Optional[str]:
+    """
+    Maps stemmed words onto reschedule intents.
+
+    Returns None when no intent keyword appears, and joins several intents
+    with "+" (e.g. "budget+relaxing") so mixed requests never collide with
+    single-intent ones.
+    """
+    found = sorted(intent for intent, keywords in _INTENT_STEMS.items() if keywords.intersection(stems))
+    return "+".join(found) or None
+
+
+def normalize_suggestion(suggestion: str) -> SuggestionSignature:
+    text = suggestion.lower()
+    stems = [_stem(word) for word in _WORD.findall(text) if word not in STOPWORDS]
+    content = [_CANONICAL.get(stem, stem) for stem in stems if not stem.isdigit()]
+    words = frozenset(content) | {f"{first}_{second}" for first, second in zip(content, content[1:])}
+    return SuggestionSignature(classify_intent(stems), tuple(find_target_days(text)), words)
+
+
+def plan_fingerprint(plan: str) -> str:
+    """Hash of a plan with whitespace differences ignored."""
+    return hashlib.sha256(" ".join(plan.split()).encode("utf-8")).hexdigest()
+
+
+class RescheduleCache:
+    """
+    Stores up to `variants` results per plan, most recently used first, on
+    top of a `PlanCache`; the store's LRU limit and the TTL bound the rest.
+    """
+
+    def __init__(self, cache: PlanCache, threshold: float = 0.6, variants: int = 8):
+        if not 0 < threshold <= 1:
+            raise ValueError("Similarity threshold must be in (0, 1]")
+        self.cache = cache
+        self.threshold = threshold
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(plan: str, scope: str) -> str:
+        return f"reschedule:{scope}:{plan_fingerprint(plan)}"
+
+    def _load(self, key: str) -> List[Dict[str, Any]]:
+        value = self.cache.get(key)
+        return json.loads(value) if value else []
+
+    def get(self, plan: str, suggestion: str, scope: str = "") -> Optional[Tuple[Dict[str, Any], float]]:
+        """Returns a cached response and its similarity, or None."""
+        signature = normalize_suggestion(suggestion)
+        key = self._key(plan, scope)
+        with self._lock:
+            entries = self._load(key)
+            best, best_score = None, 0.0
+            for index, entry in enumerate(entries):
+                score = signature.similarity(SuggestionSignature(entry["intent"], tuple(entry["days"]),
+                                                                 frozenset(entry["words"])))
+                if score > best_score:
+                    best, best_score = index, score
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            if best_score == 1.0:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            if best:
+                entries.insert(0, entries.pop(best))
+                self.cache.set(key, json.dumps(entries, ensure_ascii=False))
+            return entries[0]["response"], best_score
+
+    def set(self, plan: str, suggestion: str, response: Dict[str, Any], scope: str = "") -> None:
+        signature = normalize_suggestion(suggestion)
+        entry = {"intent": signature.intent, "days": list(signature.days),
+                 "words": sorted(signature.words), "response": response}
+        key = self._key(plan, scope)
+        with self._lock:
+            entries = [existing for existing in self._load(key)
+                       if (existing["intent"], existing["days"], existing["words"])
+                       != (entry["intent"], entry["days"], entry["words"])]
+            entries.insert(0, entry)
+            self.cache.set(key, json.dumps(entries[:self.variants], ensure_ascii=False))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.cache.clear()
+            self.hits = self.near_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "backend": type(self.cache.store).__name__,
+                "plans": len(self.cache.store),
+                "max_plans": self.cache.store.max_entries,
+                "variants_per_plan": self.variants,
+                "ttl_seconds": self.cache.ttl_seconds,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.cache.store.evictions,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,119 @@
+"""
+HTML sanitizers for generated itineraries.
+
+The default sanitizer is a single-pass allowlist filter on top of
+`html.parser.HTMLParser`: it never builds a tree, keeps only the tags the
+prompts ask for, and drops every attribute except the `local-tips` class.
+The BeautifulSoup sanitizer is kept as a fallback.
+"""
+from html import escape
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+ALLOWED_TAGS = frozenset({"h1", "h2", "h3", "h4", "p", "strong", "em", "div"})
+ALLOWED_CLASSES = {"div": "local-tips"}
+
+# Elements whose content is dropped along with the tag itself
+DROPPED_CONTENT_TAGS = frozenset({
+    "script", "style", "template", "iframe", "object", "embed",
+    "noscript", "svg", "math", "head", "title", "textarea", "select",
+})
+
+
+class AllowlistSanitizer(HTMLParser):
+    """
+    Streaming allowlist sanitizer.
+
+    Feed it HTML in any number of chunks; `close()` returns the cleaned
+    markup. Disallowed tags are unwrapped (their text is kept) and tags left
+    open by the model are closed so the output is always well-formed.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._out: List[str] = []
+        self._open: List[Tuple[str, bool]] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in DROPPED_CONTENT_TAGS:
+            self._skip_depth += 1
+            return
+        if self._skip_depth or tag not in ALLOWED_TAGS:
+            return
+
+        required_class = ALLOWED_CLASSES.get(tag)
+        if required_class is None:
+            self._out.append(f"<{tag}>")
+            self._open.append((tag, True))
+        elif any(name == "class" and value and required_class in value.split() for name, value in attrs):
+            self._out.append(f'<{tag} class="{required_class}">')
+            self._open.append((tag, True))
+        else:
+            # Unwrap the element but remember it so its end tag is dropped too
+            self._open.append((tag, False))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in DROPPED_CONTENT_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+            return
+        if self._skip_depth or tag not in ALLOWED_TAGS:
+            return
+
+        for position in range(len(self._open) - 1, -1, -1):
+            if self._open[position][0] == tag:
+                # Close anything the model left open inside this element
+                while len(self._open) > position:
+                    open_tag, emitted = self._open.pop()
+                    if emitted:
+                        self._out.append(f"</{open_tag}>")
+                return
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self._out.append(escape(data, quote=False))
+
+    def close(self) -> str:
+        super().close()
+        while self._open:
+            tag, emitted = self._open.pop()
+            if emitted:
+                self._out.append(f"</{tag}>")
+        return "".join(self._out)
+
+
+def sanitize_allowlist(raw_html: str) -> str:
+    """Sanitizes HTML in one pass, keeping only allowlisted tags."""
+    parser = AllowlistSanitizer()
+    parser.feed(raw_html)
+    return parser.close().strip()
+
+
+def sanitize_bs4(raw_html: str) -> str:
+    """Sanitizes HTML with a full BeautifulSoup round-trip (fallback)."""
+    # Imported lazily so the default path never pays for bs4
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(raw_html, 'html.parser')
+
+    # Remove any potentially harmful tags
+    for tag in soup(['script', 'style', 'meta', 'link']):
+        tag.decompose()
+
+    # Ensure proper structure
+    clean_html = str(soup)
+    return clean_html.strip()
+
+
+SANITIZERS: Dict[str, Callable[[str], str]] = {
+    "allowlist": sanitize_allowlist,
+    "bs4": sanitize_bs4,
+}
+
+
+def get_sanitizer(name: str) -> Callable[[str], str]:
+    """Looks up a sanitizer by name."""
+    try:
+        return SANITIZERS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown sanitizer: {name}") from None
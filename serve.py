@@ -0,0 +1,318 @@
+"""
+Production launcher for the Flask app.
+
+    python serve.py [--host 0.0.0.0] [--port 5000] [--workers 4] [--threads 8]
+                    [--preload] [--graceful-timeout 30]
+    python serve.py --import-times [20]
+
+The master process binds the socket once and forks `--workers` processes
+that share it; each handles requests on a pool of `--threads` threads. A
+worker imports the app (with `--preload` it inherits the master's import and
+only rebuilds the model backend, see `app.init_worker`), runs `app.warm_up`,
+and only then starts accepting connections. Workers that exit unexpectedly
+are replaced.
+
+SIGTERM or SIGINT drains the server: workers stop accepting, finish
+in-flight requests for up to `--graceful-timeout` seconds and exit; any
+still running after that are killed.
+
+With more than one worker, stored plans default to the SQLite plan store so
+a planId from one worker resolves on all of them.
+
+Each worker logs its import and warm-up times, and reports them under
+`startup` in /stats and as `planner_startup_seconds` in /metrics.
+`--import-times` prints the slowest modules behind `import app`
+(from `python -X importtime`) and exits.
+
+Where fork() is unavailable a single worker runs in-process.
+"""
+import argparse
+import logging
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from werkzeug.serving import BaseWSGIServer
+
+log = logging.getLogger("serve")
+
+# A worker that dies this soon after starting is broken, not unlucky
+MIN_WORKER_LIFETIME = 2.0
+# Longest a busy worker waits for a free thread before checking for shutdown again
+ACCEPT_WAIT = 0.5
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    Serves an already bound socket, handling connections on a fixed thread pool.
+
+    A connection is only accepted when a thread is free to handle it. While
+    every thread is busy, new connections stay in the shared listen backlog
+    where an idle worker can take them, instead of queueing behind this one.
+    """
+
+    def __init__(self, app, sock: socket.socket, threads: int):
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, fd=sock.fileno())
+        threads = max(1, threads)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        self.slots = threading.BoundedSemaphore(threads)
+        # Workers share the socket, so another one may take a connection between select() and accept()
+        self.socket.setblocking(False)
+
+    def get_request(self):
+        # Waiting in bounded steps keeps serve_forever responsive to shutdown()
+        if not self.slots.acquire(timeout=ACCEPT_WAIT):
+            raise BlockingIOError("every request thread is busy")
+        try:
+            request, client_address = super().get_request()
+        except BaseException:
+            self.slots.release()
+            raise
+        request.setblocking(True)
+        return request, client_address
+
+    def process_request(self, request, client_address) -> None:
+        self.pool.submit(self._handle, request, client_address)
+
+    def shutdown_request(self, request) -> None:
+        # Called exactly once for every accepted connection, however it ended
+        try:
+            super().shutdown_request(request)
+        finally:
+            self.slots.release()
+
+    def _handle(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self, timeout: float) -> bool:
+        """Stops accepting, then waits up to `timeout` for in-flight requests. Returns whether they all finished."""
+        self.shutdown()
+        waiter = threading.Thread(target=self.pool.shutdown, kwargs={"wait": True}, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+        return not waiter.is_alive()
+
+
+def share_plan_store(workers: int) -> None:
+    """
+    A planId handed out by one worker may be fetched from any other, so with
+    several workers the plan store defaults to SQLite, which they all share.
+    Must run before the app is imported. An explicit memory store is kept,
+    with a warning.
+    """
+    if workers <= 1:
+        return
+    backend = os.environ.setdefault("PLAN_STORE_BACKEND", "sqlite")
+    if backend.lower() == "memory":
+        log.warning("PLAN_STORE_BACKEND=memory keeps plans per worker; with %d workers a planId from one "
+                    "worker is unknown to the others. Use sqlite to share them.", workers)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    return socket.create_server((host, port), family=family, backlog=backlog)
+
+
+def import_app():
+    """Imports the app, recording how long it took."""
+    started = time.perf_counter()
+    import app as planner
+
+    planner.startup_timings.setdefault("import", round(time.perf_counter() - started, 4))
+    return planner
+
+
+def run_worker(sock: socket.socket, threads: int, graceful_timeout: float, preloaded: bool) -> int:
+    """Warms up, serves until SIGTERM/SIGINT, then drains. Returns the exit status."""
+    started = time.perf_counter()
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    if preloaded:
+        planner = sys.modules["app"]
+        planner.init_worker()
+    else:
+        planner = import_app()
+    planner.warm_up()
+
+    server = PooledWSGIServer(planner.app, sock, threads)
+    threading.Thread(target=server.serve_forever, name="accept", daemon=True).start()
+    planner.startup_timings["ready"] = round(time.perf_counter() - started, 4)
+    log.info("Worker %d ready in %.3fs %s", os.getpid(), planner.startup_timings["ready"], planner.startup_timings)
+
+    stop.wait()
+    log.info("Worker %d draining", os.getpid())
+    if server.drain(graceful_timeout):
+        return 0
+    log.warning("Worker %d still had requests running after %.0fs", os.getpid(), graceful_timeout)
+    return 1
+
+
+class Master:
+    """Forks workers onto a shared socket, replaces ones that die and drains them on shutdown."""
+
+    def __init__(self, sock: socket.socket, workers: int, threads: int, graceful_timeout: float, preload: bool):
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload
+        self.children: Dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        status = 1
+        try:
+            status = run_worker(self.sock, self.threads, self.graceful_timeout, self.preload)
+        except Exception:
+            log.exception("Worker %d failed", os.getpid())
+        finally:
+            # Never return into the master's code
+            logging.shutdown()
+            os._exit(status)
+
+    def _reap(self) -> List[Tuple[int, int, float]]:
+        """Collects exited workers as (pid, exit status, seconds they ran)."""
+        exited = []
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            if started is not None:
+                exited.append((pid, os.waitstatus_to_exitcode(status), time.monotonic() - started))
+        return exited
+
+    def _stop(self, *_) -> None:
+        self.stopping = True
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            time.sleep(0.2)
+            for pid, code, lifetime in self._reap():
+                if self.stopping:
+                    break
+                if lifetime < MIN_WORKER_LIFETIME:
+                    log.error("Worker %d exited with %d after %.1fs; shutting down", pid, code, lifetime)
+                    self.stopping = True
+                    self.shutdown()
+                    return 1
+                log.warning("Worker %d exited with %d; starting a replacement", pid, code)
+                self.spawn()
+        return self.shutdown()
+
+    def shutdown(self) -> int:
+        """Asks every worker to drain, killing the ones that outlive the grace period."""
+        log.info("Draining %d workers", len(self.children))
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        failed = 0
+        while self.children and time.monotonic() < deadline:
+            failed += sum(1 for _, code, _ in self._reap() if code != 0)
+            time.sleep(0.05)
+        for pid in list(self.children):
+            log.warning("Killing worker %d", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            failed += 1
+        self.children.clear()
+        return 1 if failed else 0
+
+
+# ---------------- IMPORT TIMES ---------------- #
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s?(.+)$")
+
+
+def parse_import_times(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Parses `-X importtime` output into (module, self us, cumulative us, depth), slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            name = match.group(3)
+            depth = (len(name) - len(name.lstrip())) // 2
+            rows.append((name.strip(), int(match.group(1)), int(match.group(2)), depth))
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def report_import_times(top: int) -> int:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = parse_import_times(result.stderr)
+    if result.returncode != 0 or not rows:
+        print(result.stderr, file=sys.stderr)
+        return 1
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, depth in rows[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the travel planner with preforked, warmed-up workers.")
+    parser.add_argument("--host", default=os.getenv("SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVE_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1))),
+                        help="worker processes")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SERVE_THREADS", "8")),
+                        help="request threads per worker")
+    parser.add_argument("--preload", action="store_true", default=os.getenv("SERVE_PRELOAD", "False") == "True",
+                        help="import the app once in the master and fork workers from it")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30")),
+                        help="seconds workers get to finish in-flight requests on shutdown")
+    parser.add_argument("--import-times", type=int, nargs="?", const=20, metavar="N",
+                        help="print the N slowest imports behind `import app` and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s")
+    if args.import_times is not None:
+        return report_import_times(args.import_times)
+
+    if hasattr(os, "fork"):
+        share_plan_store(args.workers)
+    started = time.perf_counter()
+    sock = bind_socket(args.host, args.port)
+    log.info("Listening on http://%s:%d", *sock.getsockname()[:2])
+    if args.preload:
+        planner = import_app()
+        log.info("Preloaded the app in %.3fs", planner.startup_timings["import"])
+
+    try:
+        if not hasattr(os, "fork"):
+            if args.workers > 1:
+                log.warning("fork() is unavailable; running a single worker")
+            return run_worker(sock, args.threads, args.graceful_timeout, args.preload)
+        master = Master(sock, args.workers, args.threads, args.graceful_timeout, args.preload)
+        log.info("Master started in %.3fs; forking %d workers", time.perf_counter() - started, master.workers)
+        return master.run()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
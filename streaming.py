@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# A new day starts at every <h2>, so everything before it is a finished section.
+_SECTION_START = re.compile(r"<h2[\s>]", re.IGNORECASE)
+_DAY_NUMBER = re.compile(r"Day\s+(\d+)", re.IGNORECASE)
+_RAW_TEXT_TAGS = ("script", "style")
+
+
+def _inside_raw_text(fragment: str) -> bool:
+    """True if the fragment leaves a <script> or <style> element open."""
+    lowered = fragment.lower()
+    return any(lowered.count(f"<{tag}") > lowered.count(f"</{tag}") for tag in _RAW_TEXT_TAGS)
+
+
+class DaySectionSplitter:
+    """
+    Splits a streamed HTML itinerary into complete sections.
+
+    Text before the first `<h2>` is the intro; every `<h2>` and the content
+    that follows it up to the next `<h2>` is one day. A section is only
+    released once the next one has started (or the stream has ended), so
+    callers never see a half-written day.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        self._buffer += chunk
+        sections = []
+        search_from = 1
+        while True:
+            match = _SECTION_START.search(self._buffer, search_from)
+            if not match:
+                break
+            candidate = self._buffer[:match.start()]
+            if _inside_raw_text(candidate):
+                search_from = match.end()
+                continue
+            if candidate.strip():
+                sections.append(candidate)
+            self._buffer = self._buffer[match.start():]
+            search_from = 1
+        return sections
+
+    def close(self) -> List[str]:
+        remainder, self._buffer = self._buffer, ""
+        return [remainder] if remainder.strip() else []
+
+
+class IncrementalSanitizer:
+    """Sanitizes a chunked HTML stream one complete section at a time."""
+
+    def __init__(self, sanitize: Callable[[str], str]):
+        self._sanitize = sanitize
+        self._splitter = DaySectionSplitter()
+
+    def feed(self, chunk: str) -> List[str]:
+        return self._clean(self._splitter.feed(chunk))
+
+    def close(self) -> List[str]:
+        return self._clean(self._splitter.close())
+
+    def _clean(self, sections: List[str]) -> List[str]:
+        cleaned = (self._sanitize(section) for section in sections)
+        return [section for section in cleaned if section]
+
+
+def split_sections(plan_html: str) -> List[str]:
+    """Splits an already complete plan into the same sections a stream yields."""
+    splitter = DaySectionSplitter()
+    return splitter.feed(plan_html) + splitter.close()
+
+
+def day_number(section: str) -> Optional[int]:
+    """Returns the day number of a section, or None for the intro."""
+    if not _SECTION_START.match(section):
+        return None
+    match = _DAY_NUMBER.search(section)
+    return int(match.group(1)) if match else None
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def section_events(sections: Iterable[str], start_index: int = 0) -> Iterator[str]:
+    """Turns sanitized sections into `intro` / `day` SSE events."""
+    for index, section in enumerate(sections, start_index):
+        event = "day" if _SECTION_START.match(section) else "intro"
+        yield format_sse(event, {"index": index, "day": day_number(section), "html": section})
@@ -1,11 +1,15 @@
 import pytest
+import gzip
 import json
-from unittest.mock import patch, MagicMock, mock_open
+import re
+from unittest.mock import patch, MagicMock
 
 # Before importing the app, set the environment for testing
 import os
 os.environ['MOCK_MODE'] = 'True'
 
+import app as app_module
+from llm_backends import GeminiBackend, MockFileBackend, SimulatedBackend
 from app import app, generate_trip_prompt, generate_reschedule_prompt, sanitize_html, _process_plan_request, _process_reschedule_request, enhance_with_local_insights, generate_with_gemini
 
 # --- Fixtures ---
@@ -17,6 +21,15 @@ def client():
     with app.test_client() as client:
         yield client
 
+@pytest.fixture(autouse=True)
+def clear_plan_cache():
+    """Keeps cached plans and reschedules from leaking between tests."""
+    if app_module.plan_cache:
+        app_module.plan_cache.clear()
+    if app_module.reschedule_cache:
+        app_module.reschedule_cache.clear()
+    yield
+
 # --- Helper Function Tests ---
 
 def test_generate_trip_prompt():
@@ -63,6 +76,111 @@ def test_process_plan_request_success(mock_sanitize, mock_enhance, mock_gemini):
     mock_enhance.assert_called_once_with("raw plan", "Delhi")
     mock_sanitize.assert_called_once_with("enhanced plan")
 
+@patch('app.generate_with_gemini')
+@patch('app.enhance_with_local_insights')
+@patch('app.sanitize_html')
+def test_process_plan_request_uses_cache(mock_sanitize, mock_enhance, mock_gemini):
+    mock_gemini.return_value = "raw plan"
+    mock_enhance.return_value = "enhanced plan"
+    mock_sanitize.return_value = "sanitized plan"
+
+    first, _ = _process_plan_request({"source": "Mumbai", "destination": "Goa", "days": 3})
+    second, status_code = _process_plan_request({"source": " mumbai ", "destination": "GOA", "days": "3"})
+
+    assert status_code == 200
+    assert second["plan"] == first["plan"] == "sanitized plan"
+    assert "from mumbai to GOA" in second["message"]
+    mock_gemini.assert_called_once()
+    assert app_module.plan_cache.stats()["hits"] == 1
+
+@patch('app.generate_with_gemini', return_value="<h1>Plan</h1>")
+def test_plan_cache_misses_after_mode_switch_or_tips_reload(mock_gemini, tmp_path):
+    path = tmp_path / "tips.json"
+    path.write_text(json.dumps({"goa": "Old tip."}), encoding="utf-8")
+    data = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    with patch('app.local_tips', app_module.ReloadingTipsIndex(str(path), check_interval=0)):
+        first, _ = _process_plan_request(data)
+        assert "Old tip." in first["plan"]
+        _process_plan_request(data)
+        assert mock_gemini.call_count == 1
+
+        path.write_text(json.dumps({"goa": "New tip."}), encoding="utf-8")
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        second, _ = _process_plan_request(data)
+        assert "New tip." in second["plan"]
+        assert mock_gemini.call_count == 2
+
+        with patch('app.PLAN_GENERATION_MODE', 'parallel'), \
+                patch('app._generate_plan_parallel', return_value=("<h1>Parallel</h1>", True)) as parallel:
+            _process_plan_request(data)
+        parallel.assert_called_once()
+
+def test_process_plan_request_coalesces_identical_requests():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    release = threading.Event()
+
+    def slow_generate(prompt):
+        release.wait(5)
+        return "<h1>Plan</h1>"
+
+    flight = app_module.SingleFlight()
+    data = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    with patch('app.generate_with_gemini', side_effect=slow_generate) as mock_gemini, \
+            patch('app.generation_flight', flight), ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(_process_plan_request, data) for _ in range(3)]
+        while flight.coalesced < 2:
+            pass
+        release.set()
+        plans = {future.result()[0]["plan"] for future in futures}
+
+    assert len(plans) == 1
+    mock_gemini.assert_called_once()
+    assert flight.stats()["coalesced"] == 2
+
+def _fake_parallel_model(prompt):
+    if "INTRO:" in prompt:
+        return "INTRO: Sun and sand.\nDay 1 | Beaches | Palolem\nDay 2 | Forts | Aguada\nDay 3 | Churches | Old Goa"
+    number = prompt.split("detailed schedule for Day ", 1)[1].split(" ", 1)[0]
+    if number == "2":
+        raise app_module.ModelError("timeout")
+    return f"<h2>📅 Day {number}: Theme</h2><h3>🌅 Morning: Walk</h3><p>Walk {number}.</p>"
+
+@patch('app.PLAN_GENERATION_MODE', 'parallel')
+@patch('app.generate_with_gemini', side_effect=_fake_parallel_model)
+def test_process_plan_request_parallel_mode(mock_gemini):
+    data = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    response, status_code = _process_plan_request(data)
+
+    assert status_code == 200
+    plan = response["plan"]
+    assert plan.startswith("<h1>🗺️ Your 3-Day Goa Adventure</h1>\n<p>Sun and sand.</p>")
+    assert plan.index("Walk 1.") < plan.index("Day 2: Forts") < plan.index("Walk 3.")
+    assert "couldn't finish planning this day" in plan
+    assert mock_gemini.call_count == 4
+    # A plan with a missing day is not cached
+    _process_plan_request(data)
+    assert mock_gemini.call_count == 8
+
+@patch('app.generate_with_gemini')
+def test_process_plan_request_does_not_cache_errors(mock_gemini):
+    mock_gemini.side_effect = app_module.ModelError("unavailable")
+    data = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    _process_plan_request(data)
+    response, status_code = _process_plan_request(data)
+    assert mock_gemini.call_count == 2
+    assert status_code == 503
+    assert response["errorType"] == "unavailable"
+
+@patch('app.generate_with_gemini')
+def test_plan_trip_endpoint_maps_model_errors(mock_gemini, client):
+    mock_gemini.side_effect = app_module.ModelError("rate_limited", retry_after=7)
+    response = client.post("/plan", json={"source": "A", "destination": "B", "days": 2})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert json.loads(response.data)["errorType"] == "rate_limited"
+
 @pytest.mark.parametrize("data, error_message", [
     ({"source": "A"}, "Source, destination, and days are required!"),
     ({"source": "A", "destination": "B"}, "Source, destination, and days are required!"),
@@ -92,9 +210,227 @@ def test_process_reschedule_request_success(mock_sanitize, mock_gemini):
     assert response["updatedPlan"] == "sanitized updated plan"
     assert "Your itinerary has been updated" in response["message"]
     mock_gemini.assert_called_once()
-    mock_sanitize.assert_called_once_with("updated raw plan")
+    # The previous plan is sanitized for parsing first, then the model output
+    mock_sanitize.assert_called_with("updated raw plan")
+
+@patch('app.generate_with_gemini')
+def test_process_reschedule_request_rewrites_only_target_days(mock_gemini):
+    old_plan = (
+        "<h1>Trip</h1><h2>📅 Day 1: Beach</h2><h3>🌅 Morning: Swim</h3><p>Swim.</p>"
+        "<h2>📅 Day 2: Trek</h2><h3>🌅 Morning: Hike</h3><p>Steep hike.</p>"
+        "<h2>📅 Day 3: Forts</h2><h3>🌅 Morning: Fort</h3><p>Fort walk.</p>"
+    )
+    mock_gemini.return_value = "<p>Day 2 is now relaxing.</p><h2>📅 Day 2: Spa</h2><h3>🌅 Morning: Spa</h3><p>Massage.</p>"
+
+    response, status_code = _process_reschedule_request({"plan": old_plan, "suggestion": "I'm tired on day 2"})
+
+    assert status_code == 200
+    assert response["changedDays"] == [2]
+    plan = response["updatedPlan"]
+    assert plan.startswith("<p>Day 2 is now relaxing.</p>")
+    assert "Massage." in plan and "Steep hike." not in plan
+    assert "Swim." in plan and "Fort walk." in plan
+    prompt = mock_gemini.call_args[0][0]
+    assert "Steep hike." in prompt
+    assert "Swim." not in prompt and "Fort walk." not in prompt
+
+    # Rescheduling the result again replaces the acknowledgement instead of stacking another one
+    mock_gemini.return_value = "<p>Day 3 is now shorter.</p><h2>📅 Day 3: Beach</h2><p>Nap.</p>"
+    again, _ = _process_reschedule_request({"plan": plan, "suggestion": "day 3 is too long"})
+    assert again["updatedPlan"].startswith("<p>Day 3 is now shorter.</p>\n<h1>Trip</h1>")
+    assert "Day 2 is now relaxing." not in again["updatedPlan"]
+
+@patch('app.generate_with_gemini')
+def test_near_duplicate_reschedule_suggestions_share_one_model_call(mock_gemini):
+    old_plan = "<h2>📅 Day 1: Beach</h2><p>Swim.</p><h2>📅 Day 2: Trek</h2><p>Steep hike.</p>"
+    mock_gemini.return_value = "<h2>📅 Day 2: Spa</h2><p>Massage.</p>"
+
+    first, _ = _process_reschedule_request({"plan": old_plan, "suggestion": "I'm tired on day 2"})
+    second, status_code = _process_reschedule_request({"plan": old_plan, "suggestion": "Make Day 2 relaxing!"})
+
+    assert status_code == 200
+    assert mock_gemini.call_count == 1
+    assert second["updatedPlan"] == first["updatedPlan"] and second["changedDays"] == [2]
+    assert second["cached"] is True and second["promptTokens"]["sent"] == 0
+    assert "cached" not in first
+
+    # A different request, intent, day or plan still goes to the model
+    _process_reschedule_request({"plan": old_plan, "suggestion": "Replace the hike with a spa on day 2"})
+    _process_reschedule_request({"plan": old_plan, "suggestion": "Make day 2 cheaper"})
+    _process_reschedule_request({"plan": old_plan, "suggestion": "I'm tired on day 1"})
+    _process_reschedule_request({"plan": old_plan + "<p>Note</p>", "suggestion": "I'm tired on day 2"})
+    assert mock_gemini.call_count == 5
+    assert app_module.reschedule_cache.stats()["hits"] == 1
+
+@patch('app.generate_with_gemini')
+def test_process_reschedule_request_full_mode_regenerates_everything(mock_gemini):
+    mock_gemini.return_value = "<p>Full plan</p>"
+    data = {"plan": "<h2>📅 Day 1: A</h2><p>Swim.</p>", "suggestion": "tired on day 1", "mode": "full"}
+    with patch('app.RESCHEDULE_PROMPT_FORMAT', 'html'):
+        response, _ = _process_reschedule_request(data)
+    assert response["updatedPlan"] == "<p>Full plan</p>"
+    assert "changedDays" not in response
+
+COMPACT_OLD_PLAN = (
+    "<h1>🗺️ Your 3-Day Goa Adventure</h1><p>Sun and sea.</p>"
+    "<h2>📅 Day 1: Beach</h2><h3>🌅 Morning: Swim</h3><p>Swim at Baga (free).</p>"
+    "<h4><strong>Estimated Daily Budget:</strong> ₹1,000</h4>"
+    "<h2>📅 Day 2: Trek</h2><h3>🌅 Morning: Hike</h3><p>Steep hike (₹500).</p>"
+    "<h4><strong>Estimated Daily Budget:</strong> ₹2,000</h4>"
+    "<h2>📅 Day 3: Forts</h2><h3>🌅 Morning: Fort</h3><p>Fort walk.</p>"
+    '<div class="local-tips"><h3>💡 Quick Travel Tips for Goa</h3><p><em>Rent a scooter.</em></p></div>'
+)
+
+@patch('app.generate_with_gemini')
+def test_reschedule_sends_compact_prompt_and_inflates_compact_reply(mock_gemini):
+    mock_gemini.return_value = "ACK: Day 2 is calmer now.\nD2: Spa Day\nM: Spa | Massage in Candolim (₹2,000).\n$: ₹2,500"
+
+    response, status_code = _process_reschedule_request({"plan": COMPACT_OLD_PLAN, "suggestion": "I'm tired on day 2"})
+
+    assert status_code == 200
+    assert response["changedDays"] == [2]
+    plan = response["updatedPlan"]
+    assert plan.startswith("<p>Day 2 is calmer now.</p>")
+    assert "<h2>📅 Day 2: Spa Day</h2>" in plan
+    assert "<h3>🌅 Morning: Spa</h3>" in plan and "Steep hike" not in plan
+    assert "<strong>Estimated Daily Budget:</strong> ₹2,500" in plan
+    prompt = mock_gemini.call_args[0][0]
+    assert "M: Hike | Steep hike (₹500)." in prompt
+    assert "<h3>" not in prompt and "Swim at Baga" not in prompt
+    tokens = response["promptTokens"]
+    assert tokens["calls"] == 1
+    assert tokens["saved"] == tokens["htmlEquivalent"] - tokens["sent"] > 0
+
+@patch('app.generate_with_gemini')
+def test_full_compact_reschedule_keeps_title_and_tips(mock_gemini):
+    mock_gemini.return_value = "ACK: All calmer.\nD1: Lazy Beach\nM: Nap | Hammock.\nD2: Spa\nM: Spa | Massage.\nD3: Cafes\nM: Cafe | Coffee."
+    response, _ = _process_reschedule_request({"plan": COMPACT_OLD_PLAN, "suggestion": "Make it relaxing"})
+    plan = response["updatedPlan"]
+    assert response["changedDays"] == [1, 2, 3]
+    assert "<h1>🗺️ Your 3-Day Goa Adventure</h1>" in plan
+    assert "Rent a scooter." in plan
+    assert "Hammock." in plan and "Fort walk." not in plan
+
+@pytest.mark.parametrize("reply", ["Sorry, I can't help with that.", "ACK: Done.\nD9: Elsewhere\nM: Walk | Far away."])
+@patch('app.generate_with_gemini')
+def test_unparsable_reschedule_reply_is_an_error_and_not_cached(mock_gemini, reply):
+    mock_gemini.return_value = reply
+    data = {"plan": COMPACT_OLD_PLAN, "suggestion": "Make it relaxing"}
+    response, status_code = _process_reschedule_request(data)
+    assert status_code == 502
+    assert response["errorType"] == "internal"
+
+    mock_gemini.return_value = "ACK: Calmer.\nD1: Lazy Beach\nM: Nap | Hammock."
+    response, status_code = _process_reschedule_request(data)
+    assert status_code == 200 and response["changedDays"] == [1]
+    assert mock_gemini.call_count == 2
+
+@pytest.mark.parametrize("prompt_format", ["html", "compact"])
+def test_coalesced_reschedules_keep_each_plans_own_days(prompt_format):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    release = threading.Event()
+
+    def slow_generate(prompt):
+        release.wait(5)
+        return "<p>Calmer now.</p><h2>📅 Day 2: Spa</h2><h3>🌅 Morning: Spa</h3><p>Massage.</p>"
+
+    # Same day themes, different day 1 content, so the day 2 prompts are identical
+    plans = [COMPACT_OLD_PLAN, COMPACT_OLD_PLAN.replace("Swim at Baga", "Surf at Anjuna")]
+    flight = app_module.SingleFlight()
+    with patch('app.generate_with_gemini', side_effect=slow_generate), patch('app.generation_flight', flight), \
+            patch('app.RESCHEDULE_PROMPT_FORMAT', prompt_format), ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(_process_reschedule_request, {"plan": plan, "suggestion": "I'm tired on day 2"})
+                   for plan in plans]
+        deadline = time.monotonic() + 5
+        while flight.coalesced < 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        responses = [future.result()[0] for future in futures]
+
+    assert flight.stats()["executions"] == 1 and flight.stats()["coalesced"] == 1
+    assert "Swim at Baga" in responses[0]["updatedPlan"] and "Surf at Anjuna" not in responses[0]["updatedPlan"]
+    assert "Surf at Anjuna" in responses[1]["updatedPlan"] and "Swim at Baga" not in responses[1]["updatedPlan"]
+    assert all("Massage." in response["updatedPlan"] for response in responses)
+
+@pytest.mark.parametrize("prompt_format", ["html", "compact"])
+def test_coalesced_async_reschedules_keep_each_plans_own_days(prompt_format):
+    import asyncio
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_generate(prompt):
+            await release.wait()
+            return "<p>Calmer now.</p><h2>📅 Day 2: Spa</h2><h3>🌅 Morning: Spa</h3><p>Massage.</p>"
+
+        plans = [COMPACT_OLD_PLAN, COMPACT_OLD_PLAN.replace("Swim at Baga", "Surf at Anjuna")]
+        flight = app_module.AsyncSingleFlight()
+        with patch('app.generate_with_gemini_async', side_effect=slow_generate), \
+                patch('app.async_generation_flight', flight), patch('app.RESCHEDULE_PROMPT_FORMAT', prompt_format):
+            tasks = [asyncio.ensure_future(app_module._process_reschedule_request_async(
+                {"plan": plan, "suggestion": "I'm tired on day 2"})) for plan in plans]
+            for _ in range(500):
+                if flight.coalesced:
+                    break
+                await asyncio.sleep(0.01)
+            release.set()
+            return [response for response, _ in await asyncio.gather(*tasks)], flight.stats()
+
+    responses, stats = asyncio.run(scenario())
+    assert (stats["executions"], stats["coalesced"]) == (1, 1)
+    assert "Swim at Baga" in responses[0]["updatedPlan"] and "Surf at Anjuna" not in responses[0]["updatedPlan"]
+    assert "Surf at Anjuna" in responses[1]["updatedPlan"] and "Swim at Baga" not in responses[1]["updatedPlan"]
+
+def test_reschedule_chunks_prompts_over_the_token_budget():
+    backend = SimulatedBackend(first_token_latency=0, tokens_per_second=1e9)
+    single = app_module.estimate_tokens(app_module.generate_compact_reschedule_prompt(
+        app_module.parse_itinerary(COMPACT_OLD_PLAN), [1, 2, 3], "Make it relaxing"))
+    with patch('app.llm_backend', backend), patch('app.RESCHEDULE_MAX_PROMPT_TOKENS', single - 1):
+        response, status_code = _process_reschedule_request({"plan": COMPACT_OLD_PLAN, "suggestion": "Make it relaxing"})
+    assert status_code == 200
+    assert response["promptTokens"]["calls"] == backend.calls > 1
+    assert response["changedDays"] == [1, 2, 3]
+    assert app_module.parse_itinerary(response["updatedPlan"]).day_numbers() == [1, 2, 3]
+
+@patch('app.generate_with_gemini')
+def test_html_reschedule_chunks_named_days_over_the_token_budget(mock_gemini):
+    def rewrite_requested_days(prompt):
+        requested = re.search(r"Days to Update \(([^)]*)\)", prompt).group(1)
+        return "".join(f"<h2>📅 {label}: Calm</h2><p>Rest.</p>" for label in requested.split(", "))
+
+    mock_gemini.side_effect = rewrite_requested_days
+    data = {"plan": COMPACT_OLD_PLAN, "suggestion": "days 1-3 are tiring"}
+    single = app_module.estimate_tokens(app_module.generate_day_reschedule_prompt(
+        app_module.parse_itinerary(COMPACT_OLD_PLAN), [1, 2, 3], data["suggestion"]))
+    with patch('app.RESCHEDULE_PROMPT_FORMAT', 'html'), patch('app.RESCHEDULE_MAX_PROMPT_TOKENS', single - 1):
+        response, status_code = _process_reschedule_request(data)
+    assert status_code == 200
+    assert response["promptTokens"]["calls"] == mock_gemini.call_count > 1
+    assert all(app_module.estimate_tokens(call.args[0]) < single for call in mock_gemini.call_args_list)
+    assert response["changedDays"] == [1, 2, 3]
+
+@pytest.mark.parametrize("prompt_format", ["compact", "html"])
+def test_reschedule_with_named_days_that_cannot_fit_says_so(prompt_format, client):
+    with patch('app.RESCHEDULE_MAX_PROMPT_TOKENS', 50), patch('app.RESCHEDULE_PROMPT_FORMAT', prompt_format):
+        response = client.post("/reschedule", json={"plan": COMPACT_OLD_PLAN, "suggestion": "day 2 is tiring"})
+    assert response.status_code == 413
+    data = response.get_json()
+    assert data["targetDays"] == [2]
+    assert "selected days (Day 2)" in data["error"] and "name the days" not in data["error"]
+
+@pytest.mark.parametrize("prompt_format", ["compact", "html"])
+def test_reschedule_rejects_prompts_that_cannot_fit(prompt_format, client):
+    with patch('app.RESCHEDULE_MAX_PROMPT_TOKENS', 50), patch('app.RESCHEDULE_PROMPT_FORMAT', prompt_format):
+        response = client.post("/reschedule", json={"plan": COMPACT_OLD_PLAN, "suggestion": "Make it relaxing"})
+    assert response.status_code == 413
+    data = response.get_json()
+    assert data["errorType"] == "prompt_too_large"
+    assert data["limit"] == 50
 
 @pytest.mark.parametrize("data, error_message", [
+    ({"plan": "p", "suggestion": "s", "mode": "partial"}, "Mode must be one of: auto, full."),
     ({}, "Both plan and suggestion are required!"),
     ({"plan": "some plan"}, "Both plan and suggestion are required!"),
     ({"suggestion": "some suggestion"}, "Both plan and suggestion are required!"),
@@ -114,6 +450,92 @@ def test_health_check(client):
     data = json.loads(response.data)
     assert data["status"] == "healthy"
 
+def test_stats_endpoint(client):
+    response = client.get("/stats")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["plan_cache"]["hits"] == 0
+
+def test_warm_up_records_startup_timings(client):
+    with patch.object(app_module.llm_backend, "warm_up") as backend_warm_up:
+        timings = app_module.warm_up()
+    backend_warm_up.assert_called_once()
+    assert {"warm_up_tips", "warm_up_sanitizer", "warm_up_model_client"} <= set(timings)
+    assert client.get("/stats").get_json()["startup"] == timings
+    assert 'planner_startup_seconds{phase="warm_up_tips"}' in client.get("/metrics").get_data(as_text=True)
+
+def test_init_worker_rebuilds_the_backend():
+    original = app_module.llm_backend
+    try:
+        app_module.init_worker()
+        assert app_module.llm_backend is not original
+        assert app_module.llm_backend.name == original.name
+    finally:
+        app_module.llm_backend = original
+
+def test_metrics_endpoint_reports_stages_and_requests(client):
+    client.post("/plan", json={"source": "Mumbai", "destination": "Goa", "days": 3})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert 'planner_requests_total{endpoint="/plan",status="200"}' in text
+    for stage in ("prompt_build", "generation", "tips", "sanitize"):
+        assert f'planner_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'planner_model_tokens_total{direction="in"}' in text
+    assert 'planner_local_tips_lookups_total{result="hit"}' in text
+    assert 'planner_plan_cache_lookups_total{result="miss"}' in text
+
+def test_metrics_count_model_errors(client):
+    before = app_module.MODEL_ERRORS.value(kind="timeout")
+    with patch.object(app_module.model_client, 'generate', side_effect=app_module.ModelError("timeout")):
+        response = client.post("/plan", json={"source": "Pune", "destination": "Goa", "days": 2})
+    assert response.status_code == 504
+    assert app_module.MODEL_ERRORS.value(kind="timeout") == before + 1
+
+def test_profiler_endpoint_is_disabled_by_default(client):
+    assert client.get("/debug/profiler").status_code == 404
+    assert client.post("/debug/profiler", json={"action": "start"}).status_code == 404
+
+def test_profiler_endpoint_toggles_sampling(client):
+    with patch('app.PROFILER_ENABLED', True), patch('app.profiler', app_module.SamplingProfiler()):
+        response = client.post("/debug/profiler", json={"action": "start", "interval": 0.002})
+        assert response.status_code == 200
+        assert response.get_json()["running"] is True
+        client.post("/plan", json={"source": "Mumbai", "destination": "Goa", "days": 3})
+        stopped = client.post("/debug/profiler", json={"action": "stop"}).get_json()
+        assert stopped["running"] is False
+        assert client.get("/debug/profiler").mimetype == "text/plain"
+        assert client.post("/debug/profiler", json={"action": "start", "interval": 5}).status_code == 400
+        assert client.post("/debug/profiler", json={"action": "pause"}).status_code == 400
+
+def test_plan_batch_endpoint_streams_results_and_summary(client):
+    jobs = [{"source": "Mumbai", "destination": "Goa", "days": 2},
+            {"source": "mumbai", "destination": "goa", "days": 2},
+            {"source": "Delhi", "destination": "Jaipur", "days": 0}]
+    response = client.post("/plan/batch", json={"jobs": jobs})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    results, summary = lines[:-1], lines[-1]["summary"]
+    assert sorted(record["status"] for record in results) == ["error", "ok"]
+    assert summary["duplicates"] == 1 and summary["succeeded"] == 1
+    assert summary["failures"] == {"invalid_request": 1}
+
+def test_plan_batch_endpoint_accepts_jsonl(client):
+    body = '{"source": "Mumbai", "destination": "Goa", "days": 2}\nnot json\n'
+    response = client.post("/plan/batch", data=body, content_type="application/x-ndjson")
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["statusCode"] == 400 and lines[0]["line"] == 2
+    assert lines[-1]["summary"]["invalid"] == 1
+
+def test_plan_batch_endpoint_limits(client):
+    assert client.post("/plan/batch", json={"jobs": "nope"}).status_code == 400
+    assert client.post("/plan/batch", data="", content_type="application/x-ndjson").status_code == 400
+    with patch('app.BATCH_MAX_JOBS', 1):
+        response = client.post("/plan/batch", json=[{"source": "A", "destination": "B", "days": 1}] * 2)
+    assert response.status_code == 413
+
 @patch('app._process_plan_request')
 def test_plan_trip_endpoint_success(mock_process, client):
     mock_process.return_value = ({"plan": "test plan", "message": "success"}, 200)
@@ -140,28 +562,162 @@ def test_reschedule_plan_endpoint_success(mock_process, client):
 
 # --- Mock-dependent function tests ---
 
-@patch('app.open', new_callable=mock_open, read_data='<h1>Mock Data</h1>')
-def test_generate_with_gemini_in_mock_mode(mock_file):
-    with patch('app.MOCK_MODE', True):
-        result = generate_with_gemini("any prompt")
-        assert result == '<h1>Mock Data</h1>'
-        mock_file.assert_called_once_with('mock_data.html', 'r', encoding='utf-8')
+def test_generate_with_gemini_in_mock_mode(tmp_path):
+    mock_path = tmp_path / "mock_data.html"
+    mock_path.write_text('<h1>Mock Data</h1>', encoding='utf-8')
+    with patch('app.llm_backend', MockFileBackend(str(mock_path))), \
+            patch('llm_backends.open', side_effect=open) as mock_file:
+        assert generate_with_gemini("any prompt") == '<h1>Mock Data</h1>'
+        assert generate_with_gemini("another prompt") == '<h1>Mock Data</h1>'
+    mock_file.assert_called_once_with(str(mock_path), 'r', encoding='utf-8')
 
-@patch('app.gemini_model')
-def test_generate_with_gemini_api_call_success(mock_gemini_model):
+def test_generate_with_gemini_api_call_success():
+    mock_gemini_model = MagicMock()
     mock_response = MagicMock()
     mock_response.text = "Gemini response"
     mock_gemini_model.generate_content.return_value = mock_response
-    with patch('app.MOCK_MODE', False):
+    with patch('app.llm_backend', GeminiBackend(mock_gemini_model)):
         result = generate_with_gemini("a real prompt")
     assert result == "Gemini response"
-    mock_gemini_model.generate_content.assert_called_once_with("a real prompt")
+    mock_gemini_model.generate_content.assert_called_once_with(
+        "a real prompt", request_options={"timeout": app_module.MODEL_ATTEMPT_TIMEOUT})
 
-@patch('app.json.load')
-@patch('app.open', new_callable=mock_open)
-def test_enhance_with_local_insights_success(mock_file, mock_json_load):
-    mock_json_load.return_value = {"goa": "Rent a scooter."}
-    result = enhance_with_local_insights("<h1>Goa Trip</h1>", "Goa")
+def test_generate_with_gemini_raises_classified_errors():
+    mock_gemini_model = MagicMock()
+    mock_gemini_model.generate_content.side_effect = ValueError("blocked response")
+    with patch('app.llm_backend', GeminiBackend(mock_gemini_model)), \
+            pytest.raises(app_module.ModelError) as error:
+        generate_with_gemini("a real prompt")
+    assert error.value.kind == "internal"
+    assert error.value.status_code == 502
+
+def test_enhance_with_local_insights_success(tmp_path):
+    tips_file = tmp_path / "local_tips.json"
+    tips_file.write_text(json.dumps({"goa": "Rent a scooter."}), encoding="utf-8")
+    with patch('app.local_tips', app_module.ReloadingTipsIndex(str(tips_file))):
+        result = enhance_with_local_insights("<h1>Goa Trip</h1>", "Goa")
     assert "Rent a scooter" in result
     assert "Quick Travel Tips for Goa" in result
-    mock_file.assert_called_once_with('local_tips.json', 'r', encoding='utf-8')
\ No newline at end of file
+
+def test_enhance_with_local_insights_prefers_most_specific_place():
+    result = enhance_with_local_insights("<h1>Trip</h1>", "Rajasthan - Jaipur")
+    assert "Quick Travel Tips for Jaipur" in result
+    assert "Rajasthan" not in result.split("</h1>", 1)[1]
+
+def test_enhance_with_local_insights_without_tips_file(tmp_path):
+    with patch('app.local_tips', app_module.ReloadingTipsIndex(str(tmp_path / "missing.json"))):
+        assert enhance_with_local_insights("<h1>Goa</h1>", "Goa") == "<h1>Goa</h1>"
+
+
+# --- Streaming Tests ---
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+@patch('app.stream_with_gemini')
+def test_plan_stream_endpoint_emits_day_events(mock_stream, client):
+    mock_stream.return_value = iter(["<h1>Goa</h1><p>Hi</p><h2>📅 Day 1: Sun</h2>", "<p>Beach</p><script>x</script>"])
+    response = client.post("/plan/stream", json={"source": "Mumbai", "destination": "Goa", "days": 1})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = _parse_sse(response.get_data(as_text=True))
+    assert [name for name, _ in events] == ["intro", "day", "tips", "done"]
+    assert events[1][1]["day"] == 1
+    assert "<script>" not in events[1][1]["html"]
+
+    # The finished stream is cached, so a plain /plan request is a hit
+    response, _ = _process_plan_request({"source": "Mumbai", "destination": "Goa", "days": 1})
+    assert "Day 1: Sun" in response["plan"]
+    mock_stream.assert_called_once()
+
+@patch('app.stream_with_gemini')
+def test_plan_stream_endpoint_reports_errors(mock_stream, client):
+    mock_stream.side_effect = RuntimeError("boom")
+    response = client.post("/plan/stream", json={"source": "A", "destination": "B", "days": 2})
+    events = _parse_sse(response.get_data(as_text=True))
+    assert events[-1][0] == "error"
+
+def test_plan_stream_endpoint_validates_input(client):
+    response = client.post("/plan/stream", json={"source": "A"})
+    assert response.status_code == 400
+
+def test_reschedule_stream_endpoint_in_mock_mode(client):
+    response = client.post("/reschedule/stream", json={"plan": "old", "suggestion": "relax"})
+    events = _parse_sse(response.get_data(as_text=True))
+    assert [name for name, _ in events].count("day") == 3
+    assert events[-1][0] == "done"
+
+# --- Stored Plans and Compression ---
+
+def test_plan_response_carries_an_id_that_fetches_the_plan(client):
+    created = client.post("/plan", json={"source": "Mumbai", "destination": "Goa", "days": 3}).get_json()
+    plan_id = created["planId"]
+
+    response = client.get(f"/plan/{plan_id}")
+    assert response.status_code == 200
+    assert response.get_json() == {"planId": plan_id, "plan": created["plan"]}
+    assert response.headers["ETag"] == f'"{plan_id}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+    revalidated = client.get(f"/plan/{plan_id}", headers={"If-None-Match": f'W/"{plan_id}"'})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+def test_get_plan_returns_404_for_unknown_ids(client):
+    assert client.get("/plan/" + "0" * 32).status_code == 404
+    response = client.get("/plan/not-an-id")
+    assert response.status_code == 404
+    assert response.get_json()["errorType"] == "plan_not_found"
+
+@patch('app.generate_with_gemini')
+def test_reschedule_accepts_a_plan_id(mock_gemini, client):
+    old_plan = "<h2>📅 Day 1: Beach</h2><p>Swim.</p><h2>📅 Day 2: Trek</h2><p>Steep hike.</p>"
+    plan_id = app_module.plan_store.put(old_plan)
+    mock_gemini.return_value = "<h2>📅 Day 2: Spa</h2><p>Massage.</p>"
+
+    # Clients may send "plan": null alongside the ID
+    response = client.post("/reschedule", json={"plan": None, "planId": plan_id, "suggestion": "I'm tired on day 2"})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert "Steep hike." in mock_gemini.call_args[0][0]
+    assert "Massage." in data["updatedPlan"] and "Swim." in data["updatedPlan"]
+    # The updated plan is stored too, so the next change needs no upload either
+    assert client.get(f"/plan/{data['planId']}").get_json()["plan"] == data["updatedPlan"]
+
+    missing = client.post("/reschedule", json={"planId": "0" * 32, "suggestion": "relax"})
+    assert missing.status_code == 404
+    assert missing.get_json()["errorType"] == "plan_not_found"
+
+def test_plan_stream_done_event_carries_the_plan_id(client):
+    response = client.post("/plan/stream", json={"source": "Mumbai", "destination": "Goa", "days": 2})
+    name, data = _parse_sse(response.get_data(as_text=True))[-1]
+    assert name == "done"
+    assert client.get(f"/plan/{data['planId']}").status_code == 200
+
+def test_json_responses_are_compressed_when_accepted(client):
+    body = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    plain = client.post("/plan", json=body)
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    compressed = client.post("/plan", json=body, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert len(compressed.data) < len(plain.data) / 2
+    assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+
+    # Small bodies are not worth compressing
+    health = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in health.headers
+
+def test_compressed_plan_keeps_a_weak_etag_that_still_revalidates(client):
+    plan_id = client.post("/plan", json={"source": "Mumbai", "destination": "Goa", "days": 3}).get_json()["planId"]
+    response = client.get(f"/plan/{plan_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == f'W/"{plan_id}"'
+    revalidated = client.get(f"/plan/{plan_id}",
+                             headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
@@ -0,0 +1,187 @@
+import asyncio
+import gzip
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+os.environ['MOCK_MODE'] = 'True'
+
+import app as app_module
+from asgi_app import ConcurrencyLimiter, PlannerASGIApp
+
+
+@pytest.fixture(autouse=True)
+def clear_plan_cache():
+    if app_module.plan_cache:
+        app_module.plan_cache.clear()
+    if app_module.reschedule_cache:
+        app_module.reschedule_cache.clear()
+    yield
+
+
+async def call(asgi, method, path, payload=None, raw_body=None, headers=()):
+    """Sends one HTTP request through an ASGI app and collects the (decompressed) response."""
+    body = raw_body if raw_body is not None else json.dumps(payload).encode() if payload is not None else b""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi({"type": "http", "method": method, "path": path, "headers": list(headers)}, receive, send)
+    response_headers = dict(sent[0]["headers"])
+    body = sent[1]["body"]
+    if response_headers.get(b"content-encoding") == b"gzip":
+        body = gzip.decompress(body)
+    data = json.loads(body) if body else None
+    return sent[0]["status"], response_headers, data
+
+
+def test_health():
+    asgi = PlannerASGIApp(ConcurrencyLimiter(2))
+    status, headers, data = asyncio.run(call(asgi, "GET", "/health"))
+    assert status == 200
+    assert data["status"] == "healthy"
+    assert headers[b"access-control-allow-origin"] == b"*"
+
+
+@patch('app.generate_with_gemini_async')
+def test_plan_awaits_model(mock_generate):
+    mock_generate.return_value = "<h1>Goa</h1>"
+    asgi = PlannerASGIApp(ConcurrencyLimiter(2))
+    status, _, data = asyncio.run(call(asgi, "POST", "/plan", {"source": "Mumbai", "destination": "Goa", "days": 3}))
+    assert status == 200
+    assert data["plan"].startswith("<h1>Goa</h1>")
+    mock_generate.assert_awaited_once()
+
+
+def test_reschedule_in_mock_mode():
+    asgi = PlannerASGIApp(ConcurrencyLimiter(2))
+    served = app_module.REQUESTS.value(endpoint="/reschedule", status="200")
+    status, _, data = asyncio.run(call(asgi, "POST", "/reschedule", {"plan": "old", "suggestion": "relax"}))
+    assert status == 200
+    assert "Day 1" in data["updatedPlan"]
+    assert app_module.REQUESTS.value(endpoint="/reschedule", status="200") == served + 1
+
+
+def test_model_routes_compress_large_responses():
+    asgi = PlannerASGIApp(ConcurrencyLimiter(2))
+    payload = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    status, headers, data = asyncio.run(call(asgi, "POST", "/plan", payload, headers=[(b"accept-encoding", b"gzip")]))
+    assert status == 200
+    assert headers[b"content-encoding"] == b"gzip" and headers[b"vary"] == b"accept-encoding"
+    assert data["plan"] and data["planId"]
+
+    _, headers, _ = asyncio.run(call(asgi, "POST", "/plan", payload))
+    assert b"content-encoding" not in headers
+
+
+@pytest.mark.parametrize("path, method, body, expected_status", [
+    ("/plan", "POST", b"not json", 400),
+    ("/plan", "POST", json.dumps({"source": "A"}).encode(), 400),
+    ("/plan", "GET", b"", 405),
+    ("/missing", "GET", b"", 404),
+])
+def test_error_statuses(path, method, body, expected_status):
+    asgi = PlannerASGIApp(ConcurrencyLimiter(2))
+    status, _, _ = asyncio.run(call(asgi, method, path, raw_body=body))
+    assert status == expected_status
+
+
+def test_rejects_with_retry_after_when_saturated():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_generate(prompt):
+            await release.wait()
+            return "<h1>Plan</h1>"
+
+        asgi = PlannerASGIApp(ConcurrencyLimiter(1, queue_size=0), retry_after=3)
+        payload = {"source": "A", "destination": "B", "days": 1}
+        with patch('app.generate_with_gemini_async', side_effect=slow_generate):
+            first = asyncio.ensure_future(call(asgi, "POST", "/plan", payload))
+            await asyncio.sleep(0)
+            rejected = await call(asgi, "POST", "/plan", payload)
+            release.set()
+            accepted = await first
+        return asgi, rejected, accepted
+
+    asgi, (status, headers, _), (first_status, _, _) = asyncio.run(scenario())
+    assert status == 429
+    assert headers[b"retry-after"] == b"3"
+    assert first_status == 200
+    assert asgi.limiter.stats()["rejected"] == 1
+    assert asgi.limiter.stats()["in_flight"] == 0
+
+
+def test_limiter_queues_up_to_queue_size():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1, queue_size=1)
+        assert await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        assert not await limiter.acquire()
+        limiter.release()
+        assert await waiter
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_lifespan_startup_warms_up():
+    async def scenario():
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        with patch('app.warm_up') as warm_up:
+            await PlannerASGIApp(ConcurrencyLimiter(1))({"type": "lifespan"}, receive, send)
+        return sent, warm_up
+
+    sent, warm_up = asyncio.run(scenario())
+    warm_up.assert_called_once()
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+def test_cancelled_shared_work_still_gets_a_response():
+    async def cancelled_elsewhere(data):
+        raise asyncio.CancelledError()
+
+    asgi = PlannerASGIApp(ConcurrencyLimiter(1))
+    asgi.routes[("POST", "/plan")] = (cancelled_elsewhere, "Try again.")
+    status, _, data = asyncio.run(call(asgi, "POST", "/plan", {"source": "A"}))
+    assert (status, data) == (500, {"error": "Try again."})
+    assert asgi.limiter.stats()["in_flight"] == 0
+
+
+def test_serves_stored_plans_by_id():
+    asgi = PlannerASGIApp(ConcurrencyLimiter(2))
+    payload = {"source": "Mumbai", "destination": "Goa", "days": 3}
+    _, _, created = asyncio.run(call(asgi, "POST", "/plan", payload))
+    plan_id = created["planId"]
+
+    status, headers, data = asyncio.run(call(asgi, "GET", f"/plan/{plan_id}"))
+    assert status == 200
+    assert data == {"planId": plan_id, "plan": created["plan"]}
+    assert headers[b"etag"] == f'"{plan_id}"'.encode()
+
+    status, _, data = asyncio.run(call(asgi, "GET", f"/plan/{plan_id}",
+                                       headers=[(b"if-none-match", f'W/"{plan_id}"'.encode())]))
+    assert (status, data) == (304, None)
+    for missing in ("0" * 32, "not-an-id"):
+        status, _, data = asyncio.run(call(asgi, "GET", f"/plan/{missing}"))
+        assert (status, data["errorType"]) == (404, "plan_not_found")
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+
+os.environ['MOCK_MODE'] = 'True'
+
+import batch
+from batch import BatchRun, completed_job_ids, job_id, parse_jobs
+
+
+def ok_process(data):
+    return {"plan": f"<h1>{data['destination']}</h1>"}, 200
+
+
+def test_parse_jobs_reads_jsonl_and_reports_bad_lines():
+    jobs, invalid = parse_jobs('{"source": "A", "destination": "B", "days": 2}\n\nnot json\n[1]\n')
+    assert [job.line for job in jobs] == [1]
+    assert [record["line"] for record in invalid] == [3, 4]
+    assert all(record["statusCode"] == 400 for record in invalid)
+
+
+def test_parse_jobs_reads_json_list():
+    jobs, invalid = parse_jobs('[{"source": "A", "destination": "B", "days": 2}, "x"]')
+    assert len(jobs) == 1 and invalid[0]["line"] == 2
+
+
+def test_job_id_ignores_spelling_differences():
+    assert job_id({"source": "Mumbai", "destination": "Goa!", "days": 3}) == \
+        job_id({"source": " mumbai ", "destination": "goa", "days": "3"})
+    assert job_id({"source": "Mumbai", "destination": "Goa", "days": 3}) != \
+        job_id({"source": "Mumbai", "destination": "Goa", "days": 4})
+
+
+def test_batch_run_dedupes_and_bounds_concurrency():
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def slow_process(data):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return ok_process(data)
+
+    jobs, _ = parse_jobs("\n".join(json.dumps({"source": "A", "destination": f"D{n % 10}", "days": 2})
+                                   for n in range(30)))
+    run = BatchRun(jobs, slow_process, workers=3)
+    results = list(run)
+
+    assert len(results) == 10
+    assert peak <= 3
+    summary = run.summary.to_dict()
+    assert summary["duplicates"] == 20 and summary["unique"] == 10 and summary["succeeded"] == 10
+    assert summary["jobs_per_second"] > 0
+
+
+def test_batch_run_records_failures_by_type():
+    def flaky(data):
+        if data["days"] == 1:
+            return {"error": "busy", "errorType": "rate_limited"}, 429
+        if data["days"] == 2:
+            raise RuntimeError("boom")
+        return ok_process(data)
+
+    jobs, _ = parse_jobs("\n".join(json.dumps({"source": "A", "destination": "B", "days": n}) for n in (1, 2, 3)))
+    run = BatchRun(jobs, flaky, workers=2)
+    results = {record["days"]: record for record in run}
+
+    assert results[1]["errorType"] == "rate_limited"
+    assert results[2]["statusCode"] == 500 and "boom" in results[2]["error"]
+    assert results[3]["plan"] == "<h1>B</h1>"
+    assert run.summary.failures == {"rate_limited": 1, "internal": 1}
+
+
+def test_completed_job_ids_skips_failures_and_truncated_lines():
+    lines = ['{"id": "a", "status": "ok"}', '{"id": "b", "status": "error"}', '{"id": "c", "stat']
+    assert completed_job_ids(lines) == {"a"}
+
+
+def test_cli_writes_jsonl_and_resumes(tmp_path, capsys):
+    jobs_path, output_path = tmp_path / "jobs.jsonl", tmp_path / "plans.jsonl"
+    jobs_path.write_text("\n".join(json.dumps({"source": "Mumbai", "destination": d, "days": 2})
+                                   for d in ("Goa", "Jaipur", "goa")), encoding="utf-8")
+
+    assert batch.main([str(jobs_path), "--output", str(output_path), "--workers", "2"]) == 0
+    first = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert len(first) == 2 and all(record["status"] == "ok" for record in first)
+
+    summary_path = tmp_path / "summary.json"
+    assert batch.main([str(jobs_path), "--output", str(output_path), "--summary", str(summary_path)]) == 0
+    assert len(output_path.read_text(encoding="utf-8").splitlines()) == 2
+    summary = json.loads(summary_path.read_text(encoding="utf-8"))
+    assert summary["resumed"] == 2 and summary["duplicates"] == 1 and summary["succeeded"] == 0
+
+
+def test_drop_partial_line_keeps_only_complete_lines(tmp_path):
+    path = tmp_path / "plans.jsonl"
+    path.write_bytes(b'{"id": "a"}\n{"id": "b", "st')
+    assert batch.drop_partial_line(str(path), block_size=4) == len(b'{"id": "b", "st')
+    assert path.read_bytes() == b'{"id": "a"}\n'
+    assert batch.drop_partial_line(str(path)) == 0
+
+    path.write_bytes(b'{"id": "a", "st')
+    batch.drop_partial_line(str(path))
+    assert path.read_bytes() == b""
+    assert batch.drop_partial_line(str(tmp_path / "missing.jsonl")) == 0
+
+
+def test_cli_resumes_after_a_crash_mid_write(tmp_path, capsys):
+    jobs_path, output_path = tmp_path / "jobs.jsonl", tmp_path / "plans.jsonl"
+    jobs_path.write_text("\n".join(json.dumps({"source": "Mumbai", "destination": d, "days": 2})
+                                   for d in ("Goa", "Jaipur")), encoding="utf-8")
+    assert batch.main([str(jobs_path), "--output", str(output_path)]) == 0
+    complete, last = output_path.read_text(encoding="utf-8").splitlines()
+    output_path.write_text(complete + "\n" + last[:len(last) // 2], encoding="utf-8")
+
+    assert batch.main([str(jobs_path), "--output", str(output_path)]) == 0
+    records = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert [record["status"] for record in records] == ["ok", "ok"]
+    assert {record["id"] for record in records} == {json.loads(complete)["id"], json.loads(last)["id"]}
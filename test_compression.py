@@ -0,0 +1,44 @@
+import gzip
+from unittest.mock import patch
+
+import pytest
+
+import compression
+from compression import choose_encoding, compress, configured_encodings, parse_accept_encoding
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.8, identity;q=0, *;q=0.1") == {
+        "gzip": 1.0, "br": 0.8, "identity": 0.0, "*": 0.1}
+    assert parse_accept_encoding(None) == {}
+    assert parse_accept_encoding("gzip;q=abc") == {"gzip": 0.0}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    (None, None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header, ("br", "gzip")) == expected
+
+
+def test_gzip_output_is_deterministic():
+    body = b'{"plan": "' + b"<p>Day</p>" * 200 + b'"}'
+    assert compress(body, "gzip") == compress(body, "gzip")
+    assert gzip.decompress(compress(body, "gzip")) == body
+
+
+def test_configured_encodings_drop_brotli_without_the_package():
+    with patch.object(compression, "brotli", None):
+        assert configured_encodings("br,gzip") == ("gzip",)
+        with pytest.raises(ValueError):
+            compress(b"x", "br")
+    assert configured_encodings("none") == ()
+    with pytest.raises(ValueError):
+        configured_encodings("zstd")
@@ -0,0 +1,83 @@
+import re
+
+from itinerary import find_target_days, parse_itinerary, render_itinerary, splice_days, split_elements
+
+PLAN = """<h1>🗺️ Your 2-Day Goa Adventure</h1>
+<p>Beaches and forts.</p>
+<h2>📅 Day 1: South Goa</h2>
+<h3>🌅 Morning: Palolem Beach</h3>
+<p>Taxi from the airport (1.5 hours, ₹1500).</p>
+<h3>🍽️ Lunch: Beach Shack</h3>
+<p>Goan fish curry (₹400-600).</p>
+<h4><strong>Estimated Daily Budget:</strong> ₹3,000</h4>
+<h2>📅 Day 2: North Goa</h2>
+<h3>🌞 Afternoon: Fort Aguada</h3>
+<p>Sunset views.</p>
+<h4><strong>Estimated Daily Budget:</strong> ₹2,000</h4>
+<h4><strong>Total Trip Budget:</strong> ₹5,000</h4>
+<div class="local-tips">
+<h3>💡 Quick Travel Tips for Goa</h3>
+<p><em>Rent a scooter.</em></p>
+</div>"""
+
+
+def _squash(html):
+    return re.sub(r"\s+", "", html)
+
+
+def test_parse_itinerary_structure():
+    itinerary = parse_itinerary(PLAN)
+    assert [element.tag for element in itinerary.header] == ["h1", "p"]
+    assert itinerary.day_numbers() == [1, 2]
+    day = itinerary.day(1)
+    assert [block.kind for block in day.blocks] == ["Morning", "Lunch"]
+    assert day.blocks[0].cost == "₹1500"
+    assert day.blocks[1].description == "Goan fish curry (₹400-600)."
+    assert "₹3,000" in day.budget
+    assert itinerary.day(2).notes == ["<h4><strong>Total Trip Budget:</strong> ₹5,000</h4>"]
+    assert itinerary.footer[0].open_tag == '<div class="local-tips">'
+
+
+def test_render_round_trips():
+    assert _squash(render_itinerary(parse_itinerary(PLAN))) == _squash(PLAN)
+
+
+def test_split_elements_keeps_bare_text_and_unclosed_tail():
+    elements = split_elements("intro<p>a</p><p>b")
+    assert [(e.tag, e.html) for e in elements] == [("", "intro"), ("p", "<p>a</p>"), ("", "<p>b")]
+
+
+def test_splice_days_replaces_by_number():
+    itinerary = parse_itinerary(PLAN)
+    updates = parse_itinerary("<p>Ack</p><h2>📅 Day 2: Spa Day</h2><h3>🌅 Morning: Spa</h3><p>Relax.</p><h2>📅 Day 9: Bogus</h2>")
+    assert splice_days(itinerary, updates.days) == [2]
+    rendered = render_itinerary(itinerary)
+    assert "Spa Day" in rendered and "Fort Aguada" not in rendered
+    assert "Palolem" in rendered and "Bogus" not in rendered
+
+
+def test_find_target_days():
+    assert find_target_days("I'm tired on day 2") == [2]
+    assert find_target_days("Days 2-4 feel rushed") == [2, 3, 4]
+    assert find_target_days("day 1 and 3, cheaper please") == [1, 3]
+    assert find_target_days("make the second day relaxing") == [2]
+    assert find_target_days("the last day is too busy", [1, 2, 3]) == [3]
+    assert find_target_days("day 9", [1, 2, 3]) == []
+    assert find_target_days("make it more adventurous") == []
+    assert find_target_days("the 3rd day is too busy") == [3]
+
+
+def test_find_target_days_ignores_durations():
+    assert find_target_days("add a 2 day hike") == []
+    assert find_target_days("buy a 3 day pass on day 1") == [1]
+
+
+def test_find_target_days_clamps_ranges():
+    assert find_target_days("days 2-3000000 feel rushed", [1, 2, 3, 4]) == [2, 3, 4]
+    assert find_target_days("days 1-3000000") == list(range(1, 31))
+
+
+def test_replace_preamble_keeps_title_and_introduction():
+    itinerary = parse_itinerary("<p>Old note</p><h1>Trip</h1><p>Intro</p><h2>📅 Day 1: A</h2><p>Swim.</p>")
+    itinerary.replace_preamble(parse_itinerary("<p>New note</p>").header)
+    assert [element.html for element in itinerary.header] == ["<p>New note</p>", "<h1>Trip</h1>", "<p>Intro</p>"]
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+os.environ['MOCK_MODE'] = 'True'
+
+import app as planner
+from itinerary import parse_itinerary
+from llm_backends import (MockFileBackend, SimulatedAPIError, SimulatedBackend, create_backend, estimate_tokens,
+                          simulate_response)
+from model_client import classify_error
+from parallel_plan import parse_skeleton
+from plan_codec import decode_itinerary, is_compact
+
+
+def fast_simulator(**kwargs):
+    kwargs.setdefault("first_token_latency", 0)
+    kwargs.setdefault("tokens_per_second", 1e9)
+    return SimulatedBackend(**kwargs)
+
+
+def test_simulated_trip_has_one_section_per_day():
+    text = simulate_response(planner.generate_trip_prompt("Mumbai", "Goa", 5), random.Random(0))
+    itinerary = parse_itinerary(text)
+    assert itinerary.day_numbers() == [1, 2, 3, 4, 5]
+    assert all(len(day.blocks) == 5 and day.budget for day in itinerary.days)
+    assert "Goa" in itinerary.header[0].inner
+
+
+def test_simulated_skeleton_and_day_prompts():
+    skeleton_text = simulate_response(planner.generate_skeleton_prompt("Mumbai", "Goa", 4), random.Random(0))
+    skeleton = parse_skeleton(skeleton_text, 4, "Goa")
+    assert skeleton.intro
+    assert not any(day.theme.startswith("Exploring") for day in skeleton.days)
+
+    day = skeleton.days[2]
+    prompt = planner.generate_day_prompt("Mumbai", "Goa", 4, day, skeleton.outline())
+    assert parse_itinerary(simulate_response(prompt, random.Random(0))).day_numbers() == [3]
+
+
+def test_simulated_incremental_reschedule_returns_target_days():
+    plan = simulate_response(planner.generate_trip_prompt("Mumbai", "Goa", 4), random.Random(0))
+    prompt = planner.generate_day_reschedule_prompt(parse_itinerary(plan), [2, 4], "tired")
+    assert parse_itinerary(simulate_response(prompt, random.Random(0))).day_numbers() == [2, 4]
+
+
+def test_simulated_compact_reschedule_replies_in_compact_format():
+    plan = parse_itinerary(simulate_response(planner.generate_trip_prompt("Mumbai", "Goa", 4), random.Random(0)))
+    prompt = planner.generate_compact_reschedule_prompt(plan, [1, 3], "relax")
+    reply = simulate_response(prompt, random.Random(0))
+    assert is_compact(reply)
+    assert decode_itinerary(reply).day_numbers() == [1, 3]
+
+
+def test_estimate_tokens_charges_for_markup():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Relax on the beach") == 4
+    assert estimate_tokens("<p>Relax on the beach</p>") > estimate_tokens("Relax on the beach") + 4
+
+
+def test_simulated_backend_is_deterministic_per_prompt():
+    prompt = planner.generate_trip_prompt("Delhi", "Jaipur", 3)
+    first, second = fast_simulator(seed=7), fast_simulator(seed=7)
+    assert first.generate(prompt, 10) == second.generate(prompt, 10)
+    assert first.generate(prompt, 10) != fast_simulator(seed=8).generate(prompt, 10)
+
+
+def test_simulated_errors_look_like_provider_errors():
+    backend = fast_simulator(error_rate=1.0, rate_limit_share=1.0)
+    with pytest.raises(SimulatedAPIError) as error:
+        backend.generate("prompt", 10)
+    assert classify_error(error.value).kind == "rate_limited"
+
+    backend = fast_simulator(error_rate=1.0, rate_limit_share=0.0)
+    with pytest.raises(SimulatedAPIError) as error:
+        backend.generate("prompt", 10)
+    assert classify_error(error.value).kind == "unavailable"
+    assert backend.stats() == {"calls": 1, "tokens_out": 0}
+
+
+def test_simulated_latency_beyond_timeout_raises():
+    backend = SimulatedBackend(first_token_latency=0.05, tokens_per_second=1)
+    with pytest.raises(TimeoutError):
+        backend.generate("prompt", 0.02)
+    with pytest.raises(TimeoutError):
+        asyncio.run(backend.generate_async("prompt", 0.02))
+
+
+def test_simulated_stream_reassembles_to_full_text():
+    prompt = planner.generate_trip_prompt("Mumbai", "Goa", 2)
+    backend = fast_simulator(chunk_chars=50)
+    chunks = list(backend.stream(prompt, 10))
+    assert len(chunks) > 1
+    assert "".join(chunks) == backend.generate(prompt, 10)
+
+
+def test_mock_backend_rereads_only_when_file_changes(tmp_path):
+    path = tmp_path / "mock.html"
+    path.write_text("<h1>One</h1>", encoding="utf-8")
+    backend = MockFileBackend(str(path), chunk_size=4)
+    assert backend.generate("a", 1) == "<h1>One</h1>"
+    assert list(backend.stream("b", 1)) == ["<h1>", "One<", "/h1>"]
+
+    path.write_text("<h1>Two</h1>", encoding="utf-8")
+    os.utime(path, (1, 1))
+    assert backend.generate("c", 1) == "<h1>Two</h1>"
+
+
+def test_create_backend():
+    assert create_backend("mock").name == "mock"
+    assert create_backend("Simulated").name == "simulated"
+    with pytest.raises(ValueError):
+        create_backend("gemini", api_key=None)
+    with pytest.raises(ValueError):
+        create_backend("other")
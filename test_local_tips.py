@@ -0,0 +1,79 @@
+import json
+import os
+
+from local_tips import AhoCorasick, ReloadingTipsIndex, TipsIndex
+
+TIPS = {
+    "rajasthan": "Carry water.",
+    "jaipur": {"tip": "Hire an auto for the day.", "parent": "rajasthan", "aliases": ["pink city"]},
+    "goa": "Rent a scooter.",
+    "north goa": {"tip": "Visit Fort Aguada.", "parent": "goa"},
+}
+
+
+def test_aho_corasick_matches_whole_words_only():
+    matcher = AhoCorasick(["goa", "north goa", "agra"])
+    assert sorted(matcher.find("north goa trip")) == [(0, 6, 9), (1, 0, 9)]
+    assert matcher.find("goan food in viagra") == []
+
+
+def test_match_prefers_nested_place():
+    index = TipsIndex(TIPS)
+    assert index.match("Rajasthan: Jaipur and around").name == "jaipur"
+    assert index.match("North Goa").name == "north goa"
+    assert index.match("Goa").name == "goa"
+
+
+def test_match_resolves_aliases_case_insensitively():
+    assert TipsIndex(TIPS).match("The PINK CITY").name == "jaipur"
+
+
+def test_match_all_ranks_and_limits():
+    index = TipsIndex(TIPS)
+    names = [m.name for m in index.match_all("Jaipur, Rajasthan")]
+    assert names == ["jaipur", "rajasthan"]
+    assert len(index.match_all("Jaipur, Rajasthan", limit=1)) == 1
+    assert index.match_all("Paris") == []
+
+
+def test_reloading_index_picks_up_file_changes(tmp_path):
+    path = tmp_path / "tips.json"
+    path.write_text(json.dumps({"goa": "Old tip."}), encoding="utf-8")
+    tips = ReloadingTipsIndex(str(path), check_interval=0)
+    assert tips.get().match("Goa").tip == "Old tip."
+
+    path.write_text(json.dumps({"goa": "New tip."}), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert tips.get().match("Goa").tip == "New tip."
+
+
+def test_reloading_index_version_follows_reloads(tmp_path):
+    path = tmp_path / "tips.json"
+    path.write_text(json.dumps({"goa": "Old tip."}), encoding="utf-8")
+    tips = ReloadingTipsIndex(str(path), check_interval=0)
+    assert tips.version == ""
+    tips.get()
+    first = tips.version
+
+    path.write_text("{not json", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    tips.get()
+    assert tips.version == first
+
+    path.write_text(json.dumps({"goa": "New tip."}), encoding="utf-8")
+    os.utime(path, (stat.st_atime, stat.st_mtime + 20))
+    tips.get()
+    assert tips.version not in ("", first)
+
+def test_reloading_index_keeps_last_good_index(tmp_path):
+    path = tmp_path / "tips.json"
+    path.write_text(json.dumps({"goa": "Tip."}), encoding="utf-8")
+    tips = ReloadingTipsIndex(str(path), check_interval=0)
+    first = tips.get()
+
+    path.write_text("{not json", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert tips.get() is first
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def test_counter_renders_labelled_samples():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["endpoint", "status"])
+    requests.inc(endpoint="/plan", status="200")
+    requests.inc(2, endpoint="/plan", status="200")
+    requests.inc(endpoint="/plan", status="504")
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{endpoint="/plan",status="200"} 3' in text
+    assert 'requests_total{endpoint="/plan",status="504"} 1' in text
+    assert requests.value(endpoint="/plan", status="200") == 3
+
+
+def test_counter_rejects_wrong_labels():
+    counter = MetricsRegistry().counter("errors_total", "Errors.", ["kind"])
+    with pytest.raises(ValueError):
+        counter.inc(status="500")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Stages.", ["stage"], buckets=[0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        stages.observe(value, stage="generation")
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="generation",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="generation",le="1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="generation",le="+Inf"} 4' in lines
+    assert 'stage_seconds_sum{stage="generation"} 3.65' in lines
+    assert 'stage_seconds_count{stage="generation"} 4' in lines
+
+
+def test_histogram_timer_records_on_error():
+    stages = MetricsRegistry().histogram("stage_seconds", "Stages.", ["stage"])
+    with pytest.raises(RuntimeError), stages.time(stage="sanitize"):
+        raise RuntimeError("boom")
+    assert stages.count(stage="sanitize") == 1
+
+
+def test_histogram_is_thread_safe():
+    stages = MetricsRegistry().histogram("stage_seconds", "Stages.", ["stage"])
+
+    def record():
+        for _ in range(1000):
+            stages.observe(0.01, stage="tips")
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stages.count(stage="tips") == 8000
+
+
+def test_callback_metrics_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    state = {"hits": 1}
+    registry.callback("cache_lookups_total", "Lookups.", "counter", lambda: [({"result": "hit"}, state["hits"])])
+    state["hits"] = 5
+    assert 'cache_lookups_total{result="hit"} 5' in registry.render()
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("odd_total", "Odd.", ["name"]).inc(name='say "hi"\n')
+    assert 'odd_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def test_duplicate_names_are_rejected():
+    registry = MetricsRegistry()
+    registry.counter("a_total", "A.")
+    with pytest.raises(ValueError):
+        registry.counter("a_total", "A again.")
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from model_client import CircuitBreaker, ModelClient, ModelError, RetryPolicy, TokenBucket, classify_error
+
+
+class FakeAPIError(Exception):
+    """Stands in for google.api_core exceptions, which carry an HTTP `code`."""
+
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def flaky(failures):
+    """A model call that raises the given exceptions in order, then succeeds."""
+    calls = []
+
+    def call(prompt, timeout):
+        calls.append(timeout)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return f"ok:{prompt}"
+
+    return call, calls
+
+
+def no_delay_retry(attempts=3):
+    return RetryPolicy(attempts=attempts, base_delay=0, max_delay=0)
+
+
+@pytest.mark.parametrize("exc, kind, status", [
+    (FakeAPIError(429), "rate_limited", 429),
+    (FakeAPIError(503), "unavailable", 503),
+    (FakeAPIError(504), "timeout", 504),
+    (FakeAPIError(400), "invalid_request", 502),
+    (TimeoutError(), "timeout", 504),
+    (ConnectionError(), "unavailable", 503),
+    (ValueError("no parts"), "internal", 502),
+])
+def test_classify_error(exc, kind, status):
+    error = classify_error(exc)
+    assert (error.kind, error.status_code) == (kind, status)
+
+
+def test_retries_transient_errors_then_succeeds():
+    call, calls = flaky([FakeAPIError(503), FakeAPIError(429)])
+    client = ModelClient(call, retry=no_delay_retry(), attempt_timeout=5, deadline=30)
+    assert client.generate("p") == "ok:p"
+    assert len(calls) == 3
+    assert calls[0] == 5
+    assert client.stats()["retries"] == 2
+
+
+def test_does_not_retry_permanent_errors():
+    call, calls = flaky([FakeAPIError(400)])
+    client = ModelClient(call, retry=no_delay_retry())
+    with pytest.raises(ModelError) as error:
+        client.generate("p")
+    assert error.value.kind == "invalid_request"
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_attempts():
+    call, calls = flaky([FakeAPIError(503)] * 5)
+    client = ModelClient(call, retry=no_delay_retry(attempts=2))
+    with pytest.raises(ModelError):
+        client.generate("p")
+    assert len(calls) == 2
+    assert client.stats()["errors"] == {"unavailable": 1}
+
+
+def test_retry_delay_is_jittered_and_capped():
+    policy = RetryPolicy(attempts=5, base_delay=1, max_delay=3)
+    with patch("model_client.random.uniform", side_effect=lambda low, high: high):
+        assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 3, 3]
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    call, calls = flaky([FakeAPIError(503)] * 2)
+    client = ModelClient(call, retry=no_delay_retry(attempts=1), breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(ModelError):
+            client.generate("p")
+    with pytest.raises(ModelError) as error:
+        client.generate("p")
+    assert error.value.kind == "circuit_open"
+    assert error.value.retry_after is not None
+    assert len(calls) == 2
+
+    time.sleep(0.06)
+    assert client.generate("p") == "ok:p"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.before_call() is None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.before_call() is not None
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_token_bucket_reserves_within_budget():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) is None
+    assert 0 < bucket.reserve(1) <= 0.1
+
+
+def test_rate_limited_when_quota_wait_exceeds_deadline():
+    call, calls = flaky([])
+    client = ModelClient(call, rate_limiter=TokenBucket(rate=0.01, capacity=1), deadline=1)
+    assert client.generate("p") == "ok:p"
+    with pytest.raises(ModelError) as error:
+        client.generate("p")
+    assert error.value.kind == "rate_limited"
+    assert error.value.to_response()["retryAfter"] >= 1
+    assert len(calls) == 1
+
+
+def test_generate_async_enforces_attempt_timeout():
+    async def slow_call(prompt, timeout):
+        await asyncio.sleep(1)
+
+    client = ModelClient(lambda p, t: "", async_call=slow_call, retry=no_delay_retry(attempts=1),
+                         attempt_timeout=0.05)
+    with pytest.raises(ModelError) as error:
+        asyncio.run(client.generate_async("p"))
+    assert error.value.kind == "timeout"
+
+
+def test_stream_records_failures():
+    def broken_stream(prompt, timeout):
+        yield "<h1>"
+        raise FakeAPIError(503)
+
+    client = ModelClient(lambda p, t: "", stream_call=broken_stream)
+    chunks = []
+    with pytest.raises(ModelError):
+        for chunk in client.stream("p"):
+            chunks.append(chunk)
+    assert chunks == ["<h1>"]
+    assert client.breaker.failures == 1
+
+
+def test_permanent_errors_do_not_open_the_breaker():
+    call, calls = flaky([FakeAPIError(400), ValueError("no parts")])
+    client = ModelClient(call, retry=no_delay_retry(attempts=1),
+                         breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30))
+    for kind in ("invalid_request", "internal"):
+        with pytest.raises(ModelError) as error:
+            client.generate("p")
+        assert error.value.kind == kind
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.generate("p") == "ok:p"
+
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+def test_abandoned_stream_trial_releases_half_open_slot():
+    def endless_stream(prompt, timeout):
+        while True:
+            yield "<p>"
+
+    client = ModelClient(lambda p, t: "ok", stream_call=endless_stream, breaker=open_breaker())
+    stream = client.stream("p")
+    assert next(stream) == "<p>"
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    stream.close()
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.generate("p") == "ok"
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_async_trial_releases_half_open_slot():
+    started = asyncio.Event()
+
+    async def hanging_call(prompt, timeout):
+        started.set()
+        await asyncio.sleep(10)
+
+    client = ModelClient(lambda p, t: "ok", async_call=hanging_call, breaker=open_breaker())
+
+    async def scenario():
+        task = asyncio.create_task(client.generate_async("p"))
+        await asyncio.wait_for(started.wait(), 1)
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert client.generate("p") == "ok"
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_permanent_error_on_trial_releases_half_open_slot():
+    call, calls = flaky([FakeAPIError(400)])
+    client = ModelClient(call, retry=no_delay_retry(attempts=1), breaker=open_breaker())
+    with pytest.raises(ModelError) as error:
+        client.generate("p")
+    assert error.value.kind == "invalid_request"
+    assert client.generate("p") == "ok:p"
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from parallel_plan import (SkeletonDay, extract_day, generate_days, generate_days_async, parse_skeleton,
+                           placeholder_day)
+from itinerary import DayPlan
+
+
+def test_parse_skeleton_fills_missing_days():
+    text = """INTRO: Sun and forts.
+    Day 1 | Beach Arrival | Palolem
+    **Day 3 | Heritage Walk | Old Goa**
+    Day 9 | Out of range | Nowhere"""
+    skeleton = parse_skeleton(text, 3, "Goa")
+    assert skeleton.intro == "Sun and forts."
+    assert [(d.number, d.theme, d.location) for d in skeleton.days] == [
+        (1, "Beach Arrival", "Palolem"),
+        (2, "Exploring Goa", "Goa"),
+        (3, "Heritage Walk", "Old Goa"),
+    ]
+    assert "Day 3: Heritage Walk (Old Goa)" in skeleton.outline()
+
+
+def test_extract_day_prefers_matching_number_and_renumbers():
+    day = SkeletonDay(4, "Forts", "Goa")
+    plan = extract_day("<h2>📅 Day 1: Wrong</h2><p>a</p>", day)
+    assert plan.number == 4
+    assert extract_day("<p>no sections</p>", day) is None
+
+
+def test_generate_days_runs_concurrently_and_keeps_order():
+    days = [SkeletonDay(n, f"Theme {n}", "Goa") for n in range(1, 7)]
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def generate_day(day):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return DayPlan(day.number, day.theme)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        start = time.monotonic()
+        results = generate_days(days, generate_day, fanout=3, day_timeout=5, pool=pool)
+        elapsed = time.monotonic() - start
+
+    assert [plan.number for plan in results] == [1, 2, 3, 4, 5, 6]
+    assert peak[0] == 3
+    assert elapsed < 0.25
+
+
+def test_generate_days_drops_failed_and_slow_days():
+    days = [SkeletonDay(n, "t", "Goa") for n in range(1, 4)]
+
+    def generate_day(day):
+        if day.number == 2:
+            raise RuntimeError("boom")
+        if day.number == 3:
+            time.sleep(0.5)
+        return DayPlan(day.number, "t")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = generate_days(days, generate_day, fanout=3, day_timeout=0.1, pool=pool)
+    assert [plan and plan.number for plan in results] == [1, None, None]
+
+
+def test_generate_days_times_out_days_stuck_behind_a_saturated_pool():
+    days = [SkeletonDay(n, "t", "Goa") for n in range(1, 3)]
+    release = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(release.wait, 5)  # Another request holding the only thread
+        start = time.monotonic()
+        results = generate_days(days, lambda day: DayPlan(day.number, "t"), fanout=2, day_timeout=0.1, pool=pool)
+        elapsed = time.monotonic() - start
+        release.set()
+    assert results == [None, None]
+    assert elapsed < 1
+
+
+@pytest.mark.parametrize("day_timeout", [0, -1])
+def test_generate_days_rejects_non_positive_timeouts(day_timeout):
+    with ThreadPoolExecutor(max_workers=1) as pool, pytest.raises(ValueError):
+        generate_days([SkeletonDay(1, "t", "Goa")], lambda day: None, fanout=1, day_timeout=day_timeout, pool=pool)
+    with pytest.raises(ValueError):
+        asyncio.run(generate_days_async([SkeletonDay(1, "t", "Goa")], None, fanout=1, day_timeout=day_timeout))
+
+
+def test_generate_days_async_bounds_fanout_and_times_out():
+    days = [SkeletonDay(n, "t", "Goa") for n in range(1, 5)]
+
+    async def generate_day(day):
+        await asyncio.sleep(1 if day.number == 4 else 0.01)
+        return DayPlan(day.number, "t")
+
+    results = asyncio.run(generate_days_async(days, generate_day, fanout=2, day_timeout=0.2))
+    assert [plan and plan.number for plan in results] == [1, 2, 3, None]
+
+
+def test_placeholder_day_renders_theme():
+    rendered = placeholder_day(SkeletonDay(2, "Forts & <b>", "Goa")).render()
+    assert rendered.startswith("<h2>📅 Day 2: Forts &amp; &lt;b&gt;</h2>")
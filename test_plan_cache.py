@@ -0,0 +1,81 @@
+import pytest
+
+from plan_cache import (
+    MemoryCacheStore,
+    PlanCache,
+    SQLiteCacheStore,
+    create_cache_store,
+    make_plan_cache_key,
+    normalize_place,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """Each cache test runs against both storage backends."""
+    if request.param == "memory":
+        return MemoryCacheStore(max_entries=2)
+    return SQLiteCacheStore(str(tmp_path / "cache.sqlite3"), max_entries=2)
+
+
+def test_normalize_place():
+    assert normalize_place("  New   Delhi! ") == "new delhi"
+    assert normalize_place("GOA") == normalize_place("goa")
+
+
+def test_make_plan_cache_key_normalizes_inputs():
+    key = make_plan_cache_key("Mumbai", "Goa", 3, "v1")
+    assert key == make_plan_cache_key(" mumbai", "GOA.", "3", "v1")
+    assert key != make_plan_cache_key("Mumbai", "Goa", 4, "v1")
+    assert key != make_plan_cache_key("Mumbai", "Goa", 3, "v2")
+
+
+def test_make_plan_cache_key_tracks_generation_mode_and_tips():
+    key = make_plan_cache_key("Mumbai", "Goa", 3, "v1", "single", "t1")
+    assert key != make_plan_cache_key("Mumbai", "Goa", 3, "v1", "parallel", "t1")
+    assert key != make_plan_cache_key("Mumbai", "Goa", 3, "v1", "single", "t2")
+
+
+def test_cache_hit_and_miss(store):
+    cache = PlanCache(store, ttl_seconds=60)
+    assert cache.get("a") is None
+    cache.set("a", "<h1>Plan</h1>")
+    assert cache.get("a") == "<h1>Plan</h1>"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_cache_expires_entries(store):
+    cache = PlanCache(store, ttl_seconds=-1)
+    cache.set("a", "plan")
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(store) == 0
+
+
+def test_cache_evicts_least_recently_used(store):
+    cache = PlanCache(store, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_create_cache_store(tmp_path):
+    assert create_cache_store("none", 10, "") is None
+    assert isinstance(create_cache_store("memory", 10, ""), MemoryCacheStore)
+    assert isinstance(create_cache_store("sqlite", 10, str(tmp_path / "c.db")), SQLiteCacheStore)
+    with pytest.raises(ValueError):
+        create_cache_store("redis", 10, "")
+
+
+def test_sqlite_store_reconnects_in_a_forked_process(tmp_path):
+    store = SQLiteCacheStore(str(tmp_path / "cache.sqlite3"))
+    store.set("a", "plan", 9999999999)
+    inherited = store._conn
+    store._pid = -1  # As seen from a child after fork()
+    assert store.get("a") == ("plan", 9999999999)
+    assert store._conn is not inherited
@@ -0,0 +1,93 @@
+import pytest
+
+from itinerary import parse_itinerary, render_itinerary
+from llm_backends import estimate_tokens
+from plan_codec import (PromptTooLarge, can_encode, chunk_by_budget, decode_itinerary, encode_itinerary, inflate,
+                        is_compact)
+from sanitizer import sanitize_allowlist
+
+PLAN = (
+    "<h1>🗺️ Your 2-Day Goa Adventure</h1><p>Sun &amp; sea.</p>"
+    "<h2>📅 Day 1: Beach Day</h2>"
+    "<h3>🌅 Morning: Baga Beach</h3><p>Swim for <strong>2 hours</strong> (free).</p>"
+    "<h3>🍴 Dinner: Fisherman's Wharf</h3><p>Seafood (₹1,200).</p>"
+    "<h3>🛍️ Shopping: Night Market</h3><p>Saturday only.</p>"
+    "<h4><strong>Estimated Daily Budget:</strong> ₹2,000</h4>"
+    "<h2>📅 Day 2: Forts</h2><h3>🌞 Afternoon: Fort Aguada</h3><p>Sunset views.</p>"
+    '<div class="local-tips"><h3>💡 Quick Travel Tips for Goa</h3><p><em>Rent a scooter.</em></p></div>'
+)
+
+
+def test_encode_strips_markup_and_uses_block_codes():
+    text = encode_itinerary(parse_itinerary(PLAN))
+    assert text.splitlines() == [
+        "T: Your 2-Day Goa Adventure",
+        "I: Sun & sea.",
+        "D1: Beach Day",
+        "M: Baga Beach | Swim for 2 hours (free).",
+        "N: Fisherman's Wharf | Seafood (₹1,200).",
+        "B: Shopping: Night Market | Saturday only.",
+        "$: ₹2,000",
+        "D2: Forts",
+        "A: Fort Aguada | Sunset views.",
+    ]
+
+
+def test_encode_selected_days_only():
+    assert encode_itinerary(parse_itinerary(PLAN), [2]) == "D2: Forts\nA: Fort Aguada | Sunset views."
+
+
+def test_round_trip_restores_documented_layout():
+    itinerary = parse_itinerary(PLAN)
+    decoded = decode_itinerary(encode_itinerary(itinerary))
+    assert decoded.day_numbers() == [1, 2]
+    assert [block.kind for block in decoded.days[0].blocks] == ["Morning", "Dinner", "Shopping"]
+    html = render_itinerary(decoded)
+    assert "<h1>🗺️ Your 2-Day Goa Adventure</h1>" in html
+    assert "<h3>🍴 Dinner: Fisherman's Wharf</h3>" in html
+    assert "<h4><strong>Estimated Daily Budget:</strong> ₹2,000</h4>" in html
+    assert encode_itinerary(decoded) == encode_itinerary(itinerary)
+
+
+def test_compact_mock_plan_is_much_smaller():
+    with open("mock_data.html", "r", encoding="utf-8") as f:
+        html = sanitize_allowlist(f.read())
+    compact = encode_itinerary(parse_itinerary(html))
+    assert estimate_tokens(compact) < 0.7 * estimate_tokens(html)
+    assert parse_itinerary(inflate(compact)).day_numbers() == parse_itinerary(html).day_numbers()
+
+
+def test_decode_tolerates_wrapped_lines_and_code_fences():
+    text = "```\nACK: Slower pace.\nD3: Rest\nE: Sunset cruise | Two hours on the river,\n  dinner on board.\n```"
+    itinerary = decode_itinerary(text)
+    assert itinerary.header[0].html == "<p>Slower pace.</p>"
+    assert itinerary.days[0].blocks[0].details == ["<p>Two hours on the river, dinner on board.</p>"]
+
+
+def test_decode_escapes_markup_in_values():
+    html = inflate("D1: <script>alert(1)</script>\nM: Walk | <b>bold</b>")
+    assert "<script>" not in html and "&lt;script&gt;" in html
+
+
+def test_inflate_leaves_html_alone():
+    assert not is_compact(PLAN)
+    assert inflate(PLAN) == PLAN
+    assert is_compact("ACK: ok\nD1: Rest")
+
+
+def test_can_encode_requires_numbered_days():
+    assert can_encode(parse_itinerary(PLAN))
+    assert not can_encode(parse_itinerary("<p>old plan</p>"))
+    assert not can_encode(parse_itinerary("<h2>Arrival</h2><p>Hi</p>"))
+
+
+def test_chunk_by_budget_groups_in_order():
+    assert chunk_by_budget([1, 2, 3, 4], cost=lambda item: 10, budget=35, fixed=10) == [[1, 2], [3, 4]]
+    assert chunk_by_budget([1, 2], cost=lambda item: 10, budget=100, fixed=10) == [[1, 2]]
+
+
+def test_chunk_by_budget_rejects_items_that_cannot_fit():
+    with pytest.raises(PromptTooLarge) as error:
+        chunk_by_budget([1, 2], cost=lambda item: 50 * item, budget=80, fixed=10)
+    assert error.value.tokens == 110
+    assert error.value.limit == 80
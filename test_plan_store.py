@@ -0,0 +1,60 @@
+import pytest
+
+from plan_store import MemoryPlanStore, SQLitePlanStore, create_plan_store, is_plan_id, pack, plan_id, unpack
+
+PLAN = "<h1>Goa</h1>" + "<h2>📅 Day 1: Beaches</h2><p>Swim, then seafood by the shore.</p>" * 40
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryPlanStore(max_entries=2)
+    return SQLitePlanStore(str(tmp_path / "plans.sqlite3"), max_entries=2)
+
+
+def test_plan_id_is_content_addressed():
+    assert plan_id(PLAN) == plan_id(str(PLAN))
+    assert plan_id(PLAN) != plan_id(PLAN + " ")
+    assert is_plan_id(plan_id(PLAN))
+    assert not is_plan_id("../etc/passwd") and not is_plan_id(None) and not is_plan_id(plan_id(PLAN).upper())
+
+
+def test_pack_round_trips_and_compresses():
+    blob = pack(PLAN)
+    assert unpack(blob) == PLAN
+    assert len(blob) < len(PLAN.encode("utf-8")) / 5
+
+
+def test_put_and_get(store):
+    key = store.put(PLAN)
+    assert key == plan_id(PLAN)
+    assert store.put(PLAN) == key
+    assert store.get(key) == PLAN
+    assert key in store and len(store) == 1
+    assert store.get(plan_id("missing")) is None
+    stats = store.stats()
+    assert stats["raw_bytes"] == len(PLAN.encode("utf-8"))
+    assert stats["compression_ratio"] > 5
+
+
+def test_least_recently_used_plans_are_evicted(store):
+    first, second = store.put("<p>1</p>"), store.put("<p>2</p>")
+    store.get(first)
+    third = store.put("<p>3</p>")
+    assert second not in store
+    assert first in store and third in store
+    assert store.stats()["evictions"] == 1
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "plans.sqlite3")
+    key = SQLitePlanStore(path).put(PLAN)
+    assert SQLitePlanStore(path).get(key) == PLAN
+
+
+def test_create_plan_store(tmp_path):
+    assert create_plan_store("none", 10, "") is None
+    assert isinstance(create_plan_store("memory", 10, ""), MemoryPlanStore)
+    assert isinstance(create_plan_store("sqlite", 10, str(tmp_path / "p.sqlite3")), SQLitePlanStore)
+    with pytest.raises(ValueError):
+        create_plan_store("redis", 10, "")
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from profiler import SamplingProfiler
+
+
+def busy_wait(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(interval=0.002)
+    try:
+        profiler.start()
+        assert profiler.running
+        time.sleep(0.1)
+    finally:
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+    assert not profiler.running
+    status = profiler.status()
+    assert status["samples"] > 0
+    assert "test_profiler.py:busy_wait" in profiler.collapsed()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profiler.collapsed().splitlines())
+
+
+def test_profiler_reset_and_restart():
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start()
+    time.sleep(0.02)
+    profiler.stop()
+    profiler.reset()
+    assert profiler.status()["samples"] == 0
+    assert profiler.collapsed() == ""
+
+    profiler.start(interval=0.005)
+    assert profiler.interval == 0.005
+    profiler.stop()
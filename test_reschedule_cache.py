@@ -0,0 +1,120 @@
+import pytest
+
+from plan_cache import MemoryCacheStore, PlanCache, SQLiteCacheStore
+from reschedule_cache import RescheduleCache, classify_intent, normalize_suggestion, plan_fingerprint
+
+PLAN = "<h2>📅 Day 1: Beach</h2><p>Swim.</p><h2>📅 Day 2: Trek</h2><p>Hike.</p>"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryCacheStore(max_entries=2)
+    else:
+        store = SQLiteCacheStore(str(tmp_path / "reschedule.sqlite3"), max_entries=2)
+    return RescheduleCache(PlanCache(store, ttl_seconds=60), threshold=0.6, variants=2)
+
+
+@pytest.mark.parametrize("suggestion, intent", [
+    ("I'm tired on day 2", "relaxing"),
+    ("Day 2 is too exhausting", "relaxing"),
+    ("We want more adventure and hiking", "adventurous"),
+    ("This is too expensive", "budget"),
+    ("The last day feels rushed", "rushed"),
+    ("Cheaper and slower please", "budget+relaxing"),
+    ("Add a cooking class", None),
+])
+def test_classify_intent(suggestion, intent):
+    assert normalize_suggestion(suggestion).intent == intent
+
+
+def test_classify_intent_ignores_words_containing_keywords():
+    assert classify_intent(["restaurant", "freedom"]) is None
+
+
+def test_paraphrases_normalize_to_the_same_signature():
+    signatures = {normalize_suggestion(text) for text in
+                  ["I'm tired on day 2", "day 2 is too exhausting", "Make Day 2 relaxing", "DAY 2: so tired!!",
+                   "day 2 is tiring"]}
+    assert len(signatures) == 1
+    signature = signatures.pop()
+    assert signature.days == (2,) and signature.words == frozenset({"relaxing"})
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Replace the spa with a hike on day 2", "Replace the hike with a spa on day 2"),
+    ("add rafting on day 2", "add a hike on day 2"),
+    ("Day 2 is too cheap, make it luxurious", "Day 2 is too expensive, make it luxurious"),
+])
+def test_different_requests_with_the_same_intent_do_not_match(first, second):
+    first, second = normalize_suggestion(first), normalize_suggestion(second)
+    assert first.intent == second.intent
+    assert first.similarity(second) < 0.6
+
+
+def test_similarity_requires_same_intent_and_days():
+    tired = normalize_suggestion("I'm tired on day 2")
+    assert tired.similarity(normalize_suggestion("I'm tired on day 3")) == 0.0
+    assert tired.similarity(normalize_suggestion("Day 2 is too expensive")) == 0.0
+    assert tired.similarity(normalize_suggestion("I'm tired on day 2, add a cooking class")) < 0.6
+    cooking = normalize_suggestion("Add a cooking class on day 2")
+    assert cooking.similarity(normalize_suggestion("add cooking classes, day 2")) == 1.0
+    assert cooking.similarity(normalize_suggestion("Add a cooking class in the evening on day 2")) == 5 / 7
+    assert cooking.similarity(normalize_suggestion("Add a cooking class and a market visit on day 2")) < 0.6
+
+
+def test_plan_fingerprint_ignores_whitespace():
+    assert plan_fingerprint(PLAN) == plan_fingerprint(f"  {PLAN}\n")
+    assert plan_fingerprint(PLAN) != plan_fingerprint(PLAN.replace("Hike", "Walk"))
+
+
+def test_near_duplicate_hits(cache):
+    assert cache.get(PLAN, "I'm tired on day 2") is None
+    cache.set(PLAN, "I'm tired on day 2", {"updatedPlan": "relaxed"})
+
+    assert cache.get(PLAN, "Make day 2 relaxing") == ({"updatedPlan": "relaxed"}, 1.0)
+    assert cache.get(PLAN, "Replace the hike with a spa on day 2") is None
+    assert cache.get(PLAN, "I'm tired on day 2", scope="full") is None
+    assert cache.get(PLAN.replace("Hike", "Walk"), "I'm tired on day 2") is None
+
+    cache.set(PLAN, "Add a cooking class on day 2", {"updatedPlan": "cooking"})
+    response, similarity = cache.get(PLAN, "Add a cooking class in the evening on day 2")
+    assert response == {"updatedPlan": "cooking"} and similarity == 5 / 7
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["near_hits"], stats["misses"]) == (1, 1, 4)
+
+
+def test_threshold_is_configurable(cache):
+    strict = RescheduleCache(cache.cache, threshold=1.0)
+    strict.set(PLAN, "Add a cooking class on day 2", {"updatedPlan": "cooking"})
+    assert strict.get(PLAN, "Add a cooking class in the evening on day 2") is None
+    with pytest.raises(ValueError):
+        RescheduleCache(cache.cache, threshold=0)
+
+
+def test_variants_per_plan_are_evicted_least_recently_used(cache):
+    cache.set(PLAN, "tired on day 1", {"updatedPlan": "1"})
+    cache.set(PLAN, "tired on day 2", {"updatedPlan": "2"})
+    assert cache.get(PLAN, "tired on day 1") is not None  # Now the most recent
+    cache.set(PLAN, "cheaper on day 1", {"updatedPlan": "3"})
+
+    assert cache.get(PLAN, "tired on day 2") is None
+    assert cache.get(PLAN, "tired on day 1") is not None
+    assert cache.get(PLAN, "cheaper on day 1") is not None
+
+
+def test_plans_are_evicted_by_the_store(cache):
+    for index in range(3):
+        cache.set(f"{PLAN}{index}", "tired on day 1", {"updatedPlan": str(index)})
+    assert cache.get(f"{PLAN}0", "tired on day 1") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["plans"] == 2
+
+
+def test_clear_resets_entries_and_counters(cache):
+    cache.set(PLAN, "tired on day 1", {"updatedPlan": "1"})
+    cache.get(PLAN, "tired on day 1")
+    cache.clear()
+    assert cache.get(PLAN, "tired on day 1") is None
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,40 @@
+import pytest
+
+from sanitizer import get_sanitizer, sanitize_allowlist, sanitize_bs4
+
+
+def test_keeps_allowed_structure():
+    html = '<h1>Trip</h1><h2>📅 Day 1</h2><h3>🌅 Morning</h3><p>Walk <strong>early</strong>, <em>slowly</em>.</p><h4>Budget</h4>'
+    assert sanitize_allowlist(html) == html
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("<h1>Title</h1><script>alert('xss')</script><p>Content</p>", "<h1>Title</h1><p>Content</p>"),
+    ("<style>p {}</style><p>a</p>", "<p>a</p>"),
+    ('<p onclick="steal()" style="x">a</p>', "<p>a</p>"),
+    ('<p><a href="javascript:x">link</a></p>', "<p>link</p>"),
+    ("<ul><li>one</li></ul>", "one"),
+    ("<p>a &amp; b &lt;c&gt;</p>", "<p>a &amp; b &lt;c&gt;</p>"),
+    ("<p>unclosed <strong>bold", "<p>unclosed <strong>bold</strong></p>"),
+    ("<p>stray</strong> end</p>", "<p>stray end</p>"),
+    ("<!-- note --><p>a</p>", "<p>a</p>"),
+    ("<svg><p>hidden</p></svg><p>shown</p>", "<p>shown</p>"),
+])
+def test_strips_unsafe_markup(raw, expected):
+    assert sanitize_allowlist(raw) == expected
+
+
+def test_only_local_tips_div_keeps_its_class():
+    raw = '<div class="local-tips" id="x"><h3>Tips</h3></div><div class="other"><p>a</p></div>'
+    assert sanitize_allowlist(raw) == '<div class="local-tips"><h3>Tips</h3></div><p>a</p>'
+
+
+def test_bs4_fallback_removes_scripts():
+    clean = sanitize_bs4("<h1>Title</h1><script>alert('xss')</script>")
+    assert clean == "<h1>Title</h1>"
+
+
+def test_get_sanitizer():
+    assert get_sanitizer("BS4") is sanitize_bs4
+    with pytest.raises(ValueError):
+        get_sanitizer("lxml")
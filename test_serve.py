@@ -0,0 +1,141 @@
+import http.client
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from serve import PooledWSGIServer, bind_socket, parse_import_times, share_plan_store
+
+
+def slow_app(environ, start_response):
+    time.sleep(float(environ.get("QUERY_STRING") or 0))
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"done"]
+
+
+def get(port, query=""):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("GET", f"/?{query}")
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def test_parse_import_times():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     json.decoder\n"
+        "import time:       300 |        420 |   json\n"
+        "import time:      1000 |       5000 | app\n"
+        "some unrelated warning\n"
+    )
+    assert parse_import_times(stderr) == [("app", 1000, 5000, 0), ("json", 300, 420, 1), ("json.decoder", 120, 120, 2)]
+
+
+def test_pooled_server_drains_in_flight_requests():
+    sock = bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    server = PooledWSGIServer(slow_app, sock, threads=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    assert get(port) == (200, b"done")
+
+    results = []
+    request = threading.Thread(target=lambda: results.append(get(port, "0.5")))
+    request.start()
+    time.sleep(0.2)
+    assert server.drain(timeout=5) is True
+    request.join()
+    assert results == [(200, b"done")]
+    sock.close()
+    with pytest.raises(OSError):
+        get(port)
+
+
+def test_drain_reports_requests_that_outlive_the_timeout():
+    sock = bind_socket("127.0.0.1", 0)
+    server = PooledWSGIServer(slow_app, sock, threads=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    request = threading.Thread(target=get, args=(sock.getsockname()[1], "1"), daemon=True)
+    request.start()
+    time.sleep(0.2)
+    assert server.drain(timeout=0.1) is False
+    request.join()
+    sock.close()
+
+
+def test_busy_server_leaves_connections_for_an_idle_one():
+    def idle_app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"idle"]
+
+    sock = bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    busy, idle = PooledWSGIServer(slow_app, sock, threads=1), PooledWSGIServer(idle_app, sock, threads=1)
+    threading.Thread(target=busy.serve_forever, daemon=True).start()
+    slow = threading.Thread(target=get, args=(port, "1.5"), daemon=True)
+    slow.start()
+    time.sleep(0.2)  # The busy server takes the slow request and has no thread left
+    threading.Thread(target=idle.serve_forever, daemon=True).start()
+
+    # Every connection goes to the idle server instead of queueing behind the slow request
+    assert [get(port) for _ in range(5)] == [(200, b"idle")] * 5
+    slow.join()
+    for server in (busy, idle):
+        assert server.drain(timeout=5) is True
+    sock.close()
+
+
+def test_several_workers_share_the_plan_store(monkeypatch, caplog):
+    monkeypatch.delenv("PLAN_STORE_BACKEND", raising=False)
+    share_plan_store(1)
+    assert "PLAN_STORE_BACKEND" not in os.environ
+    share_plan_store(2)
+    assert os.environ["PLAN_STORE_BACKEND"] == "sqlite"
+
+    monkeypatch.setenv("PLAN_STORE_BACKEND", "memory")
+    share_plan_store(2)
+    assert os.environ["PLAN_STORE_BACKEND"] == "memory"
+    assert "unknown to the others" in caplog.text
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+@pytest.mark.parametrize("preload", [False, True])
+def test_master_serves_with_warm_workers_and_drains_on_sigterm(preload, tmp_path):
+    env = dict(os.environ, MOCK_MODE="True", LLM_BACKEND="mock", PLAN_STORE_PATH=str(tmp_path / "plans.sqlite3"))
+    env.pop("PLAN_STORE_BACKEND", None)
+    command = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", "0", "--workers", "2", "--threads", "2"]
+    process = subprocess.Popen(command + (["--preload"] if preload else []), env=env, text=True,
+                               stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        port, ready = None, 0
+        deadline = time.monotonic() + 30
+        while ready < 2 and time.monotonic() < deadline:
+            line = process.stderr.readline()
+            match = re.search(r"Listening on http://[\d.]+:(\d+)", line)
+            port = int(match.group(1)) if match else port
+            ready += "ready in" in line
+        assert port and ready == 2
+
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        connection.request("GET", "/stats")
+        stats = json.loads(connection.getresponse().read())
+        assert stats["plan_store"]["backend"] == "SQLitePlanStore"
+        startup = stats["startup"]
+        assert {"import", "warm_up_tips", "warm_up_sanitizer", "warm_up_model_client", "ready"} <= set(startup)
+        assert ("init_worker" in startup) == preload
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stderr.close()
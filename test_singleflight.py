@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, "key", work)
+        started.wait(5)
+        followers = [pool.submit(flight.do, "key", work) for _ in range(3)]
+        wait_until(lambda: flight.coalesced == 3)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"executions": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_sequential_calls_execute_again():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_errors_propagate_and_clear_the_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_async_calls_share_one_execution():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "result"
+
+        tasks = [asyncio.ensure_future(flight.do("key", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks), calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert stats == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_async_errors_propagate_to_waiters():
+    async def scenario():
+        flight = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        return await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_async_leader_cancellation_does_not_cancel_followers():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def work():
+            started.set()
+            await release.wait()
+            return "result"
+
+        leader = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.wait_for(started.wait(), 5)
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        return await asyncio.wait_for(follower, 5), flight.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "result"
+    assert stats == {"executions": 1, "coalesced": 1, "in_flight": 0}
@@ -0,0 +1,42 @@
+import json
+
+from streaming import DaySectionSplitter, IncrementalSanitizer, day_number, format_sse, split_sections
+
+PLAN = (
+    "<h1>Trip</h1><p>Intro</p>"
+    "<h2>📅 Day 1: Beaches</h2><p>Swim</p>"
+    "<h2>📅 Day 2: Forts</h2><p>Climb</p>"
+)
+
+
+def test_splitter_releases_sections_only_when_complete():
+    splitter = DaySectionSplitter()
+    # Feed one character at a time so every tag is split across chunks
+    released = []
+    for char in PLAN:
+        released.extend(splitter.feed(char))
+    assert released == ["<h1>Trip</h1><p>Intro</p>", "<h2>📅 Day 1: Beaches</h2><p>Swim</p>"]
+    assert splitter.close() == ["<h2>📅 Day 2: Forts</h2><p>Climb</p>"]
+
+
+def test_splitter_does_not_split_inside_script():
+    sections = split_sections("<p>a</p><script>x='<h2>'</script><h2>Day 1</h2>")
+    assert sections == ["<p>a</p><script>x='<h2>'</script>", "<h2>Day 1</h2>"]
+
+
+def test_incremental_sanitizer_matches_split_sections():
+    sanitizer = IncrementalSanitizer(str.upper)
+    out = sanitizer.feed(PLAN[:40]) + sanitizer.feed(PLAN[40:]) + sanitizer.close()
+    assert out == [section.upper() for section in split_sections(PLAN)]
+
+
+def test_day_number():
+    assert day_number("<h2>📅 Day 12: Rest</h2>") == 12
+    assert day_number("<h1>Trip</h1>") is None
+
+
+def test_format_sse():
+    event = format_sse("day", {"html": "<p>é</p>"})
+    assert event.startswith("event: day\ndata: ")
+    assert event.endswith("\n\n")
+    assert json.loads(event.split("data: ", 1)[1]) == {"html": "<p>é</p>"}